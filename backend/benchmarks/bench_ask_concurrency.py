@@ -0,0 +1,105 @@
+# bench_ask_concurrency.py
+"""
+Concurrency benchmark for /ask.
+
+Fires QUESTIONS at a running backend from many parallel clients and reports
+p50/p99 latency (time to first byte and full streamed response). A probe
+task hits / at the same time: if /ask blocked the event loop, the probe
+latency would climb together with the /ask latency.
+
+Usage (backend running on localhost:8000 with at least one document):
+    python benchmarks/bench_ask_concurrency.py --clients 50 --requests 4
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+import httpx
+
+QUESTIONS = [
+    "What is the termination clause?",
+    "Summarize the key obligations of each party.",
+    "What is the governing law?",
+    "Which payment terms are defined?",
+    "What are the confidentiality requirements?",
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_client(client: httpx.AsyncClient, client_id: int, requests: int,
+                     ttfb: List[float], total: List[float], errors: List[str]) -> None:
+    for i in range(requests):
+        question = QUESTIONS[(client_id + i) % len(QUESTIONS)]
+        start = time.perf_counter()
+        try:
+            async with client.stream("POST", "/ask", data={"question": question}) as response:
+                first = None
+                async for _ in response.aiter_bytes():
+                    if first is None:
+                        first = time.perf_counter()
+                if response.status_code != 200:
+                    errors.append(f"HTTP {response.status_code}")
+                    continue
+            end = time.perf_counter()
+            ttfb.append(((first or end) - start) * 1000)
+            total.append((end - start) * 1000)
+        except Exception as e:
+            errors.append(str(e))
+
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event, latencies: List[float]) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            await client.get("/")
+            latencies.append((time.perf_counter() - start) * 1000)
+        except Exception:
+            pass
+        await asyncio.sleep(0.05)
+
+
+async def main(base_url: str, clients: int, requests: int) -> None:
+    limits = httpx.Limits(max_connections=clients + 1, max_keepalive_connections=clients + 1)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+        ttfb: List[float] = []
+        total: List[float] = []
+        errors: List[str] = []
+        probe_latencies: List[float] = []
+        stop = asyncio.Event()
+
+        probe_task = asyncio.create_task(probe(client, stop, probe_latencies))
+        start = time.perf_counter()
+        await asyncio.gather(*(run_client(client, c, requests, ttfb, total, errors) for c in range(clients)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await probe_task
+
+    print(f"clients={clients} requests/client={requests} completed={len(total)} errors={len(errors)}")
+    print(f"wall time: {elapsed:.2f}s  throughput: {len(total) / elapsed:.2f} req/s")
+    if total:
+        print(f"ttfb  p50={percentile(ttfb, 50):.0f}ms  p99={percentile(ttfb, 99):.0f}ms")
+        print(f"total p50={percentile(total, 50):.0f}ms  p99={percentile(total, 99):.0f}ms  "
+              f"mean={statistics.mean(total):.0f}ms")
+    if probe_latencies:
+        print(f"event-loop probe (GET /) p50={percentile(probe_latencies, 50):.1f}ms  "
+              f"p99={percentile(probe_latencies, 99):.1f}ms  samples={len(probe_latencies)}")
+    if errors:
+        print(f"first errors: {errors[:3]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=4, help="requests per client")
+    args = parser.parse_args()
+    asyncio.run(main(args.base_url, args.clients, args.requests))
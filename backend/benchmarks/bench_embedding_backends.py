@@ -0,0 +1,89 @@
+# bench_embedding_backends.py
+"""
+Embedding throughput (sentences/sec) for each EMBEDDER_BACKEND.
+
+Encodes chunk-sized passages (~200 words, as produced by chunk_text) and
+short questions with the torch, onnx and onnx-int8 backends, and reports
+throughput plus the mean cosine similarity of each backend's vectors to
+the PyTorch reference.
+
+Usage (from backend/, with sentence-transformers, onnxruntime and
+transformers installed; ONNX exports are created on first run):
+    python -m benchmarks.bench_embedding_backends --passages 512 --batch-size 32
+"""
+import argparse
+import random
+import time
+from typing import List
+
+import numpy as np
+
+from core.embedding_backends import load_backend
+
+BACKENDS = ["torch", "onnx", "onnx-int8"]
+WORDS = (
+    "agreement party supplier customer clause termination notice payment invoice liability indemnify "
+    "confidential information governing law dispute breach remedy warranty obligation services fees "
+    "term renewal assignment force majeure intellectual property data protection audit records"
+).split()
+QUESTIONS = [
+    "What is the termination clause?",
+    "Summarize the key obligations of each party.",
+    "What is the governing law?",
+    "Which payment terms are defined?",
+]
+
+
+def passages(count: int, words: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(words // 2, words))) for _ in range(count)]
+
+
+def throughput(model, texts: List[str], batch_size: int, repeats: int) -> float:
+    model.encode(texts[:batch_size], batch_size=batch_size)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model.encode(texts, batch_size=batch_size)
+    return len(texts) * repeats / (time.perf_counter() - start)
+
+
+def main(model_name: str, n_passages: int, batch_size: int, repeats: int) -> None:
+    chunk_texts = passages(n_passages, 200)
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(n_passages)]
+
+    reference = None
+    print(f"{'backend':<10} {'load s':>7} {'chunks/s':>10} {'queries/s':>10} {'1-query ms':>11} {'cos vs torch':>13}")
+    for name in BACKENDS:
+        try:
+            start = time.perf_counter()
+            model = load_backend(model_name, name)
+            load_s = time.perf_counter() - start
+        except ImportError as e:
+            print(f"{name:<10} skipped ({e})")
+            continue
+
+        vectors = model.encode(chunk_texts[:64], batch_size=batch_size)
+        if reference is None and name == "torch":
+            reference = vectors
+        similarity = float("nan")
+        if reference is not None:
+            similarity = float(np.mean(np.sum(vectors * reference, axis=1) /
+                                       (np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1))))
+
+        chunks_per_s = throughput(model, chunk_texts, batch_size, repeats)
+        queries_per_s = throughput(model, questions, batch_size, repeats)
+        start = time.perf_counter()
+        for question in QUESTIONS * 10:
+            model.encode([question])
+        single_ms = (time.perf_counter() - start) * 1000 / (len(QUESTIONS) * 10)
+        print(f"{name:<10} {load_s:>7.1f} {chunks_per_s:>10.1f} {queries_per_s:>10.1f} {single_ms:>11.2f} {similarity:>13.5f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--passages", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    main(args.model, args.passages, args.batch_size, args.repeats)
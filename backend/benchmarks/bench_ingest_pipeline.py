@@ -0,0 +1,121 @@
+# bench_ingest_pipeline.py
+"""
+End-to-end ingest throughput: staged vs pipelined.
+
+"staged" reproduces the old flow: extract every page into a list, chunk
+everything, embed everything, then upsert in batches. "pipelined" streams
+the same pages through data_processing.ingest_pipeline, where extraction,
+embedding and upserting overlap. Both report wall time, pages/sec,
+chunks/sec and peak Python heap (tracemalloc).
+
+Pages come from a real document (--file) or are synthetic with a simulated
+per-page extraction cost (--extract-ms, e.g. ~50 ms for text PDFs, seconds
+for OCR). By default points go to a throwaway local vector store; pass
+--backend qdrant to measure against the configured Qdrant.
+
+Both modes use the embedding process pool for documents of more than
+EMBED_PROCESS_THRESHOLD chunks: "staged" embeds the whole document in one
+call; "pipelined" switches to the pool once the stream crosses the
+threshold (see PIPELINE_EMBED_BATCH). Set EMBED_WORKERS=1 to compare
+in-process embedding only.
+
+Usage (from backend/):
+    python -m benchmarks.bench_ingest_pipeline --pages 300 --extract-ms 40
+    python -m benchmarks.bench_ingest_pipeline --file /path/to/contract.pdf
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+WORDS = (
+    "agreement party supplier customer clause termination notice payment invoice liability indemnify "
+    "confidential information governing law dispute breach remedy warranty obligation services fees"
+).split()
+
+
+def synthetic_pages(count: int, words_per_page: int, extract_ms: float, name: str):
+    rng = random.Random(0)
+    for page in range(1, count + 1):
+        time.sleep(extract_ms / 1000)
+        yield (" ".join(rng.choice(WORDS) for _ in range(words_per_page)), page, name)
+
+
+def staged(pages, file_name: str) -> int:
+    from core.embedder import EMBEDDER_MODEL
+    from core.vector_store import get_vector_store
+    from data_processing.chunk import chunk_text
+    from data_processing.embedding_engine import embed_texts
+    from data_processing.ingest_pipeline import point_id_for
+
+    page_list = list(pages)
+    chunks = chunk_text([{"text": t, "page": p, "source": s} for (t, p, s) in page_list])
+    vectors = embed_texts([c["text"] for c in chunks], EMBEDDER_MODEL, use_cache=False)
+    store = get_vector_store()
+    store.ensure_collection(vectors.shape[1])
+    ids = [point_id_for(file_name, c["page"], c["chunk_index"], c["text"]) for c in chunks]
+    payloads = [{**c, "file_name": file_name, "file_id": "bench"} for c in chunks]
+    for start in range(0, len(ids), 20):
+        store.upsert(ids[start:start + 20], vectors[start:start + 20], payloads[start:start + 20])
+        time.sleep(0.2)  # the old loop paused between batches
+    return len(chunks)
+
+
+def pipelined(pages, file_name: str) -> int:
+    from data_processing import embedding_engine
+    from data_processing.ingest_pipeline import ingest_pages
+
+    embedding_engine.get_embedding_cache = lambda: None  # measure encoding, not cache hits
+    result = ingest_pages(pages, file_name)
+    return result["points_uploaded"] + result["points_unchanged"]
+
+
+def run(mode: str, make_pages, file_name: str, pages: int) -> None:
+    from core.vector_store import get_vector_store
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    chunks = (staged if mode == "staged" else pipelined)(make_pages(), file_name)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    get_vector_store().delete_by_file(file_name)
+    print(f"{mode:<10} {elapsed:8.2f}s  {pages / elapsed:8.1f} pages/s  {chunks / elapsed:8.1f} chunks/s  "
+          f"peak heap {peak / 1e6:8.1f} MB")
+
+
+def main(args) -> None:
+    if args.backend == "local":
+        os.environ["VECTOR_STORE_BACKEND"] = "local"
+        os.environ.setdefault("LOCAL_STORE_DIR", tempfile.mkdtemp(prefix="bench_ingest_"))
+    os.environ.setdefault("FILE_CATALOG_PATH", os.path.join(tempfile.mkdtemp(prefix="bench_catalog_"), "catalog.db"))
+    os.environ.setdefault("BM25_INDEX_PATH", os.path.join(tempfile.mkdtemp(prefix="bench_bm25_"), "bm25.db"))
+
+    from core.embedder import warm_up_embedder
+    warm_up_embedder()
+
+    if args.file:
+        from services.file_handler import iter_pages_from_path
+
+        name = os.path.basename(args.file)
+        pages = sum(1 for _ in iter_pages_from_path(args.file))
+        make_pages = lambda: iter_pages_from_path(args.file)
+    else:
+        name, pages = "bench_synthetic.pdf", args.pages
+        make_pages = lambda: synthetic_pages(args.pages, args.words, args.extract_ms, name)
+
+    print(f"{pages} pages, backend={args.backend}")
+    for mode in ("staged", "pipelined"):
+        run(mode, make_pages, name, pages)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", help="ingest a real document instead of synthetic pages")
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--words", type=int, default=450, help="words per synthetic page")
+    parser.add_argument("--extract-ms", type=float, default=40.0, help="simulated extraction time per page")
+    parser.add_argument("--backend", choices=["local", "qdrant"], default="local")
+    main(parser.parse_args())
@@ -0,0 +1,119 @@
+# bench_payload_indexes.py
+"""
+Filtered-search and delete latency with and without payload indexes.
+
+Fills a scratch collection with random 384-d vectors spread over many
+files, then times the operations that filter on file_name (preferred-file
+search, per-file count and delete-by-file) before and after the payload
+indexes from core.qdrant_store are created. The scratch collection is
+dropped at the end.
+
+Usage (from backend/, with QDRANT_URL / QDRANT_API_KEY in .env; the
+embedded :memory: mode has no payload indexes, so use a real server):
+    python -m benchmarks.bench_payload_indexes --points 100000 --files 500
+"""
+import argparse
+import statistics
+import time
+import uuid
+from typing import Callable, List
+
+import numpy as np
+
+from core import qdrant_manager
+from core.qdrant_store import PAYLOAD_INDEXES, QdrantVectorStore
+
+DIM = 384
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def timed(fn: Callable[[], object], repeats: int) -> List[float]:
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def fill(store: QdrantVectorStore, points: int, files: int, batch: int, rng: np.random.Generator) -> None:
+    for start in range(0, points, batch):
+        size = min(batch, points - start)
+        vectors = rng.standard_normal((size, DIM), dtype=np.float32)
+        payloads = [
+            {
+                "text": f"chunk {start + i}",
+                "page": (start + i) % 300 + 1,
+                "source": f"file_{(start + i) % files}.pdf",
+                "file_id": f"id_{(start + i) % files}",
+                "file_name": f"file_{(start + i) % files}.pdf",
+            }
+            for i in range(size)
+        ]
+        store.upsert([str(uuid.uuid4()) for _ in range(size)], vectors, payloads, wait=True)
+        print(f"\r  uploaded {start + size}/{points}", end="", flush=True)
+    print()
+
+
+def measure(store: QdrantVectorStore, files: int, repeats: int, delete_file: str,
+            rng: np.random.Generator) -> dict:
+    queries = rng.standard_normal((repeats, DIM), dtype=np.float32)
+    names = [f"file_{i % files}.pdf" for i in range(repeats)]
+    it = iter(range(repeats))
+
+    def filtered_search():
+        i = next(it)
+        store.search(queries[i].tolist(), limit=10, file_name=names[i], score_threshold=0.1)
+
+    search = timed(filtered_search, repeats)
+    count = timed(lambda: store.count(file_name=names[0]), repeats)
+    delete = timed(lambda: store.delete_by_file(delete_file), 1)
+    return {"search": search, "count": count, "delete": delete}
+
+
+def report(label: str, results: dict) -> None:
+    for op, latencies in results.items():
+        print(f"{label:>10} {op:<7} p50={percentile(latencies, 50):8.2f}ms  "
+              f"p99={percentile(latencies, 99):8.2f}ms  mean={statistics.mean(latencies):8.2f}ms")
+
+
+def main(points: int, files: int, repeats: int, batch: int) -> None:
+    rng = np.random.default_rng(0)
+    store = QdrantVectorStore(collection_name=f"bench_payload_indexes_{uuid.uuid4().hex[:8]}")
+    client = store.client
+    try:
+        # Create the bare collection first so the "before" numbers are unindexed
+        store._indexes_checked = True
+        store.ensure_collection(DIM)
+        print(f"Filling {store.collection_name} with {points} points across {files} files")
+        fill(store, points, files, batch, rng)
+
+        before = measure(store, files, repeats, "file_0.pdf", rng)
+
+        store._indexes_checked = False
+        start = time.perf_counter()
+        store.ensure_indexes()
+        print(f"Created indexes on {', '.join(PAYLOAD_INDEXES)} in {time.perf_counter() - start:.1f}s")
+
+        after = measure(store, files, repeats, "file_1.pdf", rng)
+
+        report("unindexed", before)
+        report("indexed", after)
+    finally:
+        client.delete_collection(store.collection_name)
+        qdrant_manager.invalidate_collection_cache(store.collection_name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=100_000)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=1000, help="points per upsert while filling")
+    args = parser.parse_args()
+    main(args.points, args.files, args.repeats, args.batch)
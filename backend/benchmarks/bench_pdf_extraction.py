@@ -0,0 +1,88 @@
+# bench_pdf_extraction.py
+"""
+PDF extraction throughput (pages/sec) by number of worker processes.
+
+Extracts the same PDF once per worker count through
+services.file_handler.extract_text_from_file and prints the extraction
+time and pages/sec, so scaling of the page-range sharding in
+services.parallel_pdf can be read off directly. With --endpoint the PDF is
+posted to /test-extraction instead, which always uses the server's
+PDF_EXTRACT_WORKERS processes (clients cannot size the pool); restart the
+server with another PDF_EXTRACT_WORKERS to compare counts.
+
+Scanned documents show the largest gains, since OCR dominates; pass a
+real filing with --file. Without --file a synthetic text PDF is generated
+with PyMuPDF (--pages).
+
+Usage (from backend/):
+    python -m benchmarks.bench_pdf_extraction --file /path/to/scanned_filing.pdf --workers 1 2 4 8 16
+    python -m benchmarks.bench_pdf_extraction --endpoint http://localhost:8000 --file filing.pdf
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def synthetic_pdf(pages: int) -> str:
+    import fitz
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_pdf_"), "synthetic.pdf")
+    doc = fitz.open()
+    for n in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(page.rect + (72, 72, -72, -72),
+                            f"Clause {n}. The supplier shall deliver the goods within thirty days. " * 25)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def via_endpoint(endpoint: str, path: str) -> dict:
+    import httpx
+
+    with open(path, "rb") as f:
+        response = httpx.post(
+            f"{endpoint.rstrip('/')}/test-extraction",
+            files={"file": (os.path.basename(path), f, "application/pdf")},
+            timeout=None,
+        )
+    response.raise_for_status()
+    data = response.json()
+    if "error" in data:
+        raise RuntimeError(data["error"])
+    return {"workers": data["workers"], "pages": data["pages_extracted"], "seconds": data["extraction_s"]}
+
+
+def in_process(path: str, workers: int) -> dict:
+    from services.file_handler import extract_text_from_file
+
+    start = time.perf_counter()
+    pages = extract_text_from_file(os.path.basename(path), path, workers=workers)
+    return {"workers": workers, "pages": len(pages), "seconds": time.perf_counter() - start}
+
+
+def main(args) -> None:
+    path = args.file or synthetic_pdf(args.pages)
+    if args.endpoint:
+        runs = [lambda: via_endpoint(args.endpoint, path)]
+    else:
+        runs = [lambda w=w: in_process(path, w) for w in args.workers]
+
+    print(f"{os.path.basename(path)} via {'/test-extraction' if args.endpoint else 'in-process extraction'}")
+    baseline = None
+    for run in runs:
+        result = run()
+        rate = result["pages"] / result["seconds"]
+        baseline = baseline or rate
+        print(f"workers={result['workers']:<3} {result['pages']:5d} pages  {result['seconds']:8.2f}s  "
+              f"{rate:8.1f} pages/s  x{rate / baseline:4.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", help="PDF to extract (default: synthetic text PDF)")
+    parser.add_argument("--pages", type=int, default=300, help="pages of the synthetic PDF")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="in-process runs only")
+    parser.add_argument("--endpoint", help="backend base URL; benchmarks /test-extraction instead of in-process")
+    main(parser.parse_args())
@@ -0,0 +1,139 @@
+# bench_quantization.py
+"""
+Recall@k vs latency vs memory for the VECTOR_QUANTIZATION settings.
+
+Builds one scratch collection per setting (none, scalar, binary) from the
+same synthetic corpus, waits for the HNSW index and quantized copies to be
+built, then runs the same queries against each with several oversampling
+factors, with and without rescoring. Recall is measured against exact
+cosine top-k computed with NumPy. Memory is the estimated RAM footprint of
+the vectors Qdrant keeps resident (originals unless on disk, plus the
+quantized copy) and the HNSW links.
+
+The synthetic corpus is clustered so that neighbours are meaningful, like
+sentence embeddings. To measure on our own data instead, pass a .npy matrix
+of chunk embeddings with --corpus.
+
+Usage (from backend/, with QDRANT_URL / QDRANT_API_KEY in .env; the
+embedded :memory: mode always searches exactly, so use a real server):
+    python -m benchmarks.bench_quantization --points 100000 --queries 200 --k 10
+"""
+import argparse
+import time
+import uuid
+from typing import List, Optional
+
+import numpy as np
+
+from core import qdrant_manager
+from core.qdrant_store import HNSW_M, QdrantVectorStore, search_params
+
+DIM = 384
+SETTINGS = ["none", "scalar", "binary"]
+
+
+def synthetic_corpus(points: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    labels = rng.integers(0, clusters, points)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((points, dim), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> List[set]:
+    truth = []
+    for query in queries:
+        scores = corpus @ query
+        truth.append(set(np.argpartition(-scores, k)[:k].tolist()))
+    return truth
+
+
+def memory_bytes(setting: str, points: int, dim: int) -> int:
+    originals = 0 if setting != "none" else points * dim * 4  # quantized settings keep originals on disk
+    quantized = {"none": 0, "scalar": points * dim, "binary": points * dim // 8}[setting]
+    links = points * HNSW_M * 2 * 4
+    return originals + quantized + links
+
+
+def wait_until_indexed(store: QdrantVectorStore, points: int, timeout: float = 1800.0) -> None:
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        info = qdrant_manager.get_collection_info(store.collection_name, refresh=True)
+        if str(info.status).endswith("green") and (info.indexed_vectors_count or 0) >= points * 0.99:
+            return
+        time.sleep(2)
+    print(f"  warning: {store.collection_name} still indexing after {timeout:.0f}s")
+
+
+def fill(store: QdrantVectorStore, corpus: np.ndarray, batch: int) -> None:
+    for start in range(0, len(corpus), batch):
+        block = corpus[start:start + batch]
+        ids = list(range(start, start + len(block)))
+        payloads = [{"file_name": "bench.pdf", "page": i % 300 + 1} for i in ids]
+        store.upsert(ids, block, payloads, wait=True)
+
+
+def run_queries(store: QdrantVectorStore, queries: np.ndarray, k: int, truth: List[set]):
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        hits = store.search(query.tolist(), limit=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(expected & {hit.id for hit in hits}) / k)
+    return float(np.mean(recalls)), float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99))
+
+
+def main(points: int, n_queries: int, k: int, oversampling: List[float], corpus_path: Optional[str]) -> None:
+    rng = np.random.default_rng(0)
+    if corpus_path:
+        corpus = np.load(corpus_path).astype(np.float32)
+        corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+    else:
+        corpus = synthetic_corpus(points, DIM, clusters=max(10, points // 500), rng=rng)
+    points, dim = corpus.shape
+    query_rows = rng.choice(points, n_queries, replace=False)
+    queries = corpus[query_rows] + 0.05 * rng.standard_normal((n_queries, dim), dtype=np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = exact_top_k(corpus, queries, k)
+
+    rows = []
+    for setting in SETTINGS:
+        store = QdrantVectorStore(
+            collection_name=f"bench_quantization_{setting}_{uuid.uuid4().hex[:8]}",
+            quantization=setting,
+            on_disk=setting != "none",
+        )
+        try:
+            print(f"Building {store.collection_name} ({points} x {dim})")
+            store._indexes_checked = True  # payload indexes are irrelevant here
+            store.ensure_collection(dim)
+            fill(store, corpus, batch=1000)
+            wait_until_indexed(store, points)
+            memory_mb = memory_bytes(setting, points, dim) / 1e6
+            if setting == "none":
+                recall, p50, p99 = run_queries(store, queries, k, truth)
+                rows.append((setting, "-", "-", recall, p50, p99, memory_mb))
+                continue
+            for rescore in (False, True):
+                for factor in (oversampling if rescore else [1.0]):
+                    store.search_params = search_params(setting, rescore=rescore, oversampling=factor)
+                    recall, p50, p99 = run_queries(store, queries, k, truth)
+                    rows.append((setting, rescore, factor, recall, p50, p99, memory_mb))
+        finally:
+            store.client.delete_collection(store.collection_name)
+            qdrant_manager.invalidate_collection_cache(store.collection_name)
+
+    print(f"\n{'setting':<8} {'rescore':<8} {'oversample':<11} {'recall@' + str(k):<10} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'RAM MB':>9}")
+    for setting, rescore, factor, recall, p50, p99, memory_mb in rows:
+        print(f"{setting:<8} {str(rescore):<8} {str(factor):<11} {recall:<10.3f} {p50:>8.2f} {p99:>8.2f} {memory_mb:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--oversampling", type=float, nargs="+", default=[1.0, 2.0, 4.0])
+    parser.add_argument("--corpus", help="optional .npy matrix of real embeddings instead of synthetic data")
+    args = parser.parse_args()
+    main(args.points, args.queries, args.k, args.oversampling, args.corpus)
@@ -1,3 +1,19 @@
 # app_state.py
+import threading
+
 current_index = None
-current_chunks = []
\ No newline at end of file
+current_chunks = []
+
+# Advances on every upload, delete, scrape and clear so caches derived from
+# the corpus (e.g. the answer cache) can tell when they are stale.
+corpus_version = 0
+_corpus_lock = threading.Lock()
+
+def bump_corpus_version() -> int:
+    global corpus_version
+    with _corpus_lock:
+        corpus_version += 1
+        return corpus_version
+
+def get_corpus_version() -> int:
+    return corpus_version
@@ -0,0 +1,253 @@
+# bm25_index.py
+"""
+In-process BM25 inverted index over chunk texts.
+
+Legal and financial questions often hinge on exact clause numbers, defined
+terms and figures that MiniLM embeddings blur. This index is built at
+ingest time alongside the vectors (same point ids and payloads) and is
+fused with dense results in retrieval via reciprocal-rank fusion. It is
+persisted in SQLite at BM25_INDEX_PATH.
+"""
+import heapq
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from core.logger import get_logger
+from core.vector_store import SearchHit
+
+logger = get_logger("backend.bm25")
+
+_default_path = Path(__file__).resolve().parent.parent / "data" / "bm25_index.db"
+BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", str(_default_path))
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+# chunk_text() splits on punctuation ("12.3" -> "12 . 3"); glue such
+# sequences back together so clause numbers and figures stay one token
+_REJOIN = re.compile(r"(?<=\w) ([.\-/,]) (?=\w)")
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.\-/,][a-z0-9]+)*")
+_SPLIT = re.compile(r"[.\-/,]")
+_SQLITE_HEADER = b"SQLite format 3\x00"
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase word tokens. Compound tokens such as "12.3" or "non-compete"
+    are kept whole and also emitted as their parts.
+    """
+    tokens = []
+    for token in _TOKEN.findall(_REJOIN.sub(r"\1", text.lower())):
+        if token in _STOPWORDS:
+            continue
+        tokens.append(token)
+        if _SPLIT.search(token):
+            tokens.extend(part for part in _SPLIT.split(token) if part and part not in _STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """
+    Postings, document lengths and each chunk's file live in memory; the
+    payloads only on disk, read back for the hits a search returns. The
+    SQLite file holds one row per chunk (its term counts and payload), so
+    adding, removing or deleting a file writes only the rows concerned.
+    """
+
+    def __init__(self, path: Optional[str] = BM25_INDEX_PATH, k1: float = BM25_K1, b: float = BM25_B):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[Any, int]] = defaultdict(dict)
+        self._doc_terms: Dict[Any, List[str]] = {}
+        self._doc_len: Dict[Any, int] = {}
+        self._doc_file: Dict[Any, Optional[str]] = {}
+        self._file_docs: Dict[str, Set[Any]] = defaultdict(set)
+        self._total_len = 0
+        self._dirty = False
+        self._conn = self._connect()
+        self._load()
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self.path:
+            return sqlite3.connect(":memory:", check_same_thread=False)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                header = f.read(len(_SQLITE_HEADER))
+            if header and header != _SQLITE_HEADER:
+                # A pickled index from before the SQLite layout; it is rebuilt from the store
+                logger.info(f"Discarding BM25 index in the old format at {self.path}")
+                os.remove(self.path)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _load(self) -> None:
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS docs (
+                doc_id    TEXT PRIMARY KEY,
+                file_name TEXT,
+                terms     TEXT NOT NULL,
+                payload   TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_docs_file_name ON docs (file_name)")
+        self._conn.commit()
+        for doc_id, file_name, terms in self._conn.execute("SELECT doc_id, file_name, terms FROM docs"):
+            self._index_one(json.loads(doc_id), file_name, json.loads(terms))
+        if self._doc_len:
+            logger.info(f"Loaded BM25 index with {len(self._doc_len)} chunks")
+
+    def _index_one(self, doc_id: Any, file_name: Optional[str], counts: Dict[str, int]) -> None:
+        for term, tf in counts.items():
+            self._postings[term][doc_id] = tf
+        length = sum(counts.values())
+        self._doc_terms[doc_id] = list(counts)
+        self._doc_len[doc_id] = length
+        self._doc_file[doc_id] = file_name
+        self._file_docs[file_name].add(doc_id)
+        self._total_len += length
+
+    def _remove_one(self, doc_id: Any) -> None:
+        for term in self._doc_terms.pop(doc_id, []):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_len -= self._doc_len.pop(doc_id, 0)
+        file_name = self._doc_file.pop(doc_id, None)
+        file_docs = self._file_docs.get(file_name)
+        if file_docs is not None:
+            file_docs.discard(doc_id)
+            if not file_docs:
+                del self._file_docs[file_name]
+
+    def add(self, ids: Iterable[Any], payloads: Iterable[Dict[str, Any]], save: bool = True) -> None:
+        """
+        Index chunk payloads (their "text" field) under the given point ids.
+        With save=False the rows are only committed by a later save(), so
+        ingestion can add batch by batch and commit once per document.
+        """
+        with self._lock:
+            rows = []
+            for doc_id, payload in zip(ids, payloads):
+                counts = Counter(tokenize(payload.get("text", "")))
+                if doc_id in self._doc_len:
+                    self._remove_one(doc_id)
+                self._index_one(doc_id, payload.get("file_name"), counts)
+                rows.append((json.dumps(doc_id), payload.get("file_name"), json.dumps(counts), json.dumps(payload)))
+            self._conn.executemany("INSERT OR REPLACE INTO docs VALUES (?, ?, ?, ?)", rows)
+            self._commit(save)
+
+    def remove_ids(self, ids: Iterable[Any], save: bool = True) -> None:
+        with self._lock:
+            ids = list(ids)
+            for doc_id in ids:
+                self._remove_one(doc_id)
+            self._conn.executemany("DELETE FROM docs WHERE doc_id = ?", [(json.dumps(doc_id),) for doc_id in ids])
+            self._commit(save)
+
+    def _commit(self, save: bool) -> None:
+        self._dirty = True
+        if save:
+            self.save()
+
+    def save(self) -> None:
+        """Commit pending changes."""
+        with self._lock:
+            if self._dirty:
+                self._save()
+                self._dirty = False
+
+    def _save(self) -> None:
+        self._conn.commit()
+
+    def remove_file(self, file_name: str, save: bool = True) -> None:
+        with self._lock:
+            for doc_id in list(self._file_docs.get(file_name, ())):
+                self._remove_one(doc_id)
+            self._conn.execute("DELETE FROM docs WHERE file_name = ?", (file_name,))
+            self._commit(save)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings.clear()
+            self._doc_terms.clear()
+            self._doc_len.clear()
+            self._doc_file.clear()
+            self._file_docs.clear()
+            self._total_len = 0
+            self._conn.execute("DELETE FROM docs")
+            self._commit(True)
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def _payloads_for(self, doc_ids: List[Any]) -> Dict[Any, Dict[str, Any]]:
+        keys = [json.dumps(doc_id) for doc_id in doc_ids]
+        rows = self._conn.execute(
+            f"SELECT doc_id, payload FROM docs WHERE doc_id IN ({','.join('?' * len(keys))})", keys
+        ).fetchall()
+        return {json.loads(doc_id): json.loads(payload) for doc_id, payload in rows}
+
+    def search(self, query: str, limit: int = 10, file_name: Optional[str] = None) -> List[SearchHit]:
+        """Return up to limit hits ranked by BM25 score (only docs sharing a query term)."""
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if not terms or not n_docs:
+                return []
+            allowed = self._file_docs.get(file_name, set()) if file_name else None
+            avg_len = self._total_len / n_docs
+            scores: Dict[Any, float] = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log((n_docs - len(postings) + 0.5) / (len(postings) + 0.5) + 1)
+                for doc_id, tf in postings.items():
+                    if allowed is not None and doc_id not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_len[doc_id] / avg_len)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+            top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            if not top:
+                return []
+            payloads = self._payloads_for([doc_id for doc_id, _ in top])
+            return [SearchHit(doc_id, score, payloads.get(doc_id, {})) for doc_id, score in top]
+
+
+_index: Optional[BM25Index] = None
+_index_lock = threading.Lock()
+
+
+def get_bm25_index() -> BM25Index:
+    """Return the process-wide BM25 index, loading it from disk on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = BM25Index()
+    return _index
+
+
+__all__ = [
+    'BM25_INDEX_PATH',
+    'tokenize',
+    'BM25Index',
+    'get_bm25_index'
+]
@@ -0,0 +1,185 @@
+# embedder.py
+"""
+Process-wide registry for sentence embedding models.
+
+Loading a model costs hundreds of milliseconds and ~100 MB of allocations,
+so every code path that embeds text should go through get_embedder()
+instead of constructing its own model. The inference backend (PyTorch or
+ONNX Runtime) is chosen by EMBEDDER_BACKEND, see core.embedding_backends.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from core.cache import LRUCache
+from core.embedding_backends import EMBEDDER_BACKEND, EmbeddingBackend, load_backend
+from core.logger import get_logger
+from core.metrics import register_metrics
+from core.micro_batcher import MicroBatcher
+
+logger = get_logger("backend.embedder")
+
+EMBEDDER_MODEL = os.getenv("EMBEDDER_MODEL", "all-MiniLM-L6-v2")
+# Bounded pool for CPU-bound encode() calls made from async code. Torch
+# already uses several intra-op threads, so a small pool is enough.
+EMBEDDER_THREADS = int(os.getenv("EMBEDDER_THREADS", "2"))
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "3600"))
+# Concurrent query embeddings are coalesced into one encode() call: wait at
+# most QUERY_BATCH_MAX_WAIT_MS for up to QUERY_BATCH_MAX_SIZE questions
+QUERY_MICRO_BATCHING = os.getenv("QUERY_MICRO_BATCHING", "true").lower() == "true"
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+QUERY_BATCH_MAX_WAIT_MS = float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", "2"))
+
+_models: Dict[str, EmbeddingBackend] = {}
+_stats: Dict[str, Dict[str, Any]] = {}
+_lock = threading.Lock()
+_encode_executor = ThreadPoolExecutor(max_workers=EMBEDDER_THREADS, thread_name_prefix="embedder")
+
+# Users repeat and lightly rephrase questions, and suggestion cards send the
+# exact same strings, so query vectors are cached by normalized text.
+query_embedding_cache = LRUCache(max_size=QUERY_CACHE_SIZE, ttl_seconds=QUERY_CACHE_TTL)
+register_metrics("query_embedding_cache", query_embedding_cache.stats)
+
+_query_batchers: Dict[str, MicroBatcher] = {}
+
+
+def get_embedder(model_name: str = EMBEDDER_MODEL) -> EmbeddingBackend:
+    """
+    Return the shared model for model_name, loading it on first use.
+    Safe to call from multiple threads; the model is only loaded once.
+    """
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(model_name)
+        if model is None:
+            logger.info(f"Loading embedding model: {model_name} ({EMBEDDER_BACKEND} backend)")
+            start = time.perf_counter()
+            model = load_backend(model_name, EMBEDDER_BACKEND)
+            load_ms = (time.perf_counter() - start) * 1000
+            _models[model_name] = model
+            _stats[model_name] = {
+                "backend": model.name,
+                "load_time_ms": round(load_ms, 2),
+                "loaded_at": time.time(),
+                "warmed_up": False,
+                "warmup_time_ms": None,
+                "dimension": model.get_sentence_embedding_dimension(),
+            }
+            logger.info(f"Loaded embedding model {model_name} in {load_ms:.0f} ms")
+    return model
+
+
+def warm_up_embedder(model_name: str = EMBEDDER_MODEL) -> Dict[str, Any]:
+    """
+    Load the model and run a dummy encode so the first real request does not
+    pay for lazy initialisation inside torch/onnxruntime/tokenizers.
+    """
+    model = get_embedder(model_name)
+    start = time.perf_counter()
+    model.encode(["warm-up"])
+    warmup_ms = (time.perf_counter() - start) * 1000
+    with _lock:
+        _stats[model_name]["warmed_up"] = True
+        _stats[model_name]["warmup_time_ms"] = round(warmup_ms, 2)
+    logger.info(f"Warmed up embedding model {model_name} in {warmup_ms:.0f} ms")
+    return embedder_status(model_name)
+
+
+async def encode_async(texts: List[str], model_name: str = EMBEDDER_MODEL) -> np.ndarray:
+    """
+    Encode texts in the bounded encoder pool so async endpoints never run
+    the CPU-bound forward pass on the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _encode_executor, lambda: get_embedder(model_name).encode(texts, convert_to_numpy=True)
+    )
+
+
+def normalize_query(text: str) -> str:
+    """Collapse whitespace and case so trivially different questions share a cache entry."""
+    return " ".join(text.split()).lower()
+
+
+def embed_query(text: str, model_name: str = EMBEDDER_MODEL) -> np.ndarray:
+    """
+    Embed a single search query, serving repeats from the query cache.
+    """
+    key = (model_name, normalize_query(text))
+    vector = query_embedding_cache.get(key)
+    if vector is None:
+        vector = get_embedder(model_name).encode([text], convert_to_numpy=True)[0]
+        query_embedding_cache.set(key, vector)
+    return vector
+
+
+def _query_batcher(model_name: str) -> MicroBatcher:
+    batcher = _query_batchers.get(model_name)
+    if batcher is None:
+        with _lock:
+            batcher = _query_batchers.get(model_name)
+            if batcher is None:
+                batcher = MicroBatcher(
+                    lambda texts: get_embedder(model_name).encode(texts, convert_to_numpy=True),
+                    max_batch_size=QUERY_BATCH_MAX_SIZE,
+                    max_wait_ms=QUERY_BATCH_MAX_WAIT_MS,
+                    executor=_encode_executor,
+                    max_concurrent_batches=EMBEDDER_THREADS,
+                )
+                _query_batchers[model_name] = batcher
+    return batcher
+
+
+def query_batcher_stats() -> Dict[str, Any]:
+    return {model_name: batcher.stats() for model_name, batcher in _query_batchers.items()}
+
+
+register_metrics("query_micro_batcher", query_batcher_stats)
+
+
+async def embed_query_async(text: str, model_name: str = EMBEDDER_MODEL) -> np.ndarray:
+    """
+    Async counterpart of embed_query; cache misses from concurrent requests
+    are micro-batched into one encode() call in the bounded encoder pool.
+    """
+    key = (model_name, normalize_query(text))
+    vector = query_embedding_cache.get(key)
+    if vector is None:
+        if QUERY_MICRO_BATCHING:
+            vector = await _query_batcher(model_name).submit(text)
+        else:
+            vector = (await encode_async([text], model_name))[0]
+        query_embedding_cache.set(key, vector)
+    return vector
+
+
+def embedder_status(model_name: Optional[str] = EMBEDDER_MODEL) -> Dict[str, Any]:
+    """
+    Readiness information for the health endpoint.
+    """
+    stats = _stats.get(model_name)
+    if stats is None:
+        return {"model": model_name, "ready": False, "loaded": False}
+    return {"model": model_name, "ready": stats["warmed_up"], "loaded": True, **stats}
+
+
+__all__ = [
+    'EMBEDDER_MODEL',
+    'get_embedder',
+    'warm_up_embedder',
+    'encode_async',
+    'normalize_query',
+    'embed_query',
+    'embed_query_async',
+    'query_batcher_stats',
+    'query_embedding_cache',
+    'embedder_status'
+]
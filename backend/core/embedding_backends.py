@@ -0,0 +1,200 @@
+# embedding_backends.py
+"""
+Interchangeable inference backends for the sentence embedding model.
+
+Every backend exposes the subset of the SentenceTransformer API the rest of
+the backend uses (encode() and get_sentence_embedding_dimension()) and
+produces the same vectors, so switching EMBEDDER_BACKEND does not require
+re-indexing the collection:
+
+- "torch": sentence-transformers on PyTorch (default)
+- "onnx": the same transformer exported to ONNX and run with ONNX Runtime
+- "onnx-int8": the ONNX export with weights dynamically quantized to int8
+
+The ONNX file is exported from the Hugging Face checkpoint on first use and
+kept under ONNX_MODEL_DIR; see export_onnx(). The ONNX backends need the
+onnxruntime package (listed in requirements.txt); without it they fail to
+load with an ImportError naming the package rather than falling back.
+"""
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Union
+
+import numpy as np
+
+from core.logger import get_logger
+
+logger = get_logger("backend.embedding_backends")
+
+EMBEDDER_BACKEND = os.getenv("EMBEDDER_BACKEND", "torch").lower()
+_default_onnx_dir = Path(__file__).resolve().parent.parent / "data" / "onnx"
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", str(_default_onnx_dir))
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))  # 0: let ONNX Runtime decide
+
+# all-MiniLM-L6-v2 truncates at 256 word pieces (sentence-transformers max_seq_length)
+MAX_SEQ_LENGTH = 256
+
+
+class EmbeddingBackend(ABC):
+    name = "base"
+
+    @abstractmethod
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True) -> np.ndarray:
+        """Return one float32 row per sentence (a single vector for a str)."""
+
+    @abstractmethod
+    def get_sentence_embedding_dimension(self) -> int: ...
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    name = "torch"
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=False, convert_to_numpy=True):
+        return self.model.encode(sentences, batch_size=batch_size, show_progress_bar=show_progress_bar,
+                                 convert_to_numpy=True)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+
+def _import_onnxruntime(backend: str):
+    try:
+        import onnxruntime
+    except ImportError as e:
+        raise ImportError(
+            f"the {backend} embedding backend needs onnxruntime: pip install onnxruntime "
+            f"(or set EMBEDDER_BACKEND=torch)"
+        ) from e
+    return onnxruntime
+
+
+def _hub_id(model_name: str) -> str:
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+def onnx_model_path(model_name: str, quantize: bool) -> Path:
+    directory = Path(ONNX_MODEL_DIR) / model_name.replace("/", "__")
+    return directory / ("model_int8.onnx" if quantize else "model.onnx")
+
+
+def export_onnx(model_name: str, quantize: bool = False) -> Path:
+    """
+    Export the transformer of model_name to ONNX (and optionally an int8
+    dynamically quantized copy) under ONNX_MODEL_DIR. Needs torch and
+    transformers, which sentence-transformers already pulls in.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    fp32_path = onnx_model_path(model_name, quantize=False)
+    fp32_path.parent.mkdir(parents=True, exist_ok=True)
+    if not fp32_path.exists():
+        logger.info(f"Exporting {model_name} to ONNX at {fp32_path}")
+        tokenizer = AutoTokenizer.from_pretrained(_hub_id(model_name))
+        model = AutoModel.from_pretrained(_hub_id(model_name)).eval()
+        sample = tokenizer(["export sample"], return_tensors="pt")
+        axes = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+                str(fp32_path),
+                input_names=["input_ids", "attention_mask", "token_type_ids"],
+                output_names=["last_hidden_state"],
+                dynamic_axes={"input_ids": axes, "attention_mask": axes, "token_type_ids": axes,
+                              "last_hidden_state": axes},
+                opset_version=14,
+            )
+        tokenizer.save_pretrained(str(fp32_path.parent))
+
+    if not quantize:
+        return fp32_path
+
+    int8_path = onnx_model_path(model_name, quantize=True)
+    if not int8_path.exists():
+        _import_onnxruntime("onnx-int8")
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info(f"Quantizing {fp32_path.name} to int8 at {int8_path}")
+        quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+    return int8_path
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    Tokenizer + ONNX transformer + the mean pooling and L2 normalisation
+    that the sentence-transformers pipeline of MiniLM applies.
+    """
+
+    def __init__(self, model_name: str, quantize: bool = False):
+        self.name = "onnx-int8" if quantize else "onnx"
+        ort = _import_onnxruntime(self.name)
+        from transformers import AutoTokenizer
+
+        path = onnx_model_path(model_name, quantize)
+        if not path.exists():
+            path = export_onnx(model_name, quantize)
+        self.tokenizer = AutoTokenizer.from_pretrained(str(path.parent))
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if ONNX_THREADS:
+            options.intra_op_num_threads = ONNX_THREADS
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self._dimension = None
+
+    def _encode_batch(self, batch: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(batch, padding=True, truncation=True, max_length=MAX_SEQ_LENGTH, return_tensors="np")
+        feeds = {name: encoded[name].astype(np.int64) for name in self._input_names if name in encoded}
+        hidden = self.session.run(None, feeds)[0]
+        mask = encoded["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=False, convert_to_numpy=True):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        # Sort by length so each batch pads to a similar sequence length
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            for row, vector in zip(rows, self._encode_batch([texts[i] for i in rows])):
+                out[row] = vector
+        vectors = np.stack(out).astype(np.float32)
+        return vectors[0] if single else vectors
+
+    def get_sentence_embedding_dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = int(self._encode_batch(["dimension probe"]).shape[1])
+        return self._dimension
+
+
+def load_backend(model_name: str, backend: str = EMBEDDER_BACKEND) -> EmbeddingBackend:
+    if backend == "torch":
+        return SentenceTransformerBackend(model_name)
+    if backend == "onnx":
+        return OnnxBackend(model_name, quantize=False)
+    if backend == "onnx-int8":
+        return OnnxBackend(model_name, quantize=True)
+    raise ValueError(f"Unknown EMBEDDER_BACKEND: {backend}")
+
+
+__all__ = [
+    'EMBEDDER_BACKEND',
+    'EmbeddingBackend',
+    'SentenceTransformerBackend',
+    'OnnxBackend',
+    'export_onnx',
+    'load_backend'
+]
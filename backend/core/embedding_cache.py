@@ -0,0 +1,188 @@
+# embedding_cache.py
+"""
+Persistent cache of chunk embeddings, backed by SQLite.
+
+Re-uploading a file re-embeds every chunk even when little of the text
+changed, and many documents share boilerplate clauses, disclaimers and
+headers. Vectors are stored under (model name, inference backend, SHA-256
+of the chunk text) so the ingestion engine only encodes text it has never
+seen; the backend ("torch", "onnx", "onnx-int8") is part of the key because
+the ONNX and int8 vectors differ slightly from the torch ones. The cache is
+capped at EMBEDDING_CACHE_MAX_ENTRIES and evicts least recently used rows.
+The row count is tracked as rows are written rather than counted on every
+put, and recounted every _RECOUNT_EVERY puts to pick up rows written by
+other processes sharing the file.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from core.embedding_backends import EMBEDDER_BACKEND
+from core.logger import get_logger
+from core.metrics import register_metrics
+
+logger = get_logger("backend.embedding_cache")
+
+_default_path = Path(__file__).resolve().parent.parent / "data" / "embedding_cache.db"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", str(_default_path))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+
+# SQLite limits the number of bound parameters per statement
+_QUERY_CHUNK = 500
+_RECOUNT_EVERY = 1000
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")]
+        if columns and "backend" not in columns:
+            # Rows from before the backend was part of the key cannot be attributed to one
+            logger.info("Dropping embedding cache entries that are not keyed by backend")
+            self._conn.execute("DROP TABLE embeddings")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model     TEXT NOT NULL,
+                backend   TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                dim       INTEGER NOT NULL,
+                vector    BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, backend, text_hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._entries = self._count()
+        self._puts_since_count = 0
+
+    def get_many(self, model: str, texts: Sequence[str], backend: str = EMBEDDER_BACKEND) -> Dict[int, np.ndarray]:
+        """Return {position in texts: float32 vector} for the cached texts."""
+        hashes = [text_hash(t) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            unique = list(dict.fromkeys(hashes))
+            for start in range(0, len(unique), _QUERY_CHUNK):
+                part = unique[start:start + _QUERY_CHUNK]
+                rows = self._conn.execute(
+                    "SELECT text_hash, vector FROM embeddings WHERE model = ? AND backend = ? "
+                    f"AND text_hash IN ({','.join('?' * len(part))})",
+                    [model, backend, *part],
+                ).fetchall()
+                found.update((h, np.frombuffer(blob, dtype=np.float32)) for h, blob in rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND backend = ? AND text_hash = ?",
+                    [(now, model, backend, h) for h in found],
+                )
+                self._conn.commit()
+            result = {i: found[h] for i, h in enumerate(hashes) if h in found}
+            self.hits += len(result)
+            self.misses += len(texts) - len(result)
+        return result
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: np.ndarray,
+                 backend: str = EMBEDDER_BACKEND) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        now = time.time()
+        rows = [
+            (model, backend, text_hash(text), vectors.shape[1], vector.tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            # Update the rows that exist, then insert the rest, so the insert's
+            # rowcount is exactly the number of new rows
+            self._conn.executemany(
+                "UPDATE embeddings SET dim = ?, vector = ?, last_used = ? WHERE model = ? AND backend = ? AND text_hash = ?",
+                [(dim, vector, used, m, b, h) for m, b, h, dim, vector, used in rows],
+            )
+            inserted = self._conn.executemany("INSERT OR IGNORE INTO embeddings VALUES (?, ?, ?, ?, ?, ?)", rows).rowcount
+            self._entries += inserted
+            self._puts_since_count += 1
+            if self._puts_since_count >= _RECOUNT_EVERY:
+                self._entries = self._count()
+                self._puts_since_count = 0
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        excess = self._entries - self.max_entries
+        if excess <= 0:
+            return
+        evicted = self._conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        ).rowcount
+        self._entries -= evicted
+        self.evictions += evicted
+        logger.info(f"Evicted {evicted} least recently used embeddings")
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._entries = 0
+
+    def __len__(self) -> int:
+        return self._entries
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Return the process-wide cache, or None when EMBEDDING_CACHE_ENABLED is false."""
+    global _cache
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+                register_metrics("embedding_cache", _cache.stats)
+    return _cache
+
+
+__all__ = [
+    'EMBEDDING_CACHE_PATH',
+    'text_hash',
+    'EmbeddingCache',
+    'get_embedding_cache'
+]
@@ -0,0 +1,377 @@
+# extraction_cache.py
+"""
+Persistent cache of extracted document pages, backed by SQLite.
+
+The same PDF is often uploaded under another filename, or again after an
+unrelated failure, and every upload re-parsed (and re-rendered for OCR)
+the whole document. Extraction output is stored under (SHA-256 of the
+uploaded bytes, extractor key): the extractor key names the extractor
+version, file type and OCR settings, so a change to any of them misses
+instead of serving stale text. The source is the filename of the upload
+being served, not the one that filled the cache.
+
+Streaming ingestion keeps memory flat however long the document is, and
+the cache must not undo that: pages are written as they are extracted, as
+zlib-compressed JSON [text, page] pairs in rows of _PAGES_PER_CHUNK pages,
+and served back one row at a time. The document's entry in extractions is
+only written once every page is stored, so an extraction that fails or is
+abandoned part way leaves nothing behind. A document whose compressed
+pages exceed EXTRACTION_CACHE_MAX_BYTES is not recorded at all, and the
+cache as a whole holds at most EXTRACTION_CACHE_MAX_BYTES, evicting least
+recently used documents.
+
+A page whose OCR was deferred is stored with text None. Such an entry
+serves callers that defer OCR themselves, and is completed by fill_pages
+once the background OCR has run.
+"""
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from core.logger import get_logger
+from core.metrics import register_metrics
+
+logger = get_logger("backend.extraction_cache")
+
+_default_path = Path(__file__).resolve().parent.parent / "data" / "extraction_cache.db"
+EXTRACTION_CACHE_PATH = os.getenv("EXTRACTION_CACHE_PATH", str(_default_path))
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() == "true"
+
+_PAGES_PER_CHUNK = 16
+
+Page = Tuple[Optional[str], int, str]
+
+
+def _encode(pages: List[Tuple[Optional[str], int]]) -> bytes:
+    return zlib.compress(json.dumps(pages, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def _decode(blob: bytes) -> List[Tuple[Optional[str], int]]:
+    return [(text, page) for text, page in json.loads(zlib.decompress(blob).decode("utf-8"))]
+
+
+class _EntryGone(Exception):
+    """A chunk of the entry being read was evicted or replaced meanwhile."""
+
+
+class _Recorder:
+    """Writes a document's pages to the cache _PAGES_PER_CHUNK at a time as they arrive."""
+
+    def __init__(self, cache: "ExtractionCache", content_hash: str, extractor: str):
+        self.cache = cache
+        self.key = (content_hash, extractor)
+        self.buffer: List[Tuple[Optional[str], int]] = []
+        self.chunks = 0
+        self.size = 0
+        self.pending = 0
+        self.active = True
+        # Whatever is stored under the key (e.g. an entry awaiting OCR) is being replaced
+        with cache._lock:
+            cache._delete(*self.key)
+            cache._conn.commit()
+
+    def add(self, text: Optional[str], page: int) -> None:
+        if not self.active:
+            return
+        self.buffer.append((text, page))
+        self.pending += text is None
+        if len(self.buffer) >= _PAGES_PER_CHUNK:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self.buffer:
+            return
+        blob = _encode(self.buffer)
+        self.buffer = []
+        self.size += len(blob)
+        if self.size > self.cache.max_bytes:
+            logger.info(f"Not caching extraction of {self.key[0][:12]}: more than {self.cache.max_bytes} bytes")
+            self.abort()
+            return
+        with self.cache._lock:
+            self.cache._conn.execute(
+                "INSERT OR REPLACE INTO extraction_chunks VALUES (?, ?, ?, ?)", (*self.key, self.chunks, blob)
+            )
+            self.cache._conn.commit()
+        self.chunks += 1
+
+    def finish(self) -> None:
+        """Store the remaining pages and publish the entry."""
+        self._flush()
+        if not self.active:
+            return
+        self.active = False
+        with self.cache._lock:
+            self.cache._conn.execute(
+                "INSERT OR REPLACE INTO extractions VALUES (?, ?, ?, ?, ?, ?)",
+                (*self.key, self.chunks, self.size, self.pending, time.time()),
+            )
+            self.cache._evict()
+            self.cache._conn.commit()
+
+    def abort(self) -> None:
+        """Drop the pages stored so far."""
+        if not self.active:
+            return
+        self.active = False
+        self.buffer = []
+        with self.cache._lock:
+            self.cache._delete(*self.key)
+            self.cache._conn.commit()
+
+
+class ExtractionCache:
+    def __init__(self, path: str = EXTRACTION_CACHE_PATH, max_bytes: int = EXTRACTION_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(extractions)")]
+        if "pages" in columns:
+            # Whole-document rows from before pages were stored in chunks
+            logger.info("Dropping extraction cache entries stored as whole documents")
+            self._conn.execute("DROP TABLE extractions")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS extractions (
+                content_hash TEXT NOT NULL,
+                extractor    TEXT NOT NULL,
+                chunks       INTEGER NOT NULL,
+                size         INTEGER NOT NULL,
+                pending      INTEGER NOT NULL,
+                last_used    REAL NOT NULL,
+                PRIMARY KEY (content_hash, extractor)
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS extraction_chunks (
+                content_hash TEXT NOT NULL,
+                extractor    TEXT NOT NULL,
+                chunk        INTEGER NOT NULL,
+                pages        BLOB NOT NULL,
+                PRIMARY KEY (content_hash, extractor, chunk)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_extractions_last_used ON extractions (last_used)")
+        # Chunks of extractions that were interrupted by a restart
+        self._conn.execute(
+            """
+            DELETE FROM extraction_chunks WHERE NOT EXISTS (
+                SELECT 1 FROM extractions e
+                WHERE e.content_hash = extraction_chunks.content_hash AND e.extractor = extraction_chunks.extractor
+            )
+            """
+        )
+        self._conn.commit()
+
+    def _lookup(self, content_hash: str, extractor: str, allow_pending: bool) -> Optional[int]:
+        """Chunk count of a usable entry, marking it used, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT chunks, pending FROM extractions WHERE content_hash = ? AND extractor = ?",
+                (content_hash, extractor),
+            ).fetchone()
+            if row is None or (row[1] and not allow_pending):
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE extractions SET last_used = ? WHERE content_hash = ? AND extractor = ?",
+                (time.time(), content_hash, extractor),
+            )
+            self._conn.commit()
+            self.hits += 1
+        return row[0]
+
+    def _iter_chunks(self, content_hash: str, extractor: str, chunks: int) -> Iterator[Tuple[int, bytes]]:
+        for chunk in range(chunks):
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT pages FROM extraction_chunks WHERE content_hash = ? AND extractor = ? AND chunk = ?",
+                    (content_hash, extractor, chunk),
+                ).fetchone()
+            if row is None:
+                raise _EntryGone()
+            yield chunk, row[0]
+
+    def get(self, content_hash: str, extractor: str,
+            allow_pending: bool = False) -> Optional[List[Tuple[Optional[str], int]]]:
+        """
+        Cached [(text, page)] for the document, or None. Entries with pages
+        still awaiting OCR only count with allow_pending. Loads the whole
+        document; iter_pages serves it page by page.
+        """
+        chunks = self._lookup(content_hash, extractor, allow_pending)
+        if chunks is None:
+            return None
+        try:
+            return [page for _, blob in self._iter_chunks(content_hash, extractor, chunks) for page in _decode(blob)]
+        except _EntryGone:
+            return None
+
+    def put(self, content_hash: str, extractor: str, pages: List[Tuple[Optional[str], int]]) -> None:
+        recorder = _Recorder(self, content_hash, extractor)
+        for text, page in pages:
+            recorder.add(text, page)
+        recorder.finish()
+
+    def fill_pages(self, content_hash: str, extractor: str, texts: Dict[int, str]) -> bool:
+        """Set the text of pages whose OCR was deferred. False if the entry is gone."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT chunks FROM extractions WHERE content_hash = ? AND extractor = ?",
+                (content_hash, extractor),
+            ).fetchone()
+        if row is None:
+            return False
+        size = pending = 0
+        try:
+            for chunk, blob in self._iter_chunks(content_hash, extractor, row[0]):
+                pages = _decode(blob)
+                if any(text is None for text, _ in pages):
+                    pages = [(texts.get(page) if text is None else text, page) for text, page in pages]
+                    blob = _encode(pages)
+                    with self._lock:
+                        self._conn.execute(
+                            "UPDATE extraction_chunks SET pages = ? "
+                            "WHERE content_hash = ? AND extractor = ? AND chunk = ?",
+                            (blob, content_hash, extractor, chunk),
+                        )
+                        self._conn.commit()
+                size += len(blob)
+                pending += sum(1 for text, _ in pages if text is None)
+        except _EntryGone:
+            return False
+        with self._lock:
+            self._conn.execute(
+                "UPDATE extractions SET size = ?, pending = ?, last_used = ? WHERE content_hash = ? AND extractor = ?",
+                (size, pending, time.time(), content_hash, extractor),
+            )
+            self._evict()
+            self._conn.commit()
+        return True
+
+    def iter_pages(self, content_hash: str, extractor: str, source: str,
+                   extract: Callable[[], Iterator[Page]], allow_pending: bool = False) -> Iterator[Page]:
+        """
+        Yield the document's (text, page, source) tuples from the cache, or
+        from extract() while recording them. Only a complete extraction is
+        stored; one that fails or is abandoned part way is not.
+        """
+        chunks = self._lookup(content_hash, extractor, allow_pending)
+        if chunks is not None:
+            logger.info(f"Serving extracted pages of {source} from the extraction cache")
+            served = 0
+            try:
+                for _, blob in self._iter_chunks(content_hash, extractor, chunks):
+                    for text, page in _decode(blob):
+                        yield (text, page, source)
+                        served += 1
+                return
+            except _EntryGone:
+                logger.info(f"Cached extraction of {source} was evicted while being served; extracting the rest")
+            yield from itertools.islice(extract(), served, None)
+            return
+
+        recorder = _Recorder(self, content_hash, extractor)
+        complete = False
+        try:
+            for text, page, page_source in extract():
+                recorder.add(text, page)
+                yield (text, page, page_source)
+            complete = True
+        finally:
+            if complete:
+                recorder.finish()
+            else:
+                recorder.abort()
+
+    def _delete(self, content_hash: str, extractor: str) -> None:
+        self._conn.execute(
+            "DELETE FROM extractions WHERE content_hash = ? AND extractor = ?", (content_hash, extractor)
+        )
+        self._conn.execute(
+            "DELETE FROM extraction_chunks WHERE content_hash = ? AND extractor = ?", (content_hash, extractor)
+        )
+
+    def _evict(self) -> None:
+        total = self._size()
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        rows = self._conn.execute(
+            "SELECT content_hash, extractor, size FROM extractions ORDER BY last_used"
+        ).fetchall()
+        for content_hash, extractor, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._delete(content_hash, extractor)
+            total -= size
+            evicted += 1
+        self.evictions += evicted
+        logger.info(f"Evicted {evicted} least recently used extractions")
+
+    def _size(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM extractions")
+            self._conn.execute("DELETE FROM extraction_chunks")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        with self._lock:
+            size = self._size()
+        return {
+            "entries": len(self),
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+_cache: Optional[ExtractionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> Optional[ExtractionCache]:
+    """Return the process-wide cache, or None when EXTRACTION_CACHE_ENABLED is false."""
+    global _cache
+    if not EXTRACTION_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ExtractionCache()
+                register_metrics("extraction_cache", _cache.stats)
+    return _cache
+
+
+__all__ = [
+    'EXTRACTION_CACHE_PATH',
+    'ExtractionCache',
+    'get_extraction_cache'
+]
@@ -0,0 +1,178 @@
+# file_catalog.py
+"""
+Local catalog of ingested files, backed by SQLite.
+
+Listing files used to scroll the whole Qdrant collection (payloads and all)
+and silently stopped at the first 5000 points. Ingestion and deletion keep
+this catalog up to date instead, so /files, /ask and /database-status can
+answer from a single local query.
+
+pending_ocr_pages counts the pages of a file whose text still waits for
+background OCR (see data_processing.ingest_pipeline.ingest_ocr_pages).
+"""
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.logger import get_logger
+
+logger = get_logger("backend.file_catalog")
+
+_default_path = Path(__file__).resolve().parent.parent / "data" / "file_catalog.db"
+FILE_CATALOG_PATH = os.getenv("FILE_CATALOG_PATH", str(_default_path))
+
+_COLUMNS = ("file_id", "file_name", "source_type", "page_count", "chunk_count", "created_at", "content_hash",
+            "pending_ocr_pages")
+
+_UPDATE_COLUMNS = ", ".join(
+    f"{column} = excluded.{column}" for column in _COLUMNS if column not in ("file_name", "created_at")
+)
+
+# Columns added after the first release: name -> definition for ALTER TABLE
+_MIGRATIONS = {
+    "pending_ocr_pages": "INTEGER NOT NULL DEFAULT 0",
+}
+
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(FILE_CATALOG_PATH), exist_ok=True)
+        conn = sqlite3.connect(FILE_CATALOG_PATH, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                file_name    TEXT PRIMARY KEY,
+                file_id      TEXT NOT NULL,
+                source_type  TEXT,
+                page_count   INTEGER NOT NULL DEFAULT 0,
+                chunk_count  INTEGER NOT NULL DEFAULT 0,
+                created_at   TEXT NOT NULL,
+                content_hash TEXT,
+                pending_ocr_pages INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(files)")}
+        for column, definition in _MIGRATIONS.items():
+            if column not in existing:
+                logger.info(f"Adding column '{column}' to the file catalog")
+                conn.execute(f"ALTER TABLE files ADD COLUMN {column} {definition}")
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+def source_type_for(file_name: str) -> str:
+    """Classify a file name as 'web' or by its extension (pdf, docx, ...)."""
+    if file_name.startswith("web_"):
+        return "web"
+    ext = os.path.splitext(file_name)[1].lower().lstrip(".")
+    return ext or "unknown"
+
+
+def upsert_file(
+    file_name: str,
+    file_id: str,
+    page_count: int,
+    chunk_count: int,
+    content_hash: Optional[str] = None,
+    source_type: Optional[str] = None,
+    created_at: Optional[str] = None,
+    pending_ocr_pages: int = 0,
+) -> None:
+    """
+    Insert the catalog entry for file_name, or update an existing one. An
+    existing entry keeps its created_at: re-ingesting or OCR backfill does
+    not make a file new.
+    """
+    row = (
+        file_id,
+        file_name,
+        source_type or source_type_for(file_name),
+        page_count,
+        chunk_count,
+        created_at or datetime.now().isoformat(),
+        content_hash,
+        pending_ocr_pages,
+    )
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            f"INSERT INTO files ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))}) "
+            f"ON CONFLICT(file_name) DO UPDATE SET {_UPDATE_COLUMNS}",
+            row,
+        )
+        conn.commit()
+    logger.debug(f"Catalog updated for {file_name}: {chunk_count} chunks, {page_count} pages")
+
+
+def update_ocr_progress(file_name: str, pages_done: int, chunk_count: int) -> None:
+    """Record that pages_done pending OCR pages were indexed; the file now has chunk_count chunks."""
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "UPDATE files SET pending_ocr_pages = MAX(0, pending_ocr_pages - ?), chunk_count = ? "
+            "WHERE file_name = ?",
+            (pages_done, chunk_count, file_name),
+        )
+        conn.commit()
+
+
+def remove_file(file_name: str) -> bool:
+    """Drop file_name from the catalog. Returns True if it was present."""
+    with _lock:
+        conn = _get_conn()
+        cursor = conn.execute("DELETE FROM files WHERE file_name = ?", (file_name,))
+        conn.commit()
+    return cursor.rowcount > 0
+
+
+def clear_catalog() -> None:
+    """Remove every catalog entry."""
+    with _lock:
+        conn = _get_conn()
+        conn.execute("DELETE FROM files")
+        conn.commit()
+
+
+def get_file(file_name: str) -> Optional[Dict[str, Any]]:
+    """Return the catalog entry for file_name, or None."""
+    with _lock:
+        row = _get_conn().execute("SELECT * FROM files WHERE file_name = ?", (file_name,)).fetchone()
+    return dict(row) if row else None
+
+
+def list_catalog_files() -> List[Dict[str, Any]]:
+    """Return every catalog entry, oldest first."""
+    with _lock:
+        rows = _get_conn().execute("SELECT * FROM files ORDER BY created_at").fetchall()
+    return [dict(row) for row in rows]
+
+
+def has_files() -> bool:
+    """Cheap existence check used by /ask."""
+    with _lock:
+        row = _get_conn().execute("SELECT 1 FROM files LIMIT 1").fetchone()
+    return row is not None
+
+
+__all__ = [
+    'FILE_CATALOG_PATH',
+    'source_type_for',
+    'upsert_file',
+    'update_ocr_progress',
+    'remove_file',
+    'clear_catalog',
+    'get_file',
+    'list_catalog_files',
+    'has_files'
+]
@@ -0,0 +1,427 @@
+# local_store.py
+"""
+In-process VectorStore for small single-node deployments and offline tests.
+
+Vectors live in a preallocated, memory-mapped matrix file (float32 or
+float16, see LOCAL_STORE_DTYPE) that grows geometrically; an upsert writes
+only its own rows. Ids, file names and payloads are rows of a SQLite table
+next to it, written per batch. Vectors are L2-normalised on insert, so
+cosine similarity is a dot product. Unfiltered searches use a FAISS
+inner-product index when faiss is installed; filtered searches, and
+everything when faiss is missing, use brute-force NumPy over the rows of
+the file, found through an in-memory file_name -> rows map.
+
+Deletes are tombstones that get compacted once they outnumber live rows.
+Compaction writes a new matrix file and switches to it in the same SQLite
+transaction that renumbers the rows. Stores in the older vectors.npy +
+points.json layout are converted on first open.
+"""
+import json
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from core.logger import get_logger
+from core.vector_store import PayloadFields, SearchHit, SearchQuery, StoredPoint, Vectors, VectorStore
+
+try:
+    import faiss
+except ImportError:  # optional dependency
+    faiss = None
+
+logger = get_logger("backend.local_store")
+
+_default_dir = Path(__file__).resolve().parent.parent / "data" / "local_store"
+LOCAL_STORE_DIR = os.getenv("LOCAL_STORE_DIR", str(_default_dir))
+LOCAL_STORE_DTYPE = os.getenv("LOCAL_STORE_DTYPE", "float32").lower()
+
+# Rows scored per NumPy matmul in brute-force search, bounds temporary memory
+_SEARCH_BLOCK = 65536
+# Rows preallocated in a new vector file; it doubles whenever it is full
+_INITIAL_CAPACITY = 1024
+# SQLite limits the number of bound parameters per statement
+_QUERY_CHUNK = 500
+
+
+class LocalVectorStore(VectorStore):
+    name = "local"
+
+    def __init__(self, directory: str = LOCAL_STORE_DIR, dtype: str = LOCAL_STORE_DTYPE):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported LOCAL_STORE_DTYPE: {dtype}")
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.RLock()
+        self._vectors: Optional[np.memmap] = None
+        self._vector_file: Optional[str] = None
+        self._dim = 0
+        self._rows = 0  # rows in use, live or dead
+        self._ids: List[Any] = []  # point id per row, None once deleted
+        self._alive = np.zeros(0, dtype=bool)
+        self._row_by_id: Dict[Any, int] = {}
+        self._file_rows: Dict[Optional[str], Set[int]] = defaultdict(set)
+        self._faiss_index = None
+        self._faiss_rows: Optional[np.ndarray] = None
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, "points.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS points (
+                row       INTEGER PRIMARY KEY,
+                point_id  TEXT NOT NULL,
+                file_name TEXT,
+                payload   TEXT NOT NULL,
+                alive     INTEGER NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_points_file ON points (file_name, row)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+        self._load()
+
+    # ---- persistence -------------------------------------------------
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, **values: Any) -> None:
+        self._conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [(k, str(v)) for k, v in values.items()])
+
+    def _load(self) -> None:
+        if self._meta("dim") is None and os.path.exists(os.path.join(self.directory, "points.json")):
+            self._migrate_legacy()
+        dim = self._meta("dim")
+        if dim is None:
+            return
+        self._dim = int(dim)
+        stored_dtype = np.dtype(self._meta("dtype"))
+        if stored_dtype != self.dtype:
+            logger.warning(f"Local vector store holds {stored_dtype} vectors; ignoring LOCAL_STORE_DTYPE={self.dtype}")
+            self.dtype = stored_dtype
+        self._vector_file = self._meta("vector_file")
+        self._map(os.path.getsize(self._vector_path(self._vector_file)) // self._row_bytes)
+        self._rows = self._conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM points").fetchone()[0]
+        self._ids = [None] * self._rows
+        for row, point_id, file_name in self._conn.execute(
+            "SELECT row, point_id, file_name FROM points WHERE alive = 1"
+        ):
+            self._index_row(row, json.loads(point_id), file_name)
+        logger.info(f"Loaded local vector store with {len(self._row_by_id)} points from {self.directory}")
+
+    def _migrate_legacy(self) -> None:
+        points_path = os.path.join(self.directory, "points.json")
+        vectors_path = os.path.join(self.directory, "vectors.npy")
+        with open(points_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if os.path.exists(vectors_path):
+            vectors = np.load(vectors_path, mmap_mode="r")
+            self.dtype = vectors.dtype
+            self._create(vectors.shape[1], max(_INITIAL_CAPACITY, len(vectors)))
+            self._vectors[:len(vectors)] = vectors
+            self._vectors.flush()
+            self._conn.executemany(
+                "INSERT INTO points VALUES (?, ?, ?, ?, ?)",
+                [
+                    (row, json.dumps(pid), payload.get("file_name"), json.dumps(payload), int(alive))
+                    for row, (pid, payload, alive) in enumerate(zip(meta["ids"], meta["payloads"], meta["alive"]))
+                ],
+            )
+            self._conn.commit()
+            self._vectors = None
+            os.remove(vectors_path)
+        os.remove(points_path)
+        logger.info(f"Converted local vector store in {self.directory} to the memory-mapped layout")
+
+    @property
+    def _row_bytes(self) -> int:
+        return self._dim * self.dtype.itemsize
+
+    def _vector_path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _map(self, capacity: int) -> None:
+        self._vectors = np.memmap(self._vector_path(self._vector_file), dtype=self.dtype, mode="r+",
+                                  shape=(capacity, self._dim))
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:min(len(self._alive), capacity)] = self._alive[:capacity]
+        self._alive = alive
+
+    def _new_vector_file(self, capacity: int) -> str:
+        generation = int(self._meta("generation") or 0) + 1
+        name = f"vectors.{generation}.bin"
+        with open(self._vector_path(name), "wb") as f:
+            f.truncate(capacity * self._row_bytes)
+        self._set_meta(generation=generation)
+        return name
+
+    def _create(self, dim: int, capacity: Optional[int] = None) -> None:
+        self._dim = dim
+        capacity = capacity or _INITIAL_CAPACITY
+        self._vector_file = self._new_vector_file(capacity)
+        self._set_meta(dim=dim, dtype=self.dtype.name, vector_file=self._vector_file)
+        self._conn.commit()
+        self._map(capacity)
+
+    def _reserve(self, rows: int) -> None:
+        """Grow the vector file in place so it holds at least rows rows."""
+        capacity = len(self._vectors)
+        if rows <= capacity:
+            return
+        new_capacity = max(rows, capacity * 2)
+        self._vectors.flush()
+        self._vectors = None
+        with open(self._vector_path(self._vector_file), "r+b") as f:
+            f.truncate(new_capacity * self._row_bytes)
+        self._map(new_capacity)
+
+    def _index_row(self, row: int, point_id: Any, file_name: Optional[str]) -> None:
+        self._ids[row] = point_id
+        self._alive[row] = True
+        self._row_by_id[point_id] = row
+        self._file_rows[file_name].add(row)
+
+    def _unindex_row(self, row: int, file_name: Optional[str]) -> None:
+        self._row_by_id.pop(self._ids[row], None)
+        self._ids[row] = None
+        self._alive[row] = False
+        rows = self._file_rows.get(file_name)
+        if rows is not None:
+            rows.discard(row)
+            if not rows:
+                del self._file_rows[file_name]
+
+    def _file_of(self, rows: Sequence[int]) -> Dict[int, Optional[str]]:
+        found = {}
+        rows = list(rows)
+        for start in range(0, len(rows), _QUERY_CHUNK):
+            part = rows[start:start + _QUERY_CHUNK]
+            found.update(self._conn.execute(
+                f"SELECT row, file_name FROM points WHERE row IN ({','.join('?' * len(part))})", part
+            ).fetchall())
+        return found
+
+    def _payloads_for(self, rows: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+        found = {}
+        rows = list(rows)
+        for start in range(0, len(rows), _QUERY_CHUNK):
+            part = rows[start:start + _QUERY_CHUNK]
+            found.update(
+                (row, json.loads(payload)) for row, payload in self._conn.execute(
+                    f"SELECT row, payload FROM points WHERE row IN ({','.join('?' * len(part))})", part
+                )
+            )
+        return found
+
+    def _compact_if_needed(self) -> None:
+        live = len(self._row_by_id)
+        dead = self._rows - live
+        if dead <= live:
+            return
+        keep = np.flatnonzero(self._alive[:self._rows])
+        capacity = max(_INITIAL_CAPACITY, len(keep) * 2)
+        old_file = self._vector_file
+        new_file = self._new_vector_file(capacity)
+        vectors = np.memmap(self._vector_path(new_file), dtype=self.dtype, mode="r+", shape=(capacity, self._dim))
+        for start in range(0, len(keep), _SEARCH_BLOCK):
+            block = keep[start:start + _SEARCH_BLOCK]
+            vectors[start:start + len(block)] = self._vectors[block]
+        vectors.flush()
+        del vectors
+        # Rows only move down, so renumbering in ascending order never collides
+        self._conn.execute("DELETE FROM points WHERE alive = 0")
+        self._conn.executemany("UPDATE points SET row = ? WHERE row = ?",
+                               [(new, int(old)) for new, old in enumerate(keep) if new != old])
+        self._set_meta(vector_file=new_file)
+        self._conn.commit()
+        self._vectors = None
+        os.remove(self._vector_path(old_file))
+
+        self._vector_file = new_file
+        self._rows = len(keep)
+        self._ids = [None] * self._rows
+        self._alive = np.zeros(0, dtype=bool)
+        self._row_by_id, self._file_rows = {}, defaultdict(set)
+        self._map(capacity)
+        for row, point_id, file_name in self._conn.execute(
+            "SELECT row, point_id, file_name FROM points WHERE alive = 1"
+        ):
+            self._index_row(row, json.loads(point_id), file_name)
+        logger.info(f"Compacted local vector store to {self._rows} rows")
+
+    # ---- VectorStore -------------------------------------------------
+
+    def collection_exists(self) -> bool:
+        return self._vectors is not None
+
+    def ensure_collection(self, vector_size: int) -> None:
+        with self._lock:
+            if self._vectors is None:
+                self._create(vector_size)
+
+    def upsert(self, ids: List[Any], vectors: Vectors, payloads: List[Dict[str, Any]], wait: bool = True) -> None:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = (matrix / np.where(norms == 0, 1, norms)).astype(self.dtype)
+        with self._lock:
+            if self._vectors is None:
+                self.ensure_collection(matrix.shape[1])
+            rows, records, added = [], [], {}
+            next_row = self._rows
+            for point_id, payload in zip(ids, payloads):
+                row = self._row_by_id.get(point_id, added.get(point_id))
+                if row is None:
+                    row = added[point_id] = next_row
+                    next_row += 1
+                rows.append(row)
+                records.append((row, json.dumps(point_id), payload.get("file_name"), json.dumps(payload), 1))
+            # An overwritten point may have moved to another file
+            moved = [row for row in set(rows) if row < self._rows]
+            previous_files = self._file_of(moved) if moved else {}
+            self._reserve(next_row)
+            self._vectors[rows] = matrix
+            self._vectors.flush()
+            self._conn.executemany("INSERT OR REPLACE INTO points VALUES (?, ?, ?, ?, ?)", records)
+            self._conn.commit()
+            for row in moved:
+                self._unindex_row(row, previous_files.get(row))
+            self._ids.extend([None] * (next_row - self._rows))
+            self._rows = next_row
+            for row, point_id, (_, _, file_name, _, _) in zip(rows, ids, records):
+                self._index_row(row, point_id, file_name)
+            self._faiss_index = None
+
+    def _rows_for(self, file_name: Optional[str]) -> np.ndarray:
+        if file_name is None:
+            return np.flatnonzero(self._alive[:self._rows])
+        return np.fromiter(sorted(self._file_rows.get(file_name, ())), dtype=np.int64)
+
+    def _brute_force(self, query: np.ndarray, rows: np.ndarray, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        scores = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), _SEARCH_BLOCK):
+            block = rows[start:start + _SEARCH_BLOCK]
+            scores[start:start + len(block)] = np.asarray(self._vectors[block], dtype=np.float32) @ query
+        k = min(limit, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return rows[top], scores[top]
+
+    def _faiss_search(self, query: np.ndarray, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self._faiss_index is None:
+            rows = self._rows_for(None)
+            index = faiss.IndexFlatIP(self._dim)
+            index.add(np.ascontiguousarray(self._vectors[rows], dtype=np.float32))
+            self._faiss_index, self._faiss_rows = index, rows
+        scores, positions = self._faiss_index.search(query.reshape(1, -1), min(limit, len(self._faiss_rows)))
+        valid = positions[0] >= 0
+        return self._faiss_rows[positions[0][valid]], scores[0][valid]
+
+    def _search_one(self, query: SearchQuery) -> List[SearchHit]:
+        vector = np.asarray(query.vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        vector = vector / norm if norm else vector
+        if query.file_name is None and faiss is not None:
+            if not self._row_by_id:
+                return []
+            rows, scores = self._faiss_search(vector, query.limit)
+        else:
+            candidates = self._rows_for(query.file_name)
+            if len(candidates) == 0:
+                return []
+            rows, scores = self._brute_force(vector, candidates, query.limit)
+        matches = [(row, score) for row, score in zip(rows.tolist(), scores.tolist())
+                   if query.score_threshold is None or score >= query.score_threshold]
+        payloads = self._payloads_for([row for row, _ in matches])
+        return [SearchHit(self._ids[row], score, payloads[row]) for row, score in matches]
+
+    def search_batch(self, queries: List[SearchQuery]) -> List[List[SearchHit]]:
+        with self._lock:
+            if self._vectors is None:
+                return [[] for _ in queries]
+            return [self._search_one(q) for q in queries]
+
+    def scroll(self, file_name: Optional[str] = None, limit: int = 100, offset: Any = None,
+               with_payload: PayloadFields = True) -> Tuple[List[StoredPoint], Any]:
+        columns = "row, point_id" + (", payload" if with_payload is not False else "")
+        where, params = "alive = 1 AND row >= ?", [offset or 0]
+        if file_name is not None:
+            where += " AND file_name = ?"
+            params.append(file_name)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {columns} FROM points WHERE {where} ORDER BY row LIMIT ?", [*params, limit + 1]
+            ).fetchall()
+        points = []
+        for record in rows[:limit]:
+            payload = json.loads(record[2]) if with_payload is not False else {}
+            if isinstance(with_payload, list):
+                payload = {k: payload[k] for k in with_payload if k in payload}
+            points.append(StoredPoint(json.loads(record[1]), payload))
+        return points, (rows[limit][0] if len(rows) > limit else None)
+
+    def _delete_rows(self, rows: Sequence[int]) -> None:
+        rows = [int(row) for row in rows]
+        files = self._file_of(rows)
+        for start in range(0, len(rows), _QUERY_CHUNK):
+            part = rows[start:start + _QUERY_CHUNK]
+            self._conn.execute(f"UPDATE points SET alive = 0 WHERE row IN ({','.join('?' * len(part))})", part)
+        self._conn.commit()
+        for row in rows:
+            self._unindex_row(row, files.get(row))
+        self._faiss_index = None
+        self._compact_if_needed()
+
+    def delete_ids(self, ids: List[Any]) -> None:
+        with self._lock:
+            rows = [self._row_by_id[pid] for pid in ids if pid in self._row_by_id]
+            if rows:
+                self._delete_rows(rows)
+
+    def delete_by_file(self, file_name: str) -> None:
+        with self._lock:
+            rows = self._rows_for(file_name).tolist()
+            if rows:
+                self._delete_rows(rows)
+
+    def clear(self) -> None:
+        with self._lock:
+            if self._vectors is None:
+                return
+            self._conn.execute("DELETE FROM points")
+            self._conn.commit()
+            self._rows = 0
+            self._ids, self._row_by_id, self._file_rows = [], {}, defaultdict(set)
+            self._alive[:] = False
+            self._faiss_index = None
+
+    def count(self, file_name: Optional[str] = None) -> int:
+        with self._lock:
+            if file_name is None:
+                return len(self._row_by_id)
+            return len(self._file_rows.get(file_name, ()))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            capacity = len(self._vectors) if self._vectors is not None else 0
+            return {
+                "backend": self.name,
+                "directory": self.directory,
+                "dtype": self.dtype.name,
+                "dimension": self._dim,
+                "points_count": len(self._row_by_id),
+                "stored_rows": self._rows,
+                "allocated_rows": capacity,
+                "vector_file": self._vector_file,
+                "vector_bytes": self._rows * self._row_bytes,
+                "faiss": faiss is not None,
+            }
+
+    def ping(self) -> Dict[str, Any]:
+        return {"backend": self.name, "collection_exists": self.collection_exists(), "latency_ms": 0.0}
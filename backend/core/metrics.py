@@ -0,0 +1,62 @@
+# metrics.py
+"""
+Registry of in-process metrics sources exposed on /metrics.
+
+Modules register a zero-argument callable returning a JSON-serialisable
+dict; collect_metrics() snapshots all of them. Histogram is a small
+fixed-bucket histogram for distributions such as batch sizes or waits.
+"""
+import bisect
+import threading
+from typing import Any, Callable, Dict, Sequence
+
+_sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register_metrics(name: str, source: Callable[[], Dict[str, Any]]) -> None:
+    """Register (or replace) a named metrics source."""
+    _sources[name] = source
+
+
+def collect_metrics() -> Dict[str, Any]:
+    """Snapshot every registered source."""
+    snapshot = {}
+    for name, source in _sources.items():
+        try:
+            snapshot[name] = source()
+        except Exception as e:
+            snapshot[name] = {"error": str(e)}
+    return snapshot
+
+
+class Histogram:
+    """
+    Cumulative fixed-bucket histogram. Each bucket counts observations
+    <= its upper bound; larger values land in the "+Inf" bucket.
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._count += 1
+            self._sum += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            cumulative, running = {}, 0
+            for bound, count in zip(self.buckets + ["+Inf"], self._counts):
+                running += count
+                cumulative[str(bound)] = running
+            return {
+                "count": self._count,
+                "sum": round(self._sum, 3),
+                "mean": round(self._sum / self._count, 3) if self._count else None,
+                "buckets": cumulative,
+            }
@@ -0,0 +1,134 @@
+# micro_batcher.py
+"""
+Cross-request dynamic micro-batching for async callers.
+
+Concurrent /ask requests each need one query embedding. Encoding them one
+by one wastes the encoder's batch efficiency, so submit() parks the caller
+on a future while a worker task collects requests for up to max_wait_ms
+or max_batch_size items, runs the batch function once in a thread pool and
+fans the results back out. Batch sizes and queue waits are recorded in
+histograms so the window can be tuned for the observed QPS.
+"""
+import asyncio
+import time
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+from core.metrics import Histogram
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128]
+QUEUE_WAIT_BUCKETS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 250, 500]
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 2.0,
+        executor: Optional[Executor] = None,
+        max_concurrent_batches: int = 1,
+    ):
+        """
+        batch_fn maps a list of items to a same-length sequence of results
+        and runs in executor (the loop's default pool when None). Up to
+        max_concurrent_batches batches run at once; while they are busy,
+        new requests keep queueing and form the next, larger batch.
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor = executor
+        self.max_concurrent_batches = max_concurrent_batches
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_BUCKETS_MS)
+        self.errors = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        # The loop only keeps weak references to tasks; hold running dispatches here
+        self._dispatches: Set[asyncio.Task] = set()
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            # First use, or a new event loop (e.g. tests calling asyncio.run repeatedly)
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._dispatches = set()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, item: Any) -> Any:
+        """Queue item for the next batch and wait for its result."""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self._queue.put_nowait((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> List[tuple]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            task = self._loop.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: List[tuple]) -> None:
+        try:
+            now = time.perf_counter()
+            for _, _, queued_at in batch:
+                self.queue_wait_ms.observe((now - queued_at) * 1000)
+            self.batch_sizes.observe(len(batch))
+            live = [entry for entry in batch if not entry[1].done()]  # skip cancelled callers
+            if not live:
+                return
+            try:
+                results = await self._loop.run_in_executor(self.executor, self.batch_fn, [item for item, _, _ in live])
+            except Exception as e:
+                self.errors += 1
+                for _, future, _ in live:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            for (_, future, _), result in zip(live, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "errors": self.errors,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+        }
+
+
+__all__ = [
+    'MicroBatcher'
+]
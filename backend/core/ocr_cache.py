@@ -0,0 +1,163 @@
+# ocr_cache.py
+"""
+Persistent cache of OCR results, backed by SQLite.
+
+Tesseract takes seconds per page, and scanned documents are re-uploaded
+often (a new filename, a retry after an unrelated failure). Text is stored
+under (engine settings, SHA-256 of the rendered page image), so a page
+that renders to the same pixels is never OCRed twice, whatever file it
+came from. Text is zlib-compressed; the cache is capped at
+OCR_CACHE_MAX_ENTRIES and evicts least recently used rows. The row count
+is tracked as rows are written rather than counted on every put, and
+recounted every _RECOUNT_EVERY puts to pick up rows written by the PDF
+extraction processes sharing the file.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from core.logger import get_logger
+from core.metrics import register_metrics
+
+logger = get_logger("backend.ocr_cache")
+
+_default_path = Path(__file__).resolve().parent.parent / "data" / "ocr_cache.db"
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH", str(_default_path))
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "200000"))
+OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "true").lower() == "true"
+
+_RECOUNT_EVERY = 1000
+
+
+def image_hash(width: int, height: int, mode: str, pixels: bytes) -> str:
+    """Hash of raw page pixels; dimensions and mode are part of the key."""
+    digest = hashlib.sha256(f"{width}x{height}:{mode}:".encode("ascii"))
+    digest.update(pixels)
+    return digest.hexdigest()
+
+
+class OcrCache:
+    def __init__(self, path: str = OCR_CACHE_PATH, max_entries: int = OCR_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # PDF extraction worker processes share the file; wait for their writes
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ocr_text (
+                engine     TEXT NOT NULL,
+                image_hash TEXT NOT NULL,
+                text       BLOB NOT NULL,
+                last_used  REAL NOT NULL,
+                PRIMARY KEY (engine, image_hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_text_last_used ON ocr_text (last_used)")
+        self._conn.commit()
+        self._entries = self._count()
+        self._puts_since_count = 0
+
+    def get(self, engine: str, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM ocr_text WHERE engine = ? AND image_hash = ?", (engine, key)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE ocr_text SET last_used = ? WHERE engine = ? AND image_hash = ?", (time.time(), engine, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, engine: str, key: str, text: str) -> None:
+        blob, now = zlib.compress(text.encode("utf-8")), time.time()
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE ocr_text SET text = ?, last_used = ? WHERE engine = ? AND image_hash = ?",
+                (blob, now, engine, key),
+            ).rowcount
+            if not updated:
+                self._entries += self._conn.execute(
+                    "INSERT OR IGNORE INTO ocr_text VALUES (?, ?, ?, ?)", (engine, key, blob, now)
+                ).rowcount
+            self._puts_since_count += 1
+            if self._puts_since_count >= _RECOUNT_EVERY:
+                self._entries = self._count()
+                self._puts_since_count = 0
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        excess = self._entries - self.max_entries
+        if excess <= 0:
+            return
+        evicted = self._conn.execute(
+            "DELETE FROM ocr_text WHERE rowid IN (SELECT rowid FROM ocr_text ORDER BY last_used LIMIT ?)",
+            (excess,),
+        ).rowcount
+        self._entries -= evicted
+        self.evictions += evicted
+        logger.info(f"Evicted {evicted} least recently used OCR results")
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM ocr_text").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM ocr_text")
+            self._conn.commit()
+            self._entries = 0
+
+    def __len__(self) -> int:
+        return self._entries
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+_cache: Optional[OcrCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> Optional[OcrCache]:
+    """Return the process-wide cache, or None when OCR_CACHE_ENABLED is false."""
+    global _cache
+    if not OCR_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = OcrCache()
+                register_metrics("ocr_cache", _cache.stats)
+    return _cache
+
+
+__all__ = [
+    'OCR_CACHE_PATH',
+    'image_hash',
+    'OcrCache',
+    'get_ocr_cache'
+]
@@ -0,0 +1,195 @@
+# qdrant_manager.py
+"""
+Long-lived Qdrant clients shared by retrieval, indexing and health checks.
+
+Creating a QdrantClient per call throws away the HTTP connection pool and
+every helper used to re-check the collection with get_collections(), so a
+single /ask paid for several extra round-trips. This module keeps one sync
+and one async client per process (with keep-alive pools) and caches
+collection existence/config until it is invalidated or expires.
+"""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+from qdrant_client import AsyncQdrantClient, QdrantClient
+
+from core.logger import get_logger
+
+logger = get_logger("backend.qdrant")
+
+# Ensure .env in backend/ is loaded for Qdrant creds in all execution contexts
+_backend_env = Path(__file__).resolve().parent.parent / ".env"
+load_dotenv(dotenv_path=_backend_env, override=False)
+
+COLLECTION_NAME = "legal_chunks"
+
+QDRANT_TIMEOUT = float(os.getenv("QDRANT_TIMEOUT", "60"))
+QDRANT_MAX_CONNECTIONS = int(os.getenv("QDRANT_MAX_CONNECTIONS", "20"))
+QDRANT_MAX_KEEPALIVE = int(os.getenv("QDRANT_MAX_KEEPALIVE", "10"))
+QDRANT_KEEPALIVE_EXPIRY = float(os.getenv("QDRANT_KEEPALIVE_EXPIRY", "60"))
+COLLECTION_CACHE_TTL = float(os.getenv("QDRANT_COLLECTION_CACHE_TTL", "300"))
+
+_client: Optional[QdrantClient] = None
+_async_client: Optional[AsyncQdrantClient] = None
+_client_lock = threading.Lock()
+
+# collection name -> {"exists": bool, "info": CollectionInfo | None, "checked_at": float}
+_collection_cache: Dict[str, Dict[str, Any]] = {}
+_cache_lock = threading.Lock()
+
+
+def _client_kwargs() -> Dict[str, Any]:
+    return {
+        "url": os.getenv("QDRANT_URL"),
+        "api_key": os.getenv("QDRANT_API_KEY"),
+        "prefer_grpc": False,  # use REST to avoid DNS/gRPC resolution issues on 6334
+        "timeout": QDRANT_TIMEOUT,
+        "limits": httpx.Limits(
+            max_connections=QDRANT_MAX_CONNECTIONS,
+            max_keepalive_connections=QDRANT_MAX_KEEPALIVE,
+            keepalive_expiry=QDRANT_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+def get_client() -> QdrantClient:
+    """Return the shared sync client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = QdrantClient(**_client_kwargs())
+                logger.info("Created shared Qdrant client")
+    return _client
+
+
+def get_async_client() -> AsyncQdrantClient:
+    """Return the shared async client, creating it on first use."""
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncQdrantClient(**_client_kwargs())
+                logger.info("Created shared async Qdrant client")
+    return _async_client
+
+
+def _cached_entry(collection_name: str) -> Optional[Dict[str, Any]]:
+    entry = _collection_cache.get(collection_name)
+    if entry is None or time.monotonic() - entry["checked_at"] > COLLECTION_CACHE_TTL:
+        return None
+    return entry
+
+
+def _store_entry(collection_name: str, exists: bool, info: Any = None) -> None:
+    with _cache_lock:
+        _collection_cache[collection_name] = {
+            "exists": exists,
+            "info": info,
+            "checked_at": time.monotonic(),
+        }
+
+
+def collection_exists(collection_name: str = COLLECTION_NAME, refresh: bool = False) -> bool:
+    """Check if the collection exists, using the cached answer when fresh."""
+    entry = None if refresh else _cached_entry(collection_name)
+    if entry is not None:
+        return entry["exists"]
+    try:
+        exists = get_client().collection_exists(collection_name)
+    except Exception as e:
+        logger.error(f"Error checking collection existence: {e}")
+        return False
+    _store_entry(collection_name, exists)
+    return exists
+
+
+async def async_collection_exists(collection_name: str = COLLECTION_NAME, refresh: bool = False) -> bool:
+    """Async counterpart of collection_exists() sharing the same cache."""
+    entry = None if refresh else _cached_entry(collection_name)
+    if entry is not None:
+        return entry["exists"]
+    try:
+        exists = await get_async_client().collection_exists(collection_name)
+    except Exception as e:
+        logger.error(f"Error checking collection existence: {e}")
+        return False
+    _store_entry(collection_name, exists)
+    return exists
+
+
+def get_collection_info(collection_name: str = COLLECTION_NAME, refresh: bool = False) -> Any:
+    """Return the cached CollectionInfo (config, schema), fetching it if needed."""
+    entry = None if refresh else _cached_entry(collection_name)
+    if entry is not None and entry["info"] is not None:
+        return entry["info"]
+    info = get_client().get_collection(collection_name)
+    _store_entry(collection_name, True, info)
+    return info
+
+
+def mark_collection_created(collection_name: str = COLLECTION_NAME) -> None:
+    """Record a collection we just created so nobody has to re-check it."""
+    _store_entry(collection_name, True)
+
+
+def invalidate_collection_cache(collection_name: Optional[str] = None) -> None:
+    """Drop cached metadata for one collection, or for all of them."""
+    with _cache_lock:
+        if collection_name is None:
+            _collection_cache.clear()
+        else:
+            _collection_cache.pop(collection_name, None)
+
+
+def ping() -> Dict[str, Any]:
+    """
+    Round-trip to Qdrant for the health endpoint. Also refreshes the cached
+    existence flag since we already have the collection list in hand.
+    """
+    start = time.perf_counter()
+    collections = get_client().get_collections()
+    latency_ms = (time.perf_counter() - start) * 1000
+    names = [col.name for col in collections.collections]
+    _store_entry(COLLECTION_NAME, COLLECTION_NAME in names)
+    return {
+        "latency_ms": round(latency_ms, 2),
+        "collection_exists": COLLECTION_NAME in names,
+        "pool": {
+            "max_connections": QDRANT_MAX_CONNECTIONS,
+            "max_keepalive_connections": QDRANT_MAX_KEEPALIVE,
+            "keepalive_expiry_s": QDRANT_KEEPALIVE_EXPIRY,
+        },
+    }
+
+
+async def close_clients() -> None:
+    """Close the shared clients (called on application shutdown)."""
+    global _client, _async_client
+    with _client_lock:
+        client, async_client = _client, _async_client
+        _client, _async_client = None, None
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        await async_client.close()
+    invalidate_collection_cache()
+
+
+__all__ = [
+    'COLLECTION_NAME',
+    'get_client',
+    'get_async_client',
+    'collection_exists',
+    'async_collection_exists',
+    'get_collection_info',
+    'mark_collection_created',
+    'invalidate_collection_cache',
+    'ping',
+    'close_clients'
+]
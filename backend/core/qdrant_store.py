@@ -0,0 +1,281 @@
+# qdrant_store.py
+"""
+VectorStore backed by Qdrant, using the pooled clients from qdrant_manager.
+
+Large corpora can trade a little recall for memory with VECTOR_QUANTIZATION:
+"scalar" keeps an int8 copy of every vector in RAM (4x smaller), "binary"
+keeps one bit per dimension (32x smaller). The float32 originals then live
+on disk (VECTOR_ON_DISK) and are only read to rescore the oversampled
+candidates of each search.
+"""
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from qdrant_client.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Disabled,
+    Distance,
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    HnswConfigDiff,
+    MatchValue,
+    PayloadSchemaType,
+    PointIdsList,
+    PointStruct,
+    QuantizationSearchParams,
+    QueryRequest,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    VectorParams,
+    VectorParamsDiff,
+)
+
+from core import qdrant_manager
+from core.logger import get_logger
+from core.qdrant_manager import COLLECTION_NAME
+from core.vector_store import PayloadFields, SearchHit, SearchQuery, StoredPoint, Vectors, VectorStore
+
+logger = get_logger("backend.qdrant_store")
+
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()  # none | scalar | binary
+VECTOR_ON_DISK = os.getenv("VECTOR_ON_DISK", "true" if VECTOR_QUANTIZATION != "none" else "false").lower() == "true"
+QUANTIZATION_RESCORE = os.getenv("QUANTIZATION_RESCORE", "true").lower() == "true"
+QUANTIZATION_OVERSAMPLING = float(os.getenv("QUANTIZATION_OVERSAMPLING", "2.0"))
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCT = int(os.getenv("HNSW_EF_CONSTRUCT", "100"))
+HNSW_EF = int(os.getenv("HNSW_EF", "0")) or None  # 0: Qdrant default
+
+# Payload fields used in filters (preferred-file search, per-file scroll,
+# count and delete). Without an index Qdrant scans every payload.
+PAYLOAD_INDEXES = {
+    "file_name": PayloadSchemaType.KEYWORD,
+    "file_id": PayloadSchemaType.KEYWORD,
+    "source": PayloadSchemaType.KEYWORD,
+    "page": PayloadSchemaType.INTEGER,
+}
+
+
+def _file_filter(file_name: Optional[str]) -> Optional[Filter]:
+    if not file_name:
+        return None
+    return Filter(must=[FieldCondition(key="file_name", match=MatchValue(value=file_name))])
+
+
+def quantization_config(kind: str):
+    """Qdrant quantization config for "none", "scalar" or "binary"."""
+    if kind == "none":
+        return None
+    if kind == "scalar":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True))
+    if kind == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    raise ValueError(f"Unknown VECTOR_QUANTIZATION: {kind}")
+
+
+def _quantization_kind(config) -> str:
+    if isinstance(config, ScalarQuantization):
+        return "scalar"
+    if isinstance(config, BinaryQuantization):
+        return "binary"
+    return "none"
+
+
+def search_params(kind: str, rescore: bool = QUANTIZATION_RESCORE,
+                  oversampling: float = QUANTIZATION_OVERSAMPLING, hnsw_ef: Optional[int] = HNSW_EF) -> Optional[SearchParams]:
+    if kind == "none" and hnsw_ef is None:
+        return None
+    quantization = None
+    if kind != "none":
+        quantization = QuantizationSearchParams(rescore=rescore, oversampling=oversampling)
+    return SearchParams(hnsw_ef=hnsw_ef, quantization=quantization)
+
+
+def _to_request(query: SearchQuery, params: Optional[SearchParams] = None) -> QueryRequest:
+    return QueryRequest(
+        query=list(query.vector),
+        filter=_file_filter(query.file_name),
+        limit=query.limit,
+        with_payload=True,
+        score_threshold=query.score_threshold,
+        params=params,
+    )
+
+
+def _to_hits(response) -> List[SearchHit]:
+    return [SearchHit(r.id, r.score, r.payload or {}) for r in response.points]
+
+
+class QdrantVectorStore(VectorStore):
+    name = "qdrant"
+
+    def __init__(self, collection_name: str = COLLECTION_NAME, quantization: str = VECTOR_QUANTIZATION,
+                 on_disk: bool = VECTOR_ON_DISK):
+        self.collection_name = collection_name
+        self.quantization = quantization
+        self.on_disk = on_disk
+        self.search_params = search_params(quantization)
+        self._quantization_config = quantization_config(quantization)
+        self._indexes_checked = False
+
+    @property
+    def client(self):
+        return qdrant_manager.get_client()
+
+    def is_configured(self) -> Tuple[bool, Optional[str]]:
+        if not os.getenv("QDRANT_URL") or not os.getenv("QDRANT_API_KEY"):
+            return False, "Missing Qdrant credentials"
+        return True, None
+
+    def collection_exists(self) -> bool:
+        return qdrant_manager.collection_exists(self.collection_name)
+
+    async def acollection_exists(self) -> bool:
+        return await qdrant_manager.async_collection_exists(self.collection_name)
+
+    def ensure_collection(self, vector_size: int) -> None:
+        if self.collection_exists():
+            logger.debug(f"Collection '{self.collection_name}' already exists")
+            self.ensure_indexes()
+            return
+        logger.info(
+            f"Creating collection '{self.collection_name}' with vector size {vector_size} "
+            f"(quantization={self.quantization}, on_disk={self.on_disk})"
+        )
+        self.client.create_collection(
+            collection_name=self.collection_name,
+            vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE, on_disk=self.on_disk),
+            hnsw_config=HnswConfigDiff(m=HNSW_M, ef_construct=HNSW_EF_CONSTRUCT),
+            quantization_config=self._quantization_config,
+        )
+        qdrant_manager.mark_collection_created(self.collection_name)
+        self.ensure_indexes()
+
+    def ensure_indexes(self) -> None:
+        """
+        Create any missing payload indexes and apply the configured
+        quantization. Also migrates collections created before either
+        existed; checked once per process.
+        """
+        if self._indexes_checked or not self.collection_exists():
+            return
+        info = qdrant_manager.get_collection_info(self.collection_name, refresh=True)
+        current = _quantization_kind(info.config.quantization_config)
+        if current != self.quantization:
+            logger.info(f"Switching '{self.collection_name}' quantization from {current} to {self.quantization}")
+            self.client.update_collection(
+                collection_name=self.collection_name,
+                vectors_config={"": VectorParamsDiff(on_disk=self.on_disk)},
+                quantization_config=self._quantization_config or Disabled.DISABLED,
+            )
+        existing = info.payload_schema or {}
+        for field, schema in PAYLOAD_INDEXES.items():
+            if field in existing:
+                continue
+            logger.info(f"Creating {schema.value} payload index on '{field}' in '{self.collection_name}'")
+            self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name=field,
+                field_schema=schema,
+                wait=True,
+            )
+        self._indexes_checked = True
+
+    def upsert(self, ids: List[Any], vectors: Vectors, payloads: List[Dict[str, Any]], wait: bool = True) -> None:
+        if isinstance(vectors, np.ndarray):
+            vectors = vectors.tolist()
+        points = [
+            PointStruct(id=point_id, vector=vector, payload=payload)
+            for point_id, vector, payload in zip(ids, vectors, payloads)
+        ]
+        self.client.upsert(collection_name=self.collection_name, points=points, wait=wait)
+
+    def search_batch(self, queries: List[SearchQuery]) -> List[List[SearchHit]]:
+        batch = self.client.query_batch_points(
+            collection_name=self.collection_name,
+            requests=[_to_request(q, self.search_params) for q in queries],
+        )
+        return [_to_hits(response) for response in batch]
+
+    async def asearch_batch(self, queries: List[SearchQuery]) -> List[List[SearchHit]]:
+        batch = await qdrant_manager.get_async_client().query_batch_points(
+            collection_name=self.collection_name,
+            requests=[_to_request(q, self.search_params) for q in queries],
+        )
+        return [_to_hits(response) for response in batch]
+
+    def scroll(self, file_name: Optional[str] = None, limit: int = 100, offset: Any = None,
+               with_payload: PayloadFields = True) -> Tuple[List[StoredPoint], Any]:
+        points, next_offset = self.client.scroll(
+            collection_name=self.collection_name,
+            scroll_filter=_file_filter(file_name),
+            with_payload=with_payload,
+            with_vectors=False,
+            limit=limit,
+            offset=offset,
+        )
+        return [StoredPoint(p.id, p.payload or {}) for p in points], next_offset
+
+    def missing_ids(self, ids: List[Any], batch_size: int = 1000) -> List[Any]:
+        found = set()
+        for start in range(0, len(ids), batch_size):
+            records = self.client.retrieve(
+                collection_name=self.collection_name,
+                ids=ids[start:start + batch_size],
+                with_payload=False,
+                with_vectors=False,
+            )
+            found.update(str(record.id) for record in records)
+        return [point_id for point_id in ids if str(point_id) not in found]
+
+    def delete_ids(self, ids: List[Any]) -> None:
+        if not ids:
+            return
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=PointIdsList(points=list(ids)),
+            wait=True,
+        )
+
+    def delete_by_file(self, file_name: str) -> None:
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=FilterSelector(filter=_file_filter(file_name)),
+            wait=True,
+        )
+
+    def clear(self) -> None:
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=FilterSelector(filter=Filter(must=[])),  # Empty filter selects all points
+            wait=True,
+        )
+        qdrant_manager.invalidate_collection_cache(self.collection_name)
+
+    def count(self, file_name: Optional[str] = None) -> int:
+        return self.client.count(
+            collection_name=self.collection_name,
+            count_filter=_file_filter(file_name),
+            exact=True,
+        ).count
+
+    def stats(self) -> Dict[str, Any]:
+        # Fresh: counts change with every upload
+        info = qdrant_manager.get_collection_info(self.collection_name, refresh=True)
+        return {
+            "backend": self.name,
+            "collection_name": self.collection_name,
+            "vectors_count": self.count(),
+            "vectors_config": str(info.config.params.vectors),
+            "indexed_vectors_count": info.indexed_vectors_count,
+            "points_count": info.points_count,
+            "payload_indexes": sorted((info.payload_schema or {}).keys()),
+            "quantization": _quantization_kind(info.config.quantization_config),
+        }
+
+    def ping(self) -> Dict[str, Any]:
+        return {"backend": self.name, **qdrant_manager.ping()}
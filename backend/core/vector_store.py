@@ -0,0 +1,156 @@
+# vector_store.py
+"""
+Storage-agnostic interface for the chunk vector store.
+
+Retrieval and indexing talk to a VectorStore instead of calling Qdrant
+directly, so the backend can be swapped via VECTOR_STORE_BACKEND:
+
+- "qdrant" (default): Qdrant Cloud / server, see core.qdrant_store
+- "local": in-process memory-mapped matrices searched with FAISS when it is
+  installed and brute-force NumPy otherwise, see core.local_store
+"""
+import asyncio
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "qdrant").lower()
+
+
+class SearchQuery(NamedTuple):
+    vector: Sequence[float]
+    limit: int
+    file_name: Optional[str] = None
+    score_threshold: Optional[float] = None
+
+
+class SearchHit(NamedTuple):
+    id: Any
+    score: float
+    payload: Dict[str, Any]
+
+
+class StoredPoint(NamedTuple):
+    id: Any
+    payload: Dict[str, Any]
+
+
+Vectors = Union[np.ndarray, List[List[float]]]
+PayloadFields = Union[bool, List[str]]
+
+
+class VectorStore(ABC):
+    """
+    Operations the rest of the backend needs from a vector store. Async
+    variants default to running the sync method in a worker thread;
+    backends with a native async client override them.
+    """
+
+    name = "base"
+
+    def is_configured(self) -> Tuple[bool, Optional[str]]:
+        """Return (ok, reason) - e.g. missing credentials."""
+        return True, None
+
+    @abstractmethod
+    def collection_exists(self) -> bool: ...
+
+    @abstractmethod
+    def ensure_collection(self, vector_size: int) -> None:
+        """Create the collection if it does not exist yet."""
+
+    def ensure_indexes(self) -> None:
+        """Create secondary indexes used by filtered operations, if the backend has any."""
+
+    @abstractmethod
+    def upsert(self, ids: List[Any], vectors: Vectors, payloads: List[Dict[str, Any]], wait: bool = True) -> None: ...
+
+    @abstractmethod
+    def search_batch(self, queries: List[SearchQuery]) -> List[List[SearchHit]]:
+        """Run several searches in one call; results are in query order."""
+
+    def search(self, vector: Sequence[float], limit: int, file_name: Optional[str] = None,
+               score_threshold: Optional[float] = None) -> List[SearchHit]:
+        return self.search_batch([SearchQuery(vector, limit, file_name, score_threshold)])[0]
+
+    @abstractmethod
+    def scroll(self, file_name: Optional[str] = None, limit: int = 100, offset: Any = None,
+               with_payload: PayloadFields = True) -> Tuple[List[StoredPoint], Any]:
+        """Page through stored points; returns (points, next_offset or None)."""
+
+    def list_ids(self, file_name: Optional[str] = None, batch_size: int = 1000) -> List[Any]:
+        """All point ids (of one file, if given), paging through scroll()."""
+        ids, offset = [], None
+        while True:
+            points, offset = self.scroll(file_name=file_name, limit=batch_size, offset=offset, with_payload=False)
+            ids.extend(p.id for p in points)
+            if offset is None:
+                return ids
+
+    def missing_ids(self, ids: List[Any]) -> List[Any]:
+        """
+        Ids from ids that are not stored (yet). Used to confirm upserts sent
+        with wait=False; backends whose writes are synchronous return [].
+        """
+        return []
+
+    @abstractmethod
+    def delete_ids(self, ids: List[Any]) -> None: ...
+
+    @abstractmethod
+    def delete_by_file(self, file_name: str) -> None: ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Delete every point but keep the collection."""
+
+    @abstractmethod
+    def count(self, file_name: Optional[str] = None) -> int: ...
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Backend-specific statistics for /database-status style endpoints."""
+
+    @abstractmethod
+    def ping(self) -> Dict[str, Any]:
+        """Health probe; raises when the backend is unreachable."""
+
+    async def acollection_exists(self) -> bool:
+        return await asyncio.to_thread(self.collection_exists)
+
+    async def asearch_batch(self, queries: List[SearchQuery]) -> List[List[SearchHit]]:
+        return await asyncio.to_thread(self.search_batch, queries)
+
+
+_store: Optional[VectorStore] = None
+_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """Return the process-wide store selected by VECTOR_STORE_BACKEND."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if VECTOR_STORE_BACKEND == "local":
+                    from core.local_store import LocalVectorStore
+                    _store = LocalVectorStore()
+                elif VECTOR_STORE_BACKEND == "qdrant":
+                    from core.qdrant_store import QdrantVectorStore
+                    _store = QdrantVectorStore()
+                else:
+                    raise ValueError(f"Unknown VECTOR_STORE_BACKEND: {VECTOR_STORE_BACKEND}")
+    return _store
+
+
+__all__ = [
+    'VECTOR_STORE_BACKEND',
+    'SearchQuery',
+    'SearchHit',
+    'StoredPoint',
+    'VectorStore',
+    'get_vector_store'
+]
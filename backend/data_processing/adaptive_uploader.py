@@ -0,0 +1,245 @@
+# adaptive_uploader.py
+"""
+Concurrent, self-tuning upserts into the vector store.
+
+The old upload loop sent fixed batches of 20 points one after another and
+slept 0.2 s after each, so a 10k-chunk document spent over a minute and a
+half sleeping. AdaptiveUploader keeps up to UPSERT_CONCURRENCY batches in
+flight and sizes each batch from two signals:
+
+- bytes: a batch never exceeds UPSERT_MAX_BATCH_BYTES of estimated request
+  body (vectors plus JSON payloads), so long chunks make smaller batches;
+- latency: batches answered faster than UPSERT_TARGET_LATENCY_MS grow the
+  next batch by a quarter, slower ones halve it (AIMD), within
+  [UPSERT_MIN_BATCH, UPSERT_MAX_BATCH].
+
+Failed batches are retried with exponential backoff and full jitter, and
+an error also halves the batch size. With UPSERT_WAIT=false batches are
+sent without waiting for Qdrant to apply them; close() then confirms once
+that every point is stored and re-sends whatever is missing.
+"""
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from core.logger import get_logger
+
+logger = get_logger("backend.adaptive_uploader")
+
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", "4"))
+UPSERT_INITIAL_BATCH = int(os.getenv("UPSERT_INITIAL_BATCH", "64"))
+UPSERT_MIN_BATCH = int(os.getenv("UPSERT_MIN_BATCH", "8"))
+UPSERT_MAX_BATCH = int(os.getenv("UPSERT_MAX_BATCH", "512"))
+UPSERT_MAX_BATCH_BYTES = int(os.getenv("UPSERT_MAX_BATCH_BYTES", str(4 * 1024 * 1024)))
+UPSERT_TARGET_LATENCY_MS = float(os.getenv("UPSERT_TARGET_LATENCY_MS", "500"))
+UPSERT_MAX_RETRIES = int(os.getenv("UPSERT_MAX_RETRIES", "5"))
+UPSERT_BACKOFF_BASE_S = float(os.getenv("UPSERT_BACKOFF_BASE_S", "0.5"))
+UPSERT_BACKOFF_MAX_S = float(os.getenv("UPSERT_BACKOFF_MAX_S", "10"))
+UPSERT_WAIT = os.getenv("UPSERT_WAIT", "true").lower() == "true"
+
+# A float serialised as JSON text (the REST client) is ~10 bytes
+_BYTES_PER_FLOAT = 10
+
+OnBatch = Callable[[List[Any], List[Dict[str, Any]]], None]
+
+
+def point_bytes(vector, payload: Dict[str, Any]) -> int:
+    """Rough request-body size of one point."""
+    return len(vector) * _BYTES_PER_FLOAT + len(json.dumps(payload, default=str))
+
+
+def backoff_delay(attempt: int, base: float = UPSERT_BACKOFF_BASE_S, cap: float = UPSERT_BACKOFF_MAX_S) -> float:
+    """Full-jitter exponential backoff for the given (1-based) retry attempt."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class AdaptiveUploader:
+    """
+    submit() buffers points and dispatches a batch whenever the buffer holds
+    enough for the current batch size; it blocks while UPSERT_CONCURRENCY
+    batches are in flight, which back-pressures the producer. close() sends
+    the rest, waits, confirms (wait=False) and returns the upload stats.
+
+    on_success(ids, payloads) runs once per stored batch and on_failure for
+    batches that exhausted their retries; both are called under a lock.
+    """
+
+    def __init__(self, store, concurrency: int = UPSERT_CONCURRENCY, wait: bool = UPSERT_WAIT,
+                 initial_batch: int = UPSERT_INITIAL_BATCH, min_batch: int = UPSERT_MIN_BATCH,
+                 max_batch: int = UPSERT_MAX_BATCH, max_batch_bytes: int = UPSERT_MAX_BATCH_BYTES,
+                 target_latency_ms: float = UPSERT_TARGET_LATENCY_MS, max_retries: int = UPSERT_MAX_RETRIES,
+                 on_success: Optional[OnBatch] = None, on_failure: Optional[OnBatch] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.store = store
+        self.concurrency = max(1, concurrency)
+        self.wait = wait
+        self.min_batch = min_batch
+        self.max_batch = max(min_batch, max_batch)
+        self.batch_size = min(max(initial_batch, min_batch), self.max_batch)
+        self.max_batch_bytes = max_batch_bytes
+        self.target_latency_s = target_latency_ms / 1000
+        self.max_retries = max(1, max_retries)
+        self.on_success = on_success
+        self.on_failure = on_failure
+        self._sleep = sleep
+
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="upsert")
+        self._slots = threading.Semaphore(self.concurrency)
+        self._lock = threading.Lock()
+        self._futures: List[Future] = []
+        self._buffer: List[tuple] = []  # (id, vector, payload, bytes)
+        self._buffer_bytes = 0
+        self._sent_unconfirmed: List[tuple] = []  # (ids, vectors, payloads) sent with wait=False
+        self._started = time.perf_counter()
+        self._closed = False
+
+        self.points_uploaded = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.failed_points = 0
+        self.retries = 0
+        self.resent_points = 0
+
+    # ---- producer side -------------------------------------------------
+
+    def submit(self, ids: List[Any], vectors, payloads: List[Dict[str, Any]]) -> None:
+        if self._closed:
+            raise RuntimeError("AdaptiveUploader is closed")
+        vectors = np.asarray(vectors)
+        for point_id, vector, payload in zip(ids, vectors, payloads):
+            size = point_bytes(vector, payload)
+            # Cut on bytes first so one oversized point still goes out alone
+            if self._buffer and self._buffer_bytes + size > self.max_batch_bytes:
+                self._dispatch()
+            self._buffer.append((point_id, vector, payload, size))
+            self._buffer_bytes += size
+            if len(self._buffer) >= self.batch_size:
+                self._dispatch()
+
+    def _dispatch(self) -> None:
+        if not self._buffer:
+            return
+        batch, self._buffer, self._buffer_bytes = self._buffer, [], 0
+        ids = [point[0] for point in batch]
+        vectors = np.stack([point[1] for point in batch])
+        payloads = [point[2] for point in batch]
+        self._slots.acquire()
+        future = self._executor.submit(self._send, ids, vectors, payloads)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    # ---- workers -------------------------------------------------------
+
+    def _send(self, ids: List[Any], vectors: np.ndarray, payloads: List[Dict[str, Any]]) -> None:
+        for attempt in range(1, self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                self.store.upsert(ids, vectors, payloads, wait=self.wait)
+            except Exception as e:
+                with self._lock:
+                    self.batch_size = max(self.min_batch, self.batch_size // 2)
+                if attempt == self.max_retries:
+                    logger.error(f"Giving up on a batch of {len(ids)} points after {attempt} attempts: {e}")
+                    with self._lock:
+                        self.failed_batches += 1
+                        self.failed_points += len(ids)
+                        if self.on_failure is not None:
+                            self.on_failure(ids, payloads)
+                    return
+                delay = backoff_delay(attempt)
+                logger.warning(f"Upsert of {len(ids)} points failed (attempt {attempt}/{self.max_retries}), "
+                               f"retrying in {delay:.2f}s: {e}")
+                with self._lock:
+                    self.retries += 1
+                self._sleep(delay)
+                continue
+
+            latency = time.perf_counter() - start
+            with self._lock:
+                self._adapt(len(ids), latency)
+                self.batches += 1
+                self.points_uploaded += len(ids)
+                if not self.wait:
+                    self._sent_unconfirmed.append((ids, vectors, payloads))
+                if self.on_success is not None:
+                    self.on_success(ids, payloads)
+            return
+
+    def _adapt(self, size: int, latency: float) -> None:
+        if latency > self.target_latency_s:
+            self.batch_size = max(self.min_batch, self.batch_size // 2)
+        elif size >= self.batch_size:
+            # Only grow when a full batch was fast; partial tail batches say little
+            self.batch_size = min(self.max_batch, max(self.batch_size + 1, int(self.batch_size * 1.25)))
+
+    # ---- completion ----------------------------------------------------
+
+    def close(self, flush: bool = True) -> Dict[str, Any]:
+        """Send what is buffered (unless flush=False), wait for all batches and confirm."""
+        if not self._closed:
+            self._closed = True
+            if flush:
+                self._dispatch()
+            else:
+                self._buffer, self._buffer_bytes = [], 0
+            for future in self._futures:
+                future.result()
+            self._executor.shutdown(wait=True)
+            if not self.wait and flush:
+                self._confirm()
+        return self.stats()
+
+    def _confirm(self) -> None:
+        """One check at the end that every point sent with wait=False is stored."""
+        sent, self._sent_unconfirmed = self._sent_unconfirmed, []
+        if not sent:
+            return
+        all_ids = [point_id for ids, _, _ in sent for point_id in ids]
+        try:
+            missing = set(self.store.missing_ids(all_ids))
+        except Exception as e:
+            logger.warning(f"Could not confirm {len(all_ids)} upserted points: {e}")
+            return
+        for ids, vectors, payloads in sent:
+            rows = [i for i, point_id in enumerate(ids) if point_id in missing]
+            if not rows:
+                continue
+            resend_ids = [ids[i] for i in rows]
+            try:
+                self.store.upsert(resend_ids, vectors[rows], [payloads[i] for i in rows], wait=True)
+                self.resent_points += len(rows)
+            except Exception as e:
+                logger.error(f"Re-sending {len(rows)} unconfirmed points failed: {e}")
+                self.failed_batches += 1
+                self.failed_points += len(rows)
+                self.points_uploaded -= len(rows)
+                if self.on_failure is not None:
+                    self.on_failure(resend_ids, [payloads[i] for i in rows])
+
+    def stats(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self._started
+        return {
+            "points_uploaded": self.points_uploaded,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "failed_points": self.failed_points,
+            "retries": self.retries,
+            "resent_points": self.resent_points,
+            "batch_size": self.batch_size,
+            "concurrency": self.concurrency,
+            "elapsed_s": round(elapsed, 3),
+            "points_per_sec": round(self.points_uploaded / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+
+__all__ = [
+    'AdaptiveUploader',
+    'backoff_delay',
+    'point_bytes'
+]
@@ -3,54 +3,52 @@ import re
 def chunk_text(pages, chunk_size=200, overlap=20):
     chunks = []
     print(f"🔪 Starting chunking process for {len(pages)} pages")
-    
-    for page_idx, page in enumerate(pages):
-        text = page["text"]
-        page_number = page["page"]
-        source = page["source"]
-        
-        print(f"📄 Processing page {page_number} from {source}, text length: {len(text)}")
-        
-        if not text or len(text.strip()) == 0:
-            print(f"⚠️ Page {page_number} has no text, skipping chunking for this page")
-            # You might want to add a minimal chunk to indicate this page exists but has no text
-            chunks.append({
-                "text": f"[Page {page_number} contains no extractable text]",
-                "page": page_number,
-                "source": source
-            })
-            continue
-            
-        words = re.findall(r'\w+|\S', text)
-        print(f"📊 Page {page_number} has {len(words)} words")
-        
-        if len(words) == 0:
-            print(f"⚠️ Page {page_number} has no words after regex processing")
-            chunks.append({
-                "text": f"[Page {page_number} contains no extractable text]",
-                "page": page_number,
-                "source": source
-            })
-            continue
-            
-        start = 0
-        chunk_count = 0
-        
-        while start < len(words):
-            end = start + chunk_size
-            chunk_words = words[start:end]
-            chunk_text = " ".join(chunk_words)
-            
-            chunks.append({
-                "text": chunk_text,
-                "page": page_number,
-                "source": source
-            })
-            
-            chunk_count += 1
-            start += chunk_size - overlap
-        
-        print(f"✂️ Page {page_number} split into {chunk_count} chunks")
-    
+
+    for page in pages:
+        chunks.extend(chunk_page(page, chunk_size, overlap))
+
     print(f"✅ Chunking complete. Generated {len(chunks)} total chunks.")
-    return chunks
\ No newline at end of file
+    return chunks
+
+def chunk_page(page, chunk_size=200, overlap=20):
+    """Split one {"text", "page", "source"} page into overlapping word windows."""
+    chunks = []
+    text = page["text"]
+    page_number = page["page"]
+    source = page["source"]
+
+    print(f"📄 Processing page {page_number} from {source}, text length: {len(text)}")
+
+    if not text or len(text.strip()) == 0:
+        # Empty pages (blank, or waiting for OCR) produce no chunks rather
+        # than a placeholder that would be embedded and retrieved as noise
+        print(f"⚠️ Page {page_number} has no text, skipping chunking for this page")
+        return chunks
+
+    words = re.findall(r'\w+|\S', text)
+    print(f"📊 Page {page_number} has {len(words)} words")
+
+    if len(words) == 0:
+        print(f"⚠️ Page {page_number} has no words after regex processing")
+        return chunks
+
+    start = 0
+    chunk_count = 0
+
+    while start < len(words):
+        end = start + chunk_size
+        chunk_words = words[start:end]
+        chunk_text = " ".join(chunk_words)
+
+        chunks.append({
+            "text": chunk_text,
+            "page": page_number,
+            "source": source,
+            "chunk_index": chunk_count
+        })
+
+        chunk_count += 1
+        start += chunk_size - overlap
+
+    print(f"✂️ Page {page_number} split into {chunk_count} chunks")
+    return chunks
@@ -0,0 +1,253 @@
+# embedding_engine.py
+"""
+Bulk chunk embedding for ingestion.
+
+embed_texts() replaces the single model.encode(all_chunks) call:
+
+- chunks are sorted by length and cut into batches of similar length, so
+  short chunks (page tails, headings) are not padded to the longest chunk;
+- the batch size for each length is derived from the memory available to
+  the process instead of a fixed default;
+- documents with more than EMBED_PROCESS_THRESHOLD chunks are spread over a
+  pool of EMBED_WORKERS processes, each holding its own model copy. The
+  streaming ingest pipeline embeds a document in slices, so it decides per
+  document (use_process_pool) and passes use_pool to embed_texts;
+- chunks found in the persistent embedding cache are not re-encoded;
+- the result is a float32 NumPy matrix in input order, never Python lists.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from core.embedder import EMBEDDER_MODEL, get_embedder
+from core.embedding_backends import EMBEDDER_BACKEND, MAX_SEQ_LENGTH
+from core.embedding_cache import get_embedding_cache
+from core.logger import get_logger
+
+logger = get_logger("backend.embedding_engine")
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "0"))  # 0: derive from available memory
+EMBED_MIN_BATCH = int(os.getenv("EMBED_MIN_BATCH", "8"))
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "256"))
+EMBED_MEMORY_FRACTION = float(os.getenv("EMBED_MEMORY_FRACTION", "0.25"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", str(max(1, (os.cpu_count() or 1) // 2))))
+EMBED_PROCESS_THRESHOLD = int(os.getenv("EMBED_PROCESS_THRESHOLD", "2000"))
+
+# MiniLM-L6 shape, used to estimate activation memory per sequence
+_HIDDEN = 384
+_HEADS = 12
+_FALLBACK_AVAILABLE_BYTES = 2 * 1024 ** 3
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def estimate_tokens(text: str) -> int:
+    """Word pieces are ~1.3 per whitespace word; capped at the model's max length."""
+    return min(MAX_SEQ_LENGTH, int(len(text.split()) * 1.3) + 2)
+
+
+def available_memory_bytes() -> int:
+    try:
+        import psutil
+        return int(psutil.virtual_memory().available)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return _FALLBACK_AVAILABLE_BYTES
+
+
+def batch_size_for(seq_len: int, available: Optional[int] = None) -> int:
+    """
+    Largest batch whose forward-pass activations for sequences of seq_len
+    tokens fit in EMBED_MEMORY_FRACTION of available memory.
+    """
+    if EMBED_BATCH_SIZE:
+        return EMBED_BATCH_SIZE
+    available = available_memory_bytes() if available is None else available
+    per_sequence = seq_len * _HIDDEN * 4 * 12 + _HEADS * seq_len * seq_len * 4 * 2
+    size = int(available * EMBED_MEMORY_FRACTION // max(per_sequence, 1))
+    return max(EMBED_MIN_BATCH, min(EMBED_MAX_BATCH, size))
+
+
+def length_buckets(texts: List[str]) -> List[List[int]]:
+    """
+    Index batches, longest texts first, each sized for its longest member.
+    """
+    order = sorted(range(len(texts)), key=lambda i: estimate_tokens(texts[i]), reverse=True)
+    available = available_memory_bytes()
+    batches, start = [], 0
+    while start < len(order):
+        size = batch_size_for(estimate_tokens(texts[order[start]]), available)
+        batches.append(order[start:start + size])
+        start += size
+    return batches
+
+
+def use_process_pool(chunk_count: int) -> bool:
+    """Whether a document of chunk_count chunks is worth the process pool."""
+    return EMBED_WORKERS > 1 and chunk_count > EMBED_PROCESS_THRESHOLD
+
+
+def spread_batches(batches: List[List[int]], workers: int) -> List[List[int]]:
+    """Split the largest batches until every worker has one, down to EMBED_MIN_BATCH rows."""
+    batches = list(batches)
+    while len(batches) < workers:
+        largest = max(range(len(batches)), key=lambda i: len(batches[i]))
+        rows = batches[largest]
+        if len(rows) < 2 * EMBED_MIN_BATCH:
+            break
+        half = len(rows) // 2
+        batches[largest:largest + 1] = [rows[:half], rows[half:]]
+    return batches
+
+
+# ---- process pool ----------------------------------------------------
+
+_worker_model = None
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker(model_name: str, backend: str, threads: int) -> None:
+    global _worker_model
+    from core import embedding_backends
+
+    embedding_backends.ONNX_THREADS = threads
+    if backend == "torch":
+        import torch
+        torch.set_num_threads(threads)
+    _worker_model = embedding_backends.load_backend(model_name, backend)
+
+
+def _encode_in_worker(texts: List[str], batch_size: int) -> np.ndarray:
+    return np.asarray(_worker_model.encode(texts, batch_size=batch_size, convert_to_numpy=True), dtype=np.float32)
+
+
+def _get_pool(model_name: str) -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            threads = max(1, (os.cpu_count() or 1) // EMBED_WORKERS)
+            logger.info(f"Starting {EMBED_WORKERS} embedding worker processes ({threads} threads each)")
+            _pool = ProcessPoolExecutor(
+                max_workers=EMBED_WORKERS,
+                # spawn: forking a process that already runs torch threads can deadlock
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_name, EMBEDDER_BACKEND, threads),
+            )
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+# ---- public API ------------------------------------------------------
+
+def _encode(texts: List[str], model_name: str, place: Callable[[List[int], np.ndarray], None],
+            use_pool: Optional[bool] = None) -> None:
+    batches = length_buckets(texts)
+    use_pool = use_process_pool(len(texts)) if use_pool is None else use_pool and EMBED_WORKERS > 1
+    if use_pool:
+        batches = spread_batches(batches, EMBED_WORKERS)
+    logger.info(
+        f"Embedding {len(texts)} texts in {len(batches)} length-bucketed batches "
+        f"({'process pool' if use_pool else 'in-process'})"
+    )
+    if use_pool:
+        pool = _get_pool(model_name)
+        futures = [
+            (rows, pool.submit(_encode_in_worker, [texts[i] for i in rows], len(rows)))
+            for rows in batches
+        ]
+        for rows, future in futures:
+            place(rows, future.result())
+    else:
+        model = get_embedder(model_name)
+        for rows in batches:
+            vectors = model.encode([texts[i] for i in rows], batch_size=len(rows), convert_to_numpy=True)
+            place(rows, np.asarray(vectors, dtype=np.float32))
+
+
+def embed_texts(texts: List[str], model_name: str = EMBEDDER_MODEL,
+                progress: Optional[ProgressCallback] = None, use_cache: bool = True,
+                use_pool: Optional[bool] = None) -> np.ndarray:
+    """
+    Embed texts and return a float32 (len(texts), dim) matrix in input order.
+    Texts already in the embedding cache are not re-encoded; new vectors are
+    added to it. progress(done, total) is called after every finished batch.
+    use_pool forces the process pool on or off; by default it is used when
+    more than EMBED_PROCESS_THRESHOLD texts need encoding.
+    """
+    total = len(texts)
+    if total == 0:
+        dim = get_embedder(model_name).get_sentence_embedding_dimension()
+        return np.zeros((0, dim), dtype=np.float32)
+
+    start = time.perf_counter()
+    out: Optional[np.ndarray] = None
+    done = 0
+
+    def place(rows: List[int], vectors: np.ndarray) -> None:
+        nonlocal out, done
+        if out is None:
+            out = np.empty((total, vectors.shape[1]), dtype=np.float32)
+        out[rows] = vectors
+        done += len(rows)
+        if progress is not None:
+            progress(done, total)
+
+    cache = get_embedding_cache() if use_cache else None
+    cached = cache.get_many(model_name, texts, EMBEDDER_BACKEND) if cache is not None else {}
+    if cached:
+        rows = list(cached)
+        place(rows, np.stack([cached[i] for i in rows]))
+        logger.info(f"Embedding cache: {len(cached)}/{total} chunks already embedded")
+
+    missing = [i for i in range(total) if i not in cached]
+    if missing:
+        missing_texts = [texts[i] for i in missing]
+        encoded: Dict[int, np.ndarray] = {}
+
+        def place_missing(rows: List[int], vectors: np.ndarray) -> None:
+            for row, vector in zip(rows, vectors):
+                encoded[row] = vector
+            place([missing[r] for r in rows], vectors)
+
+        _encode(missing_texts, model_name, place_missing, use_pool)
+        if cache is not None:
+            try:
+                cache.put_many(model_name, missing_texts, np.stack([encoded[r] for r in range(len(missing))]),
+                               EMBEDDER_BACKEND)
+            except Exception as e:
+                logger.warning(f"Could not update embedding cache: {e}")
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Embedded {total} texts in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} texts/s)")
+    return out
+
+
+__all__ = [
+    'available_memory_bytes',
+    'batch_size_for',
+    'length_buckets',
+    'use_process_pool',
+    'embed_texts',
+    'shutdown_pool'
+]
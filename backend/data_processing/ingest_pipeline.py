@@ -0,0 +1,497 @@
+# ingest_pipeline.py
+"""
+Streaming ingestion: extract -> chunk -> embed -> upsert as concurrent stages.
+
+Each stage runs in its own thread and hands work to the next through a
+bounded queue, so page N is embedded while page N+1 is being extracted and
+an earlier batch is being upserted. Only a few pages, embedding batches and
+upsert batches are in flight at any time, which caps memory regardless of
+document size; nothing holds the full page, chunk or vector list.
+
+Re-ingestion stays incremental (see point_id_for): chunks whose id is
+already stored are skipped before embedding, and ids of the previous
+version that did not reappear are deleted once every new batch is in.
+Upserts go through AdaptiveUploader: several batches in flight, sized by
+payload bytes and observed latency.
+
+Pages whose text is None are waiting for OCR (services.file_handler with
+defer_ocr): they produce no chunks, so no placeholder text is embedded,
+and their previously indexed chunks are kept. ingest_ocr_pages indexes
+them once OCR has run in the background.
+"""
+import hashlib
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from core import file_catalog
+from core.app_state import bump_corpus_version
+from core.bm25_index import get_bm25_index
+from core.embedder import EMBEDDER_MODEL
+from core.logger import get_logger
+from core.vector_store import get_vector_store
+from data_processing.adaptive_uploader import AdaptiveUploader
+from data_processing.chunk import chunk_page
+from data_processing.embedding_engine import EMBED_WORKERS, embed_texts, use_process_pool
+
+logger = get_logger("backend.ingest_pipeline")
+
+PIPELINE_PAGE_QUEUE = int(os.getenv("PIPELINE_PAGE_QUEUE", "8"))
+# Chunks per embed_texts call. Once a document has produced more than
+# EMBED_PROCESS_THRESHOLD chunks it counts as large: the rest of it is
+# embedded on the process pool, EMBED_WORKERS slices of this size per call
+PIPELINE_EMBED_BATCH = int(os.getenv("PIPELINE_EMBED_BATCH", "128"))
+PIPELINE_UPSERT_QUEUE = int(os.getenv("PIPELINE_UPSERT_QUEUE", "4"))
+
+POINT_ID_NAMESPACE = uuid.UUID("6f1c9e2a-3b5d-4c8e-9a7f-2d4b6e8c0a13")
+
+Page = Tuple[str, int, str]  # (text, page, source) as produced by services.file_handler
+
+_DONE = object()
+
+
+def point_id_for(file_name: str, page, chunk_index, text: str) -> str:
+    """
+    Deterministic point id: the same chunk of the same file always maps to
+    the same id, so re-ingestion can diff against what is already stored.
+    """
+    text_digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{file_name}|{page}|{chunk_index}|{text_digest}"))
+
+
+def record_in_catalog(file_name: str, file_id: str, page_count: int, chunk_count: int, content_hash: str,
+                      pending_ocr_pages: int = 0) -> None:
+    file_catalog.upsert_file(
+        file_name=file_name,
+        file_id=file_id,
+        page_count=page_count,
+        chunk_count=chunk_count,
+        content_hash=content_hash,
+        pending_ocr_pages=pending_ocr_pages
+    )
+
+
+def existing_points(store, file_name: str, batch_size: int = 1000) -> Dict[Any, Any]:
+    """{point id: page} for every stored chunk of file_name."""
+    points_by_id, offset = {}, None
+    if not store.collection_exists():
+        return points_by_id
+    while True:
+        points, offset = store.scroll(file_name=file_name, limit=batch_size, offset=offset, with_payload=["page"])
+        points_by_id.update((p.id, p.payload.get("page")) for p in points)
+        if offset is None:
+            return points_by_id
+
+
+def index_lexically(ids: List[str], payloads: List[Dict[str, Any]]) -> None:
+    """
+    Add a stored batch to the BM25 index as soon as it is in the vector
+    store, so no stage holds the payloads of the whole document. The index
+    file is written once per document, by save_bm25.
+    """
+    try:
+        get_bm25_index().add(ids, payloads, save=False)
+    except Exception as e:
+        logger.warning(f"Could not update BM25 index: {e}")
+
+
+def save_bm25() -> None:
+    try:
+        get_bm25_index().save()
+    except Exception as e:
+        logger.warning(f"Could not save BM25 index: {e}")
+
+
+class PipelineCancelled(Exception):
+    pass
+
+
+class _Stage(threading.Thread):
+    """Worker thread that records the first exception and stops the pipeline."""
+
+    def __init__(self, name: str, target: Callable[[], None], failed: threading.Event, errors: List[BaseException]):
+        super().__init__(name=f"ingest-{name}", daemon=True)
+        self._target_fn = target
+        self._failed = failed
+        self._errors = errors
+
+    def run(self) -> None:
+        try:
+            self._target_fn()
+        except BaseException as e:
+            self._errors.append(e)
+            self._failed.set()
+
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> None:
+    """Blocking put that gives up once the pipeline is stopping."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+    raise PipelineCancelled()
+
+
+def _get(q: queue.Queue, stop: threading.Event) -> Any:
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    raise PipelineCancelled()
+
+
+def ingest_pages(
+    pages: Iterable[Page],
+    file_name: str,
+    content_hash: Optional[str] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Dict[str, Any]:
+    """
+    Ingest an iterable (ideally a generator) of pages for file_name.
+
+    progress(stats) is called as stages advance with counters for pages
+    extracted, chunks produced/embedded/skipped and points upserted. Setting
+    cancel stops all stages; already upserted points are kept.
+    Returns the same status dict as build_and_save_index.
+    """
+    store = get_vector_store()
+    configured, reason = store.is_configured()
+    if not configured:
+        return {"file_name": file_name, "status": "error", "reason": reason}
+
+    try:
+        existing_pages = existing_points(store, file_name)
+    except Exception as e:
+        return {"file_name": file_name, "status": "error", "reason": f"Listing existing points failed: {e}"}
+    existing_ids = set(existing_pages)
+
+    entry = file_catalog.get_file(file_name)
+    file_id = entry["file_id"] if entry else str(uuid.uuid4())
+
+    stop = threading.Event()
+    cancel = cancel or threading.Event()
+    errors: List[BaseException] = []
+    page_q: "queue.Queue" = queue.Queue(maxsize=PIPELINE_PAGE_QUEUE)
+    upsert_q: "queue.Queue" = queue.Queue(maxsize=PIPELINE_UPSERT_QUEUE)
+
+    stats = {
+        "pages_extracted": 0,
+        "chunks": 0,
+        "chunks_embedded": 0,
+        "chunks_unchanged": 0,
+        "points_upserted": 0,
+        "failed_batches": 0,
+        "pages_pending_ocr": 0,
+    }
+    stats_lock = threading.Lock()
+    wanted_ids = set()
+    upload_stats: Dict[str, Any] = {}
+    page_numbers = set()
+    pending_ocr: List[int] = []
+    text_hash = hashlib.sha256()
+
+    def bump(**deltas) -> None:
+        with stats_lock:
+            for key, value in deltas.items():
+                stats[key] += value
+            snapshot = dict(stats)
+        if progress is not None:
+            progress(snapshot)
+
+    def extract() -> None:
+        first = True
+        for text, page_number, source in pages:
+            if cancel.is_set():
+                raise PipelineCancelled()
+            page_numbers.add(page_number)
+            if text is None:
+                pending_ocr.append(page_number)
+                bump(pages_extracted=1, pages_pending_ocr=1)
+                continue
+            if not first:
+                text_hash.update(b"\n")
+            first = False
+            text_hash.update(text.encode("utf-8"))
+            _put(page_q, {"text": text, "page": page_number, "source": source}, stop)
+            bump(pages_extracted=1)
+        _put(page_q, _DONE, stop)
+
+    def embed() -> None:
+        pending: List[Tuple[str, Dict[str, Any]]] = []
+        chunk_count = 0
+
+        def flush() -> None:
+            if not pending:
+                return
+            vectors = embed_texts([chunk["text"] for _, chunk in pending], EMBEDDER_MODEL,
+                                  use_pool=use_process_pool(chunk_count))
+            store.ensure_collection(vectors.shape[1])
+            ids = [pid for pid, _ in pending]
+            payloads = [
+                {
+                    "text": chunk["text"],
+                    "page": chunk["page"],
+                    "source": chunk["source"],
+                    "file_id": file_id,
+                    "file_name": file_name,
+                    "chunk_index": chunk.get("chunk_index")
+                }
+                for _, chunk in pending
+            ]
+            _put(upsert_q, (ids, vectors, payloads), stop)
+            bump(chunks_embedded=len(pending))
+            pending.clear()
+
+        while True:
+            page = _get(page_q, stop)
+            if page is _DONE:
+                break
+            if cancel.is_set():
+                raise PipelineCancelled()
+            chunks = chunk_page(page)
+            chunk_count += len(chunks)
+            unchanged = 0
+            for chunk in chunks:
+                pid = point_id_for(file_name, chunk["page"], chunk.get("chunk_index"), chunk["text"])
+                if pid in wanted_ids:
+                    continue  # identical chunk at the same position
+                wanted_ids.add(pid)
+                if pid in existing_ids:
+                    unchanged += 1
+                    continue
+                pending.append((pid, chunk))
+            bump(chunks=len(chunks), chunks_unchanged=unchanged)
+            large = use_process_pool(chunk_count)
+            if len(pending) >= PIPELINE_EMBED_BATCH * (EMBED_WORKERS if large else 1):
+                flush()
+        flush()
+        _put(upsert_q, _DONE, stop)
+
+    def stored(ids: List[str], payloads: List[Dict[str, Any]]) -> None:
+        # Whatever made it into the store is searchable lexically too
+        index_lexically(ids, payloads)
+        bump(points_upserted=len(ids))
+
+    def upsert() -> None:
+        uploader = AdaptiveUploader(store, on_success=stored, on_failure=lambda ids, payloads: bump(failed_batches=1))
+        finished = False
+        try:
+            while True:
+                item = _get(upsert_q, stop)
+                if item is _DONE:
+                    finished = True
+                    return
+                uploader.submit(*item)
+        finally:
+            # On cancel/failure only wait for the batches already in flight
+            upload_stats.update(uploader.close(flush=finished))
+
+    start_time = time.perf_counter()
+    failed = threading.Event()
+    stages = [_Stage(name, fn, failed, errors) for name, fn in (("extract", extract), ("embed", embed), ("upsert", upsert))]
+    for stage in stages:
+        stage.start()
+    while any(stage.is_alive() for stage in stages):
+        if failed.is_set() or cancel.is_set():
+            stop.set()
+        for stage in stages:
+            stage.join(timeout=0.1)
+    elapsed = time.perf_counter() - start_time
+
+    uploaded = stats["points_upserted"]
+    save_bm25()
+
+    result = {"file_name": file_name, "pending_ocr_pages": sorted(pending_ocr), "points_uploaded": stats["points_upserted"],
+              "points_unchanged": stats["chunks_unchanged"], "failed_batches": stats["failed_batches"],
+              "elapsed_s": round(elapsed, 2), "points_per_sec": upload_stats.get("points_per_sec", 0.0),
+              "upload": upload_stats}
+
+    error = next((e for e in errors if not isinstance(e, PipelineCancelled)), None)
+    if cancel.is_set() or error is not None:
+        if uploaded:
+            bump_corpus_version()
+        if error is None:
+            return {**result, "status": "cancelled", "points_deleted": 0}
+        logger.error(f"Ingestion of {file_name} failed: {error}")
+        return {**result, "status": "error", "reason": str(error), "points_deleted": 0}
+
+    if not wanted_ids and not pending_ocr:
+        return {**result, "status": "skipped", "reason": "No chunks generated", "points_deleted": 0}
+
+    new_count = stats["chunks_embedded"]
+    if new_count and not uploaded:
+        return {**result, "status": "error", "reason": "All upload batches failed", "points_deleted": 0}
+
+    # Remove chunks of the previous version only once the new ones are in,
+    # so a failed upload never leaves the file half-searchable
+    # Chunks of pages still waiting for OCR stay until ingest_ocr_pages replaces them
+    waiting = set(pending_ocr)
+    kept_ids = [pid for pid, page in existing_pages.items() if page in waiting and pid not in wanted_ids]
+    stale_ids = [pid for pid in existing_ids if pid not in wanted_ids and existing_pages[pid] not in waiting]
+    points_deleted = 0
+    if stale_ids and stats["failed_batches"] == 0:
+        try:
+            store.delete_ids(stale_ids)
+            get_bm25_index().remove_ids(stale_ids)
+            points_deleted = len(stale_ids)
+        except Exception as e:
+            logger.warning(f"Could not delete stale chunks of {file_name}: {e}")
+    elif stale_ids:
+        logger.warning(f"Keeping {len(stale_ids)} stale chunks of {file_name} because some batches failed")
+
+    content_hash = content_hash or text_hash.hexdigest()
+    changed = bool(uploaded or points_deleted)
+    if (changed or entry is None or entry.get("content_hash") != content_hash
+            or entry.get("pending_ocr_pages", 0) != len(pending_ocr)):
+        record_in_catalog(file_name, file_id, len(page_numbers),
+                          stats["chunks_unchanged"] + uploaded + len(kept_ids), content_hash, len(pending_ocr))
+    if changed:
+        bump_corpus_version()
+
+    logger.info(
+        f"Ingested {file_name}: {stats['pages_extracted']} pages, {uploaded} new, "
+        f"{stats['chunks_unchanged']} unchanged, {points_deleted} stale chunks in {elapsed:.1f}s"
+        + (f", {len(pending_ocr)} pages queued for OCR" if pending_ocr else "")
+    )
+    return {**result, "status": "uploaded" if changed else "unchanged", "points_deleted": points_deleted}
+
+
+def ingest_ocr_pages(
+    pages: Iterable[Page],
+    file_name: str,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Dict[str, Any]:
+    """
+    Index pages of file_name whose OCR ran after the text-layer pages were
+    ingested. Each page's new chunks are upserted and its previous chunks
+    (placeholders, an older version) deleted, then the file's pending OCR
+    count in the catalog goes down. Pages with text None (OCR failed) make
+    the result an error and leave the catalog untouched; the job is retried
+    and, with the OCR cache and deterministic ids, only redoes what failed.
+    """
+    store = get_vector_store()
+    entry = file_catalog.get_file(file_name)
+    if entry is None:
+        return {"file_name": file_name, "status": "cancelled", "reason": "File is no longer in the catalog"}
+    cancel = cancel or threading.Event()
+
+    try:
+        existing_pages = existing_points(store, file_name)
+    except Exception as e:
+        return {"file_name": file_name, "status": "error", "reason": f"Listing existing points failed: {e}"}
+
+    stats = {"pages_ocred": 0, "ocr_failed": 0, "chunks_embedded": 0, "chunks_unchanged": 0,
+             "points_upserted": 0, "failed_batches": 0}
+    wanted_ids = set()
+    done_pages = set()
+    lock = threading.Lock()
+
+    def bump(**deltas) -> None:
+        with lock:
+            for key, value in deltas.items():
+                stats[key] += value
+            snapshot = dict(stats)
+        if progress is not None:
+            progress(snapshot)
+
+    def stored(ids: List[str], payloads: List[Dict[str, Any]]) -> None:
+        index_lexically(ids, payloads)
+        bump(points_upserted=len(ids))
+
+    start_time = time.perf_counter()
+    uploader = AdaptiveUploader(store, on_success=stored, on_failure=lambda ids, payloads: bump(failed_batches=1))
+    try:
+        for text, page_number, source in pages:
+            if cancel.is_set():
+                break
+            if text is None:
+                bump(ocr_failed=1)
+                continue
+            done_pages.add(page_number)
+            # Pages where OCR found next to nothing are dropped, not indexed as placeholders
+            chunks = chunk_page({"text": text, "page": page_number, "source": source}) if len(text) > 20 else []
+            new = []
+            for chunk in chunks:
+                pid = point_id_for(file_name, chunk["page"], chunk.get("chunk_index"), chunk["text"])
+                if pid in wanted_ids:
+                    continue
+                wanted_ids.add(pid)
+                if pid not in existing_pages:
+                    new.append((pid, chunk))
+            if new:
+                vectors = embed_texts([chunk["text"] for _, chunk in new], EMBEDDER_MODEL)
+                store.ensure_collection(vectors.shape[1])
+                uploader.submit(
+                    [pid for pid, _ in new],
+                    vectors,
+                    [
+                        {
+                            "text": chunk["text"],
+                            "page": chunk["page"],
+                            "source": chunk["source"],
+                            "file_id": entry["file_id"],
+                            "file_name": file_name,
+                            "chunk_index": chunk.get("chunk_index")
+                        }
+                        for _, chunk in new
+                    ],
+                )
+            bump(pages_ocred=1, chunks_embedded=len(new), chunks_unchanged=len(chunks) - len(new))
+    finally:
+        upload_stats = uploader.close(flush=not cancel.is_set())
+    elapsed = time.perf_counter() - start_time
+
+    uploaded = stats["points_upserted"]
+    save_bm25()
+
+    points_deleted = 0
+    complete = stats["failed_batches"] == 0 and stats["ocr_failed"] == 0 and not cancel.is_set()
+    if stats["failed_batches"] == 0 and not cancel.is_set():
+        stale_ids = [pid for pid, page in existing_pages.items() if page in done_pages and pid not in wanted_ids]
+        if stale_ids:
+            try:
+                store.delete_ids(stale_ids)
+                get_bm25_index().remove_ids(stale_ids)
+                points_deleted = len(stale_ids)
+            except Exception as e:
+                logger.warning(f"Could not delete placeholder chunks of {file_name}: {e}")
+    if complete:
+        file_catalog.update_ocr_progress(file_name, len(done_pages), store.count(file_name))
+    if uploaded or points_deleted:
+        bump_corpus_version()
+
+    remaining = (file_catalog.get_file(file_name) or {}).get("pending_ocr_pages", 0)
+    result = {
+        "file_name": file_name,
+        "pages_ocred": stats["pages_ocred"],
+        "ocr_failed": stats["ocr_failed"],
+        "points_uploaded": uploaded,
+        "points_deleted": points_deleted,
+        "failed_batches": stats["failed_batches"],
+        "pending_ocr_pages": remaining,
+        "elapsed_s": round(elapsed, 2),
+        "points_per_sec": upload_stats.get("points_per_sec", 0.0),
+    }
+    logger.info(f"OCR backfill of {file_name}: {stats['pages_ocred']} pages, {uploaded} new chunks, "
+                f"{points_deleted} replaced, {remaining} pages still pending")
+    if cancel.is_set():
+        return {**result, "status": "cancelled"}
+    if stats["ocr_failed"]:
+        return {**result, "status": "error", "reason": f"OCR failed on {stats['ocr_failed']} pages"}
+    return {**result, "status": "uploaded" if uploaded or points_deleted else "unchanged"}
+
+
+__all__ = [
+    'point_id_for',
+    'PipelineCancelled',
+    'ingest_pages',
+    'ingest_ocr_pages'
+]
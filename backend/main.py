@@ -1,22 +1,40 @@
-from fastapi import FastAPI, File, UploadFile, Form
+from fastapi import FastAPI, File, UploadFile, Form, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, StreamingResponse
 from services.chat_history import update_chat_history, get_chat_context, clear_chat_history
-from services.file_handler import extract_text_from_file
+from services.file_handler import extract_text_from_file, iter_pages_from_path, iter_ocr_pages
+from services.upload_spool import spool_upload, spooled_upload
 from data_processing.build_vector_store import build_and_save_index
-from services.retrieval import search_similar_chunks, delete_file_chunks, list_files, clear_entire_collection, get_chunks_for_file, get_detailed_file_info, health_check
+from data_processing.ingest_pipeline import ingest_ocr_pages
+from services.retrieval import async_search_similar_chunks, delete_file_chunks, list_files, clear_entire_collection, get_chunks_for_file, get_detailed_file_info, health_check, sync_catalog_from_collection, rebuild_bm25_from_store
 from services.gemini_setup import stream_answer
+from services import answer_cache
 from services.prompt_utils import format_prompt
+from services.context_packer import pack_context
 from prompts.legalprompt import system_prompt
 from services.live_news import fetch_weather_news
 from services.web_scraper import scrape_url
 from services.web_processor import process_web_content
+from services.ingest_jobs import get_job_manager
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 import re
 from dotenv import load_dotenv
 import os
+import shutil
 from core.logger import get_logger
+from core.embedder import warm_up_embedder, embedder_status
+from core.qdrant_manager import close_clients
+from core import file_catalog
+from core.bm25_index import get_bm25_index
+from core.vector_store import get_vector_store
+from core.metrics import collect_metrics
+from core.app_state import get_corpus_version
+from core.embedder import embed_query_async
+from data_processing.embedding_engine import shutdown_pool as shutdown_embedding_pool
+from services.parallel_pdf import PDF_EXTRACT_WORKERS, shutdown_pool as shutdown_pdf_pool
+from services.ocr_engine import shutdown_engine as shutdown_ocr_engine
+import asyncio
 from routes.log_test import router as log_test_router
 import time
 
@@ -64,6 +82,46 @@ async def log_requests(request, call_next):
             },
         )
 
+# Load and warm the shared embedding model once per process so the first
+# /ask or /upload does not pay for it
+@app.on_event("startup")
+async def warm_up_models():
+    try:
+        warm_up_embedder()
+    except Exception:
+        logger.exception("Embedding model warm-up failed")
+    # Collections created before payload indexes were introduced get them now
+    try:
+        get_vector_store().ensure_indexes()
+    except Exception:
+        logger.exception("Payload index migration failed")
+    # Collections created before the file catalog existed need a one-off backfill
+    try:
+        if not file_catalog.has_files():
+            sync_catalog_from_collection()
+    except Exception:
+        logger.exception("File catalog backfill failed")
+    # Same for the BM25 index used by hybrid search
+    try:
+        if len(get_bm25_index()) == 0 and file_catalog.has_files():
+            rebuild_bm25_from_store()
+    except Exception:
+        logger.exception("BM25 index backfill failed")
+    # Background ingestion; jobs left over from a previous run resume here
+    jobs = get_job_manager()
+    jobs.register_handler("file", run_file_job)
+    jobs.register_handler("url", run_url_job)
+    jobs.register_handler("ocr", run_ocr_job)
+    jobs.start()
+
+@app.on_event("shutdown")
+async def close_qdrant_clients():
+    get_job_manager().stop()
+    await close_clients()
+    shutdown_embedding_pool()
+    shutdown_pdf_pool()
+    shutdown_ocr_engine()
+
 # Global variables
 most_recent_file: Optional[str] = None
 web_content_sources: Dict[str, Dict[str, Any]] = {}
@@ -72,27 +130,121 @@ web_content_sources: Dict[str, Dict[str, Any]] = {}
 async def root():
     return {"message": "Document AI Assistant API is running!", "version": "1.0.0"}
 
+def run_file_job(job: Dict[str, Any], progress, cancel) -> Dict[str, Any]:
+    """
+    Ingestion job handler for an uploaded file spooled to disk by /upload.
+    Text-layer pages are indexed right away; pages that need OCR are handed
+    to a follow-up "ocr" job, which takes over the spooled file.
+    """
+    global most_recent_file
+    params = job["params"]
+    status = build_and_save_index(
+        iter_pages_from_path(params["path"], params["file_name"], defer_ocr=True,
+                             content_hash=params["content_hash"]),
+        content_hash=params["content_hash"],
+        file_name=params["file_name"],
+        progress=progress,
+        cancel=cancel,
+    )
+    if status.get("status") in ("uploaded", "unchanged"):
+        most_recent_file = params["file_name"]
+        logger.info(f"Set most recent file to: {most_recent_file}")
+        # A run with failed batches is retried and queues the OCR job then
+        if status.get("pending_ocr_pages") and not status.get("failed_batches"):
+            status["ocr_job_id"] = queue_ocr_job(params, status["pending_ocr_pages"])
+    return status
+
+def queue_ocr_job(params: Dict[str, Any], pages: List[int]) -> str:
+    manager = get_job_manager()
+    job_id = manager.new_job_id()
+    path = manager.spool_path(job_id, params["file_name"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # The file job's spool (or the request's temp file) is removed when it finishes
+    shutil.move(params["path"], path)
+    manager.submit(
+        "ocr",
+        {"path": path, "file_name": params["file_name"], "pages": pages, "content_hash": params["content_hash"]},
+        job_id=job_id,
+    )
+    logger.info(f"Queued OCR of {len(pages)} pages of {params['file_name']} as job {job_id}")
+    return job_id
+
+def run_ocr_job(job: Dict[str, Any], progress, cancel) -> Dict[str, Any]:
+    """Ingestion job handler that OCRs the deferred pages of an uploaded PDF."""
+    params = job["params"]
+    return ingest_ocr_pages(
+        iter_ocr_pages(params["path"], params["pages"], params["file_name"], params.get("content_hash")),
+        params["file_name"],
+        progress=progress,
+        cancel=cancel,
+    )
+
+def run_url_job(job: Dict[str, Any], progress, cancel) -> Dict[str, Any]:
+    """Ingestion job handler for /scrape-and-process?background=true."""
+    url = job["params"]["url"]
+    result = asyncio.run(process_web_content(url, progress=progress, cancel=cancel))
+    if result["status"] == "success":
+        track_web_source(url, result)
+    return result
+
+def track_web_source(url: str, result: Dict[str, Any]) -> None:
+    global web_content_sources, most_recent_file
+    source_name = result["source_name"]
+    web_content_sources[source_name] = {
+        "url": url,
+        "title": result["title"],
+        "sections": result["sections"],
+        "chunks": result["chunks_generated"],
+        "processed_at": datetime.now().isoformat()
+    }
+    # Set as most recent file for queries
+    most_recent_file = source_name
+
 @app.post("/upload")
-async def upload_file(files: list[UploadFile] = File(..., max_size=200*1024*1024)):
+async def upload_file(
+    files: list[UploadFile] = File(..., max_size=200*1024*1024),
+    wait: bool = Query(False, description="Process inside the request instead of as a background job"),
+):
     """
     Upload and process document files.
+    By default each file is stored and queued as a background ingestion job
+    and the response (202) lists the job ids to poll at /jobs/{job_id}.
     """
     try:
         global most_recent_file
         results = []
+        jobs = []
+        manager = get_job_manager()
         for file in files:
-            content = await file.read()
-            
-            # Delete existing file with the same name first
-            try:
-                delete_file_chunks(file.filename)
-                logger.info(f"Deleted existing chunks for: {file.filename}")
-            except Exception as delete_error:
-                logger.warning(f"Could not delete existing file (might not exist): {delete_error}")
-            
-            # Extract text and build index
-            page_chunks = extract_text_from_file(file.filename, content)
-            status = build_and_save_index(page_chunks)
+            # Uploads are streamed to disk and extracted from there, never
+            # held in memory as a whole
+            if not wait:
+                job_id = manager.new_job_id()
+                spooled = await spool_upload(file, manager.spool_path(job_id, file.filename))
+                manager.submit(
+                    "file",
+                    {"path": spooled.path, "file_name": file.filename, "content_hash": spooled.sha256},
+                    job_id=job_id,
+                )
+                jobs.append({"job_id": job_id, "file_name": file.filename, "status": "queued"})
+                continue
+
+            # Stream pages through the extract -> chunk -> embed -> upsert
+            # pipeline off the event loop; re-uploads only touch changed chunks
+            async with spooled_upload(file) as spooled:
+                status = await asyncio.to_thread(
+                    build_and_save_index,
+                    iter_pages_from_path(spooled.path, file.filename, content_hash=spooled.sha256),
+                    content_hash=spooled.sha256,
+                    file_name=file.filename,
+                )
+                # Pages whose OCR failed are retried in the background
+                if (status.get("status") in ("uploaded", "unchanged") and status.get("pending_ocr_pages")
+                        and not status.get("failed_batches")):
+                    status["ocr_job_id"] = queue_ocr_job(
+                        {"path": spooled.path, "file_name": file.filename, "content_hash": spooled.sha256},
+                        status["pending_ocr_pages"],
+                    )
             results.append(status)
             
             # Update the most recent file
@@ -100,6 +252,12 @@ async def upload_file(files: list[UploadFile] = File(..., max_size=200*1024*1024
             logger.info(f"Set most recent file to: {most_recent_file}")
 
         clear_chat_history()  # reset on new upload
+        if jobs:
+            return JSONResponse(status_code=202, content={
+                "message": f"Queued {len(jobs)} file(s) for processing",
+                "files": [job["file_name"] for job in jobs],
+                "jobs": jobs,
+            })
         return {"results": results}
 
     except Exception as e:
@@ -107,27 +265,23 @@ async def upload_file(files: list[UploadFile] = File(..., max_size=200*1024*1024
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 @app.post("/scrape-and-process")
-async def scrape_and_process_url(url: str = Form(...)):
+async def scrape_and_process_url(url: str = Form(...), background: bool = Form(False)):
     """
     Scrape a URL, process the content, and add it to the knowledge base.
+    With background=true the work runs as an ingestion job and the response
+    (202) carries its id.
     """
     try:
+        if background:
+            job_id = get_job_manager().submit("url", {"url": url})
+            return JSONResponse(status_code=202, content={"status": "queued", "job_id": job_id, "url": url})
+
         result = await process_web_content(url)
         
         if result["status"] == "success":
             # Track the web content source
-            global web_content_sources, most_recent_file
+            track_web_source(url, result)
             source_name = result["source_name"]
-            web_content_sources[source_name] = {
-                "url": url,
-                "title": result["title"],
-                "sections": result["sections"],
-                "chunks": result["chunks_generated"],
-                "processed_at": datetime.now().isoformat()
-            }
-            
-            # Set as most recent file for queries
-            most_recent_file = source_name
             
             return {
                 "status": "success",
@@ -161,8 +315,50 @@ async def scrape_and_process_url(url: str = Form(...)):
             }
         )
 
+@app.get("/jobs")
+async def list_ingest_jobs(limit: int = 50):
+    """Recent ingestion jobs, newest first."""
+    return {"jobs": get_job_manager().list_jobs(limit)}
+
+@app.get("/jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    """
+    Status of an ingestion job with per-stage progress: pages_extracted,
+    chunks_embedded, chunks_unchanged, points_upserted, failed_batches.
+    """
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Job '{job_id}' not found"})
+    return job
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_ingest_job(job_id: str):
+    """Cancel a queued job, or stop a running one after its current batch."""
+    job = get_job_manager().cancel(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Job '{job_id}' not found"})
+    return job
+
+@app.post("/jobs/{job_id}/retry")
+async def retry_ingest_job(job_id: str):
+    """Re-run a failed or cancelled job; chunks already stored are skipped."""
+    try:
+        job = get_job_manager().retry(job_id)
+    except FileNotFoundError as e:
+        return JSONResponse(status_code=409, content={"error": str(e)})
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Job '{job_id}' not found"})
+    return job
+
+def answer_cache_enabled(request: Request) -> bool:
+    """Clients opt out with `X-Answer-Cache: off` or `Cache-Control: no-cache`."""
+    if request.headers.get("x-answer-cache", "").lower() in ("off", "bypass", "0", "false"):
+        return False
+    cache_control = request.headers.get("cache-control", "").lower()
+    return "no-cache" not in cache_control and "no-store" not in cache_control
+
 @app.post("/ask")
-async def ask_question(question: str = Form(...)):
+async def ask_question(request: Request, question: str = Form(...)):
     """
     Ask a question about the uploaded documents or web content.
     """
@@ -204,13 +400,9 @@ async def ask_question(question: str = Form(...)):
                 else:
                     logger.warning(f"Failed to process URL: {result['message']}")
 
-        # Always check available files
-        files = list_files()
-        logger.debug(f"Files available in Qdrant: {files}")
-
-        # Search in vector DB - prioritize the most recent file
-        top_chunks, similarity_score = search_similar_chunks(question, preferred_file=most_recent_file)
-        history_context = get_chat_context()
+        # Always check available files (local catalog lookup, no Qdrant scroll)
+        files_available = file_catalog.has_files()
+        logger.debug(f"Files available in catalog: {files_available}")
 
         # Handle greetings
         greetings = ["hi", "hello", "hey", "greetings", "good morning", "good afternoon", "good evening"]
@@ -218,28 +410,62 @@ async def ask_question(question: str = Form(...)):
             greeting_text = "Hello! How can I help you with your uploaded documents today?"
             return StreamingResponse(stream_answer(greeting_text), media_type="text/plain")
 
+        # Replay a cached answer for the same question neighbourhood, preferred
+        # file and corpus version before doing any retrieval or generation
+        use_answer_cache = answer_cache_enabled(request)
+        corpus_version = get_corpus_version()
+        # Answers depend on the conversation so far, so it is part of the key
+        history_context = get_chat_context()
+        history_key = answer_cache.history_key(history_context)
+        query_vec = None
+        if use_answer_cache:
+            query_vec = await embed_query_async(question)
+            cached_chunks = answer_cache.lookup(query_vec, most_recent_file, corpus_version, history_key)
+            if cached_chunks is not None:
+                logger.info("Answer cache hit")
+                update_chat_history(question)
+                return StreamingResponse(
+                    answer_cache.replay(cached_chunks),
+                    media_type="text/plain",
+                    headers={"X-Answer-Cache": "hit"}
+                )
+
+        def answer_stream(prompt: str):
+            stream = stream_answer(prompt)
+            if use_answer_cache:
+                return answer_cache.record_stream(stream, query_vec, most_recent_file, corpus_version, history_key)
+            return stream
+
+        # Search in vector DB - prioritize the most recent file
+        top_chunks, similarity_score = await async_search_similar_chunks(question, preferred_file=most_recent_file)
+
         # Case A: Relevant chunks found
         if top_chunks and similarity_score >= 0.10:
-            context_parts = []
-            for chunk in top_chunks:
+            def source_header(chunk):
                 # Handle web content sources differently
                 if chunk['file_name'].startswith('web_'):
                     # Find the URL for this web source
                     web_info = web_content_sources.get(chunk['file_name'], {})
                     url = web_info.get('url', 'Unknown URL')
-                    meta = f"[Source: {web_info.get('title', 'Web Content')} - {url} - Section {chunk['page']}]"
-                else:
-                    meta = f"[Source: {chunk['file_name']} - Page {chunk['page']}]"
-                
-                context_parts.append(f"{meta}\n{chunk['text']}")
-            
-            context = "\n\n".join(context_parts)
+                    return f"[Source: {web_info.get('title', 'Web Content')} - {url} - Section {chunk['page']}]"
+                return f"[Source: {chunk['file_name']} - Page {chunk['page']}]"
+
+            packed = pack_context(top_chunks, header_for=source_header)
+            context = packed["context"]
+            logger.info(
+                f"Packed {packed['chunks_used']}/{packed['chunks_in']} chunks into {packed['tokens']} context tokens "
+                f"({packed['duplicates_dropped']} duplicates dropped, {packed['merged']} merged)"
+            )
             prompt = format_prompt(context, question, history_context)
             update_chat_history(question)
-            return StreamingResponse(stream_answer(prompt), media_type="text/plain")
+            return StreamingResponse(
+                answer_stream(prompt),
+                media_type="text/plain",
+                headers={"X-Context-Tokens": str(packed["tokens"])},
+            )
 
         # Case B: Files exist but no relevant info
-        if files:
+        if files_available:
             prompt = (
                 f"{system_prompt}\n\n"
                 f"{history_context}\n\n"
@@ -247,7 +473,7 @@ async def ask_question(question: str = Form(...)):
                 "⚠️ No direct match found in uploaded documents. This answer is based on general knowledge."
             )
             update_chat_history(question)
-            return StreamingResponse(stream_answer(prompt), media_type="text/plain")
+            return StreamingResponse(answer_stream(prompt), media_type="text/plain")
 
         # Case C: No files at all
         return JSONResponse({"message": "⚠️ No documents found. Please upload a document to begin."})
@@ -399,11 +625,18 @@ async def database_status():
 async def health():
     """Health check endpoint."""
     try:
-        return health_check()
+        status = health_check()
+        status["embedder"] = embedder_status()
+        return status
     except Exception as e:
         logger.exception("Health check failed")
         return JSONResponse(status_code=500, content={"error": f"Health check failed: {str(e)}"})
 
+@app.get("/metrics")
+async def metrics():
+    """In-process cache and latency metrics."""
+    return collect_metrics()
+
 @app.get("/current-file")
 async def get_current_file():
     """Get the most recently uploaded file."""
@@ -415,10 +648,7 @@ async def set_current_file(file_name: str = Form(...)):
     global most_recent_file
     
     # Verify the file exists in the database
-    files = list_files()
-    file_exists = any(f["file_name"] == file_name for f in files)
-    
-    if file_exists:
+    if file_catalog.get_file(file_name):
         most_recent_file = file_name
         return {"message": f"Current file set to: {file_name}"}
     else:
@@ -429,20 +659,29 @@ async def set_current_file(file_name: str = Form(...)):
 async def test_extraction(file: UploadFile = File(...)):
     """
     Test text extraction from a file without saving to database.
+    The response reports extraction time and pages/sec on the configured
+    PDF_EXTRACT_WORKERS processes (see benchmarks.bench_pdf_extraction).
     """
     try:
-        content = await file.read()
-        pages = extract_text_from_file(file.filename, content)
+        async with spooled_upload(file) as spooled:
+            start = time.perf_counter()
+            pages = await asyncio.to_thread(extract_text_from_file, file.filename, spooled.path)
+            elapsed = time.perf_counter() - start
         
         # Also test chunking
         from data_processing.chunk import chunk_text
         pages_as_dicts = [{"text": t, "page": p, "source": s} for (t, p, s) in pages]
         chunks = chunk_text(pages_as_dicts)
+        pending_ocr = [p for (t, p, _) in pages if t is None]
         
         return {
             "file_name": file.filename,
             "pages_extracted": len(pages),
+            "extraction_s": round(elapsed, 3),
+            "pages_per_sec": round(len(pages) / elapsed, 1) if elapsed > 0 else None,
+            "workers": PDF_EXTRACT_WORKERS,
             "chunks_generated": len(chunks),
+            "pending_ocr_pages": pending_ocr,
             "pages": pages[:3],  # First 3 pages for preview
             "chunks": chunks[:5]  # First 5 chunks for preview
         }
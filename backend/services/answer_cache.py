@@ -0,0 +1,139 @@
+# answer_cache.py
+"""
+Semantic cache of streamed /ask answers.
+
+Entries are keyed by the question embedding, the preferred file, the
+corpus version and the chat history the answer was generated with. A
+lookup hits when a stored question in the same (preferred_file,
+corpus_version, history) bucket has cosine similarity above the threshold,
+so repeated and near-identical questions against an unchanged corpus
+replay the stored answer instead of re-running retrieval and Gemini. The
+history is part of the key because follow-ups ("what about the second
+one?") mean different things in different conversations.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from core.logger import get_logger
+from core.metrics import register_metrics
+
+logger = get_logger("backend.answer_cache")
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "900"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.97"))
+
+# stream_answer() reports failures in-band; never cache those
+_ERROR_MARKER = "❌ Streaming failed"
+
+_entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+_lock = threading.Lock()
+_next_id = 0
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def history_key(history_context: str) -> str:
+    """Cache key part for the chat history an answer is generated with."""
+    return hashlib.sha256(history_context.encode("utf-8")).hexdigest() if history_context else ""
+
+
+def lookup(query_vec: np.ndarray, preferred_file: Optional[str], corpus_version: int,
+           history: str = "") -> Optional[List[str]]:
+    """
+    Return the stored answer chunks for the closest cached question in the
+    same bucket, or None when nothing is similar enough. history is the
+    history_key of the current conversation.
+    """
+    query = _normalize(query_vec)
+    now = time.monotonic()
+    best_id, best_score = None, ANSWER_CACHE_SIMILARITY
+    with _lock:
+        for entry_id, entry in list(_entries.items()):
+            if now - entry["created_at"] > ANSWER_CACHE_TTL:
+                del _entries[entry_id]
+                continue
+            if (entry["preferred_file"] != preferred_file or entry["corpus_version"] != corpus_version
+                    or entry["history"] != history):
+                continue
+            score = float(np.dot(entry["vector"], query))
+            if score >= best_score:
+                best_id, best_score = entry_id, score
+        if best_id is None:
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(best_id)
+        _stats["hits"] += 1
+        return _entries[best_id]["chunks"]
+
+
+def store(query_vec: np.ndarray, preferred_file: Optional[str], corpus_version: int, chunks: List[str],
+          history: str = "") -> None:
+    """Remember a fully streamed answer."""
+    global _next_id
+    with _lock:
+        _next_id += 1
+        _entries[_next_id] = {
+            "vector": _normalize(query_vec),
+            "preferred_file": preferred_file,
+            "corpus_version": corpus_version,
+            "history": history,
+            "chunks": chunks,
+            "created_at": time.monotonic(),
+        }
+        _stats["stores"] += 1
+        while len(_entries) > ANSWER_CACHE_SIZE:
+            _entries.popitem(last=False)
+            _stats["evictions"] += 1
+
+
+def record_stream(
+    stream: Iterable[str], query_vec: np.ndarray, preferred_file: Optional[str], corpus_version: int,
+    history: str = ""
+) -> Iterator[str]:
+    """
+    Pass a streamed answer through unchanged and store it once it has been
+    delivered completely without errors.
+    """
+    chunks: List[str] = []
+    for chunk in stream:
+        chunks.append(chunk)
+        yield chunk
+    if chunks and not any(_ERROR_MARKER in c for c in chunks):
+        store(query_vec, preferred_file, corpus_version, chunks, history)
+
+
+def replay(chunks: List[str]) -> Iterator[str]:
+    """Stream stored answer chunks straight from memory."""
+    yield from chunks
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+
+
+def stats() -> Dict[str, Any]:
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        "size": len(_entries),
+        "max_size": ANSWER_CACHE_SIZE,
+        "ttl_seconds": ANSWER_CACHE_TTL,
+        "similarity_threshold": ANSWER_CACHE_SIMILARITY,
+        **_stats,
+        "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+    }
+
+
+register_metrics("answer_cache", stats)
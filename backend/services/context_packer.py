@@ -0,0 +1,176 @@
+# context_packer.py
+"""
+Context assembly between retrieval and format_prompt.
+
+Retrieved chunks overlap (chunk_text repeats 20 words between neighbours),
+often come from the same page and sometimes say the same thing twice.
+pack_context() drops near-duplicates with MMR, packs the remaining chunks
+greedily in relevance order up to a token budget, then merges adjacent or
+overlapping chunks from the same page into single blocks.
+"""
+import math
+import os
+import re
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.85"))
+# Rough chars-per-token ratio for English prose; Gemini does not expose a
+# local tokenizer, so budgets are approximate by design
+CHARS_PER_TOKEN = float(os.getenv("CONTEXT_CHARS_PER_TOKEN", "4"))
+
+_WORD = re.compile(r"\w+")
+_MAX_OVERLAP_WORDS = 60
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN)) if text else 0
+
+
+def _shingles(text: str) -> Set[str]:
+    words = _WORD.findall(text.lower())
+    if len(words) < 3:
+        return set(words)
+    return {" ".join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _overlap_words(left: List[str], right: List[str]) -> int:
+    """Length of the longest suffix of left that is a prefix of right."""
+    for size in range(min(len(left), len(right), _MAX_OVERLAP_WORDS), 0, -1):
+        if left[-size:] == right[:size]:
+            return size
+    return 0
+
+
+def _mmr_order(chunks: List[Dict[str, Any]]) -> Tuple[List[int], int]:
+    """
+    Order chunk indices by maximal marginal relevance. Relevance comes from
+    the retrieval rank (the input order); redundancy from word-shingle
+    Jaccard similarity. Near-duplicates above the threshold are dropped.
+    """
+    n = len(chunks)
+    relevance = [1.0 - i / n for i in range(n)]
+    shingles = [_shingles(c.get("text", "")) for c in chunks]
+    remaining = list(range(n))
+    selected: List[int] = []
+    max_sim = [0.0] * n
+    dropped = 0
+    while remaining:
+        best = max(
+            remaining,
+            key=lambda i: CONTEXT_MMR_LAMBDA * relevance[i] - (1 - CONTEXT_MMR_LAMBDA) * max_sim[i],
+        )
+        remaining.remove(best)
+        if max_sim[best] >= CONTEXT_DUPLICATE_THRESHOLD:
+            dropped += 1
+            continue
+        selected.append(best)
+        for i in remaining:
+            max_sim[i] = max(max_sim[i], _jaccard(shingles[i], shingles[best]))
+    return selected, dropped
+
+
+def _merge_blocks(chosen: List[Tuple[int, Dict[str, Any]]]) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Merge chunks from the same file/page that are adjacent (consecutive
+    chunk_index) or whose texts overlap, dropping the repeated words.
+    """
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for rank, chunk in chosen:
+        key = (chunk.get("file_name"), chunk.get("page"))
+        groups.setdefault(key, []).append({"rank": rank, **chunk})
+
+    blocks, merges = [], 0
+    for (file_name, page), members in groups.items():
+        members.sort(key=lambda c: (c.get("chunk_index") is None, c.get("chunk_index") or 0, c["rank"]))
+        current = None
+        for chunk in members:
+            words = chunk.get("text", "").split()
+            if current is not None:
+                overlap = _overlap_words(current["words"], words)
+                adjacent = (
+                    chunk.get("chunk_index") is not None
+                    and current["last_index"] is not None
+                    and chunk["chunk_index"] == current["last_index"] + 1
+                )
+                if overlap or adjacent:
+                    current["words"].extend(words[overlap:])
+                    current["chunk_indices"].append(chunk.get("chunk_index"))
+                    current["last_index"] = chunk.get("chunk_index")
+                    current["rank"] = min(current["rank"], chunk["rank"])
+                    merges += 1
+                    continue
+                blocks.append(current)
+            current = {
+                "file_name": file_name,
+                "page": page,
+                "source": chunk.get("source"),
+                "words": words,
+                "chunk_indices": [chunk.get("chunk_index")],
+                "last_index": chunk.get("chunk_index"),
+                "rank": chunk["rank"],
+            }
+        if current is not None:
+            blocks.append(current)
+
+    blocks.sort(key=lambda b: b["rank"])
+    for block in blocks:
+        block["text"] = " ".join(block.pop("words"))
+        block.pop("last_index")
+    return blocks, merges
+
+
+def pack_context(
+    chunks: List[Dict[str, Any]],
+    token_budget: Optional[int] = None,
+    header_for: Optional[Callable[[Dict[str, Any]], str]] = None,
+) -> Dict[str, Any]:
+    """
+    Assemble prompt context from ranked chunks (best first).
+
+    header_for(block) returns the citation line printed above each block,
+    e.g. "[Source: file.pdf - Page 3]"; it is included in the token count.
+    Returns {"context", "tokens", "blocks", "chunks_in", "chunks_used",
+    "duplicates_dropped", "merged"}.
+    """
+    budget = CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    header_for = header_for or (lambda b: f"[Source: {b['file_name']} - Page {b['page']}]")
+
+    order, dropped = _mmr_order(chunks) if chunks else ([], 0)
+
+    chosen, used = [], 0
+    for rank in order:
+        chunk = chunks[rank]
+        cost = estimate_tokens(chunk.get("text", "")) + estimate_tokens(header_for(chunk)) + 1
+        if used + cost > budget:
+            continue  # a smaller, lower-ranked chunk may still fit
+        chosen.append((rank, chunk))
+        used += cost
+
+    blocks, merged = _merge_blocks(chosen)
+    parts = [f"{header_for(block)}\n{block['text']}" for block in blocks]
+    context = "\n\n".join(parts)
+
+    return {
+        "context": context,
+        "tokens": estimate_tokens(context),
+        "blocks": blocks,
+        "chunks_in": len(chunks),
+        "chunks_used": len(chosen),
+        "duplicates_dropped": dropped,
+        "merged": merged,
+    }
+
+
+__all__ = [
+    'CONTEXT_TOKEN_BUDGET',
+    'estimate_tokens',
+    'pack_context'
+]
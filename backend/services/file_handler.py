@@ -2,109 +2,227 @@ import os
 import fitz  # PyMuPDF
 import docx
 from pptx import Presentation
-from typing import List, Tuple
-from pdf2image import convert_from_bytes
-import pytesseract
+from typing import Iterator, List, Tuple, Union
+from pdf2image import convert_from_bytes, convert_from_path, pdfinfo_from_bytes, pdfinfo_from_path
 from PIL import Image
+from services.ocr_engine import OCR_DEFAULT_DPI, OCR_LANG, OCR_TESSERACT_CONFIG, get_ocr_engine
+from core.extraction_cache import get_extraction_cache
+import itertools
 import logging
 import io
 
 logger = logging.getLogger(__name__)
 
-def extract_text_from_file(filename: str, content: bytes) -> List[Tuple[str, int, str]]:
+# Extractors take either the file bytes or a path to the file. Uploads are
+# spooled to disk (services.upload_spool), and opening from the path lets
+# PyMuPDF, python-docx and python-pptx read what they need from the file
+# instead of holding the whole upload in memory next to their own copy.
+FileContent = Union[bytes, str, os.PathLike]
+
+# Part of the extraction cache key (core.extraction_cache): bump it whenever
+# a change here alters the extracted text, so cached output is not reused
+EXTRACTOR_VERSION = "1"
+
+def _is_bytes(content: FileContent) -> bool:
+    return isinstance(content, (bytes, bytearray, memoryview))
+
+def _as_file(content: FileContent):
+    """Argument for libraries that accept a path or a file-like object."""
+    return io.BytesIO(content) if _is_bytes(content) else os.fspath(content)
+
+def extract_text_from_file(filename: str, content: FileContent, workers: int = None) -> List[Tuple[str, int, str]]:
+    return list(iter_pages_from_file(filename, content, workers=workers))
+
+def extractor_key(filename: str) -> str:
+    """Extraction cache key for everything but the file content: version, type and OCR settings."""
+    ext = os.path.splitext(filename)[1].lower()
+    return f"{EXTRACTOR_VERSION}|{ext}|{OCR_LANG}|{OCR_TESSERACT_CONFIG}"
+
+def iter_pages_from_path(path: Union[str, os.PathLike], filename: str = None, workers: int = None,
+                         defer_ocr: bool = False, content_hash: str = None) -> Iterator[Tuple[str, int, str]]:
+    """
+    iter_pages_from_file for a file on disk; filename defaults to the path's
+    basename. Given the SHA-256 of the file (content_hash), pages are served
+    from the extraction cache when the same bytes were extracted before.
+    """
+    filename = filename or os.path.basename(os.fspath(path))
+    extract = lambda: iter_pages_from_file(filename, path, workers=workers, defer_ocr=defer_ocr)
+    cache = get_extraction_cache() if content_hash else None
+    if cache is None:
+        return extract()
+    return cache.iter_pages(content_hash, extractor_key(filename), filename, extract, allow_pending=defer_ocr)
+
+def iter_pages_from_file(filename: str, content: FileContent, workers: int = None,
+                         defer_ocr: bool = False) -> Iterator[Tuple[str, int, str]]:
+    """
+    Yield (text, page, source) tuples one page at a time, so ingestion can
+    chunk and embed early pages while later ones are still being extracted.
+    content is the file's bytes or a path to it. workers overrides the number
+    of PDF extraction processes (see services.parallel_pdf). With defer_ocr,
+    PDF pages that would need OCR are yielded with text None instead, for
+    iter_ocr_pages to process later; without it, so are pages whose OCR
+    failed. Pages without any text are yielded with empty text.
+    """
     ext = os.path.splitext(filename)[1].lower()
     
     print(f"📄 Processing file: {filename} with extension: {ext}")
     
     if ext == ".txt":
-        return extract_text_from_txt(content, filename)
+        yield from extract_text_from_txt(content, filename)
     elif ext == ".pdf":
-        return extract_text_from_pdf_enhanced(content, filename)
+        yield from iter_pdf_pages(content, filename, workers=workers, defer_ocr=defer_ocr)
     elif ext == ".docx":
-        return extract_text_from_docx(content, filename)
+        yield from extract_text_from_docx(content, filename)
     elif ext == ".pptx":
-        return extract_text_from_pptx(content, filename)
+        yield from extract_text_from_pptx(content, filename)
     else:
         raise ValueError(f"Unsupported file format: {ext}")
 
-def extract_text_from_pdf_enhanced(content: bytes, source: str) -> List[Tuple[str, int, str]]:
+def extract_text_from_pdf_enhanced(content: FileContent, source: str, workers: int = None) -> List[Tuple[str, int, str]]:
     """Enhanced PDF text extraction with multiple fallback methods."""
-    pages = []
+    return list(iter_pdf_pages(content, source, workers=workers))
+
+def _extract_pdf_page(page, i: int, source: str, defer_ocr: bool = False) -> Tuple[str, int, str]:
+    print(f"🔍 Processing page {i+1}...")
     
+    # Method 1: Try standard text extraction
+    text = page.get_text().strip()
+    
+    if text and len(text) > 50:  # Reasonable amount of text
+        print(f"✅ Page {i+1}: Found {len(text)} characters with standard extraction")
+        return (text, i + 1, source)
+    
+    # Method 2: Try "textpage" extraction (different method)
     try:
-        with fitz.open(stream=content, filetype="pdf") as doc:
-            print(f"📊 PDF has {len(doc)} pages")
+        textpage = page.get_textpage()
+        text = textpage.extractText().strip()
+        if text and len(text) > 50:
+            print(f"✅ Page {i+1}: Found {len(text)} characters with textpage extraction")
+            return (text, i + 1, source)
+    except:
+        pass
+    
+    # Method 3: Check if it's an image-based PDF and try OCR
+    image_list = page.get_images()
+    if image_list and defer_ocr:
+        print(f"🖼️ Page {i+1}: Contains {len(image_list)} images, queued for background OCR")
+        return (None, i + 1, source)
+    if image_list:
+        print(f"🖼️ Page {i+1}: Contains {len(image_list)} images, attempting OCR...")
+        try:
+            # Rendered at a DPI chosen for the page; cached by page-image hash
+            ocr_text = get_ocr_engine().ocr_page(page).strip()
+        except Exception as ocr_error:
+            # Text None: the page is recorded as pending OCR, not indexed
+            print(f"❌ Page {i+1}: OCR failed: {ocr_error}")
+            return (None, i + 1, source)
+        print(f"✅ Page {i+1}: Found {len(ocr_text)} characters with OCR")
+        return (_ocr_page_text(ocr_text), i + 1, source)
+    print(f"⚠️ Page {i+1}: No extractable text found")
+    return ("", i + 1, source)
+
+def _ocr_page_text(text: str) -> str:
+    """OCR output worth indexing; next to nothing (stray marks, a page number) becomes empty text."""
+    return text if len(text) > 20 else ""
+
+def _open_pdf(content: FileContent):
+    if _is_bytes(content):
+        return fitz.open(stream=content, filetype="pdf")
+    return fitz.open(os.fspath(content), filetype="pdf")
+
+def _rasterize_pages(content: FileContent) -> Iterator[Image.Image]:
+    """pdf2image fallback, converting one grayscale page at a time."""
+    if _is_bytes(content):
+        page_count = pdfinfo_from_bytes(content)["Pages"]
+        convert = lambda n: convert_from_bytes(content, dpi=OCR_DEFAULT_DPI, grayscale=True, first_page=n, last_page=n)
+    else:
+        path = os.fspath(content)
+        page_count = pdfinfo_from_path(path)["Pages"]
+        convert = lambda n: convert_from_path(path, dpi=OCR_DEFAULT_DPI, grayscale=True, first_page=n, last_page=n)
+    for n in range(1, page_count + 1):
+        yield from convert(n)
+
+def iter_pdf_pages(content: FileContent, source: str, workers: int = None,
+                   defer_ocr: bool = False) -> Iterator[Tuple[str, int, str]]:
+    """
+    Generator form of extract_text_from_pdf_enhanced, one page at a time.
+    Long PDFs on disk are extracted by a process pool, sharded by page range.
+    """
+    from services.parallel_pdf import iter_pdf_pages_parallel, should_parallelize
+
+    yielded = 0
+    
+    try:
+        with _open_pdf(content) as doc:
+            page_count = len(doc)
+            print(f"📊 PDF has {page_count} pages")
+            parallel = not _is_bytes(content) and should_parallelize(page_count, workers)
             
-            for i, page in enumerate(doc):
-                print(f"🔍 Processing page {i+1}...")
-                
-                # Method 1: Try standard text extraction
-                text = page.get_text().strip()
-                
-                if text and len(text) > 50:  # Reasonable amount of text
-                    print(f"✅ Page {i+1}: Found {len(text)} characters with standard extraction")
-                    pages.append((text, i + 1, source))
-                    continue
-                
-                # Method 2: Try "textpage" extraction (different method)
-                try:
-                    textpage = page.get_textpage()
-                    text = textpage.extractText().strip()
-                    if text and len(text) > 50:
-                        print(f"✅ Page {i+1}: Found {len(text)} characters with textpage extraction")
-                        pages.append((text, i + 1, source))
-                        continue
-                except:
-                    pass
-                
-                # Method 3: Check if it's an image-based PDF and try OCR
-                image_list = page.get_images()
-                if image_list:
-                    print(f"🖼️ Page {i+1}: Contains {len(image_list)} images, attempting OCR...")
-                    try:
-                        # Get page as image
-                        pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # Higher resolution for better OCR
-                        img_data = pix.tobytes("png")
-                        img = Image.open(io.BytesIO(img_data))
-                        
-                        # Perform OCR
-                        ocr_text = pytesseract.image_to_string(img).strip()
-                        
-                        if ocr_text and len(ocr_text) > 20:
-                            print(f"✅ Page {i+1}: Found {len(ocr_text)} characters with OCR")
-                            pages.append((ocr_text, i + 1, source))
-                        else:
-                            print(f"⚠️ Page {i+1}: OCR found minimal or no text")
-                            pages.append(("[Image-based page - minimal text extracted]", i + 1, source))
-                    except Exception as ocr_error:
-                        print(f"❌ Page {i+1}: OCR failed: {ocr_error}")
-                        pages.append(("[Image-based page - OCR failed]", i + 1, source))
-                else:
-                    print(f"⚠️ Page {i+1}: No extractable text found")
-                    pages.append(("[No text content]", i + 1, source))
+            if not parallel:
+                for i, page in enumerate(doc):
+                    yield _extract_pdf_page(page, i, source, defer_ocr)
+                    yielded += 1
+        
+        if parallel:
+            # Workers open the file themselves; pages come back in order
+            for page in iter_pdf_pages_parallel(content, source, page_count, workers=workers, defer_ocr=defer_ocr):
+                yield page
+                yielded += 1
             
     except Exception as e:
         print(f"❌ Error processing PDF: {e}")
+        if yielded:
+            # Earlier pages are already downstream; restarting would duplicate them
+            raise ValueError(f"Failed to extract text from PDF after page {yielded}: {e}")
         # Try fallback method: pdf2image + OCR
         try:
             print("🔄 Trying fallback PDF processing with pdf2image...")
-            images = convert_from_bytes(content)
-            for i, image in enumerate(images):
-                text = pytesseract.image_to_string(image).strip()
-                pages.append((text, i + 1, source))
-                print(f"✅ Fallback: Page {i+1} extracted {len(text)} characters")
+            # Pages are rasterized lazily while earlier ones are being OCRed
+            texts = get_ocr_engine().iter_ocr_images(_rasterize_pages(content))
+            first_text = next(texts, None)
         except Exception as fallback_error:
             print(f"❌ Fallback also failed: {fallback_error}")
             raise ValueError(f"Failed to extract text from PDF: {e}")
+        if first_text is None:
+            return
+        for i, text in enumerate(itertools.chain([first_text], texts)):
+            text = text.strip()
+            print(f"✅ Fallback: Page {i+1} extracted {len(text)} characters")
+            yielded += 1
+            yield (text, i + 1, source)
     
-    print(f"✅ PDF extraction complete. Found {len(pages)} pages.")
-    return pages
+    print(f"✅ PDF extraction complete. Found {yielded} pages.")
+
+
+def iter_ocr_pages(path: Union[str, os.PathLike], page_numbers: List[int], source: str,
+                   content_hash: str = None) -> Iterator[Tuple[str, int, str]]:
+    """
+    OCR the given (1-based) pages of a PDF on disk, one at a time. A page
+    whose OCR fails is yielded with text None so it can be retried. Given
+    content_hash, a complete run fills these pages into the extraction
+    cache entry written with defer_ocr.
+    """
+    engine = get_ocr_engine()
+    texts = {}
+    with _open_pdf(path) as doc:
+        for page_number in page_numbers:
+            try:
+                text = engine.ocr_page(doc[page_number - 1]).strip()
+                print(f"✅ Page {page_number}: Found {len(text)} characters with background OCR")
+                # What inline extraction would have produced for this page
+                texts[page_number] = _ocr_page_text(text)
+            except Exception as ocr_error:
+                print(f"❌ Page {page_number}: background OCR failed: {ocr_error}")
+                text = None
+            yield (text, page_number, source)
+    cache = get_extraction_cache() if content_hash else None
+    if cache is not None and len(texts) == len(page_numbers):
+        cache.fill_pages(content_hash, extractor_key(source), texts)
 
 
-def extract_text_from_docx(content: bytes, source: str) -> List[Tuple[str, int, str]]:
-    from io import BytesIO
+def extract_text_from_docx(content: FileContent, source: str) -> List[Tuple[str, int, str]]:
     try:
-        doc = docx.Document(BytesIO(content))
+        doc = docx.Document(_as_file(content))
         full_text = "\n".join([para.text for para in doc.paragraphs])
         print(f"📝 DOCX text length: {len(full_text)} characters")
         return [(full_text, 1, source)]
@@ -112,10 +230,9 @@ def extract_text_from_docx(content: bytes, source: str) -> List[Tuple[str, int,
         print(f"❌ Error extracting text from DOCX: {e}")
         raise
 
-def extract_text_from_pptx(content: bytes, source: str) -> List[Tuple[str, int, str]]:
-    from io import BytesIO
+def extract_text_from_pptx(content: FileContent, source: str) -> List[Tuple[str, int, str]]:
     try:
-        prs = Presentation(BytesIO(content))
+        prs = Presentation(_as_file(content))
         pages = []
         for i, slide in enumerate(prs.slides):
             slide_text = ""
@@ -129,9 +246,13 @@ def extract_text_from_pptx(content: bytes, source: str) -> List[Tuple[str, int,
         print(f"❌ Error extracting text from PPTX: {e}")
         raise
 
-def extract_text_from_txt(content: bytes, source: str) -> List[Tuple[str, int, str]]:
+def extract_text_from_txt(content: FileContent, source: str) -> List[Tuple[str, int, str]]:
     try:
-        text = content.decode("utf-8", errors="ignore")
+        if _is_bytes(content):
+            text = bytes(content).decode("utf-8", errors="ignore")
+        else:
+            with open(content, "r", encoding="utf-8", errors="ignore") as f:
+                text = f.read()
         print(f"📝 TXT text length: {len(text)} characters")
         return [(text, 1, source)]
     except Exception as e:
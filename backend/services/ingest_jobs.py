@@ -0,0 +1,322 @@
+# ingest_jobs.py
+"""
+Background ingestion jobs backed by a persistent SQLite queue.
+
+/upload and /scrape-and-process used to do all the work inside the HTTP
+request, so large documents ran into client and proxy timeouts. Now a
+request only records a job and returns its id; a small pool of worker
+threads runs the jobs and publishes per-stage progress (pages extracted,
+chunks embedded, points upserted) for GET /jobs/{id}.
+
+Jobs survive restarts: anything still queued or running when the process
+stopped is queued again on start(). Because point ids are deterministic,
+re-running a job (retry, or after a crash) only upserts the chunks that
+are still missing.
+
+A job's spooled upload is deleted once the job succeeds. Failed and
+cancelled jobs keep it so they can be retried, until it expires after
+INGEST_SPOOL_RETENTION_H hours (checked on start()).
+"""
+import json
+import os
+import queue
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from core.logger import get_logger
+from core.metrics import register_metrics
+
+logger = get_logger("backend.ingest_jobs")
+
+_data_dir = Path(__file__).resolve().parent.parent / "data"
+INGEST_JOBS_PATH = os.getenv("INGEST_JOBS_PATH", str(_data_dir / "ingest_jobs.db"))
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", str(_data_dir / "ingest_spool"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "2"))
+INGEST_SPOOL_RETENTION_H = float(os.getenv("INGEST_SPOOL_RETENTION_H", "24"))
+# Progress is kept in memory on every update and written to SQLite at most this often
+_PROGRESS_FLUSH_S = 1.0
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+# handler(job, progress, cancel) -> result dict (the build_and_save_index status)
+JobHandler = Callable[[Dict[str, Any], Callable[[Dict[str, Any]], None], threading.Event], Dict[str, Any]]
+
+
+class IngestJobManager:
+    def __init__(self, path: str = INGEST_JOBS_PATH, spool_dir: str = INGEST_SPOOL_DIR,
+                 workers: int = INGEST_WORKERS, max_attempts: int = INGEST_MAX_ATTEMPTS,
+                 spool_retention_h: float = INGEST_SPOOL_RETENTION_H):
+        self.path = path
+        self.spool_dir = spool_dir
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.spool_retention_h = spool_retention_h
+        self._handlers: Dict[str, JobHandler] = {}
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._progress: Dict[str, Dict[str, Any]] = {}
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id     TEXT PRIMARY KEY,
+                kind       TEXT NOT NULL,
+                params     TEXT NOT NULL,
+                status     TEXT NOT NULL,
+                progress   TEXT,
+                result     TEXT,
+                error      TEXT,
+                attempts   INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+        self._conn.commit()
+
+    # ---- persistence -------------------------------------------------
+
+    def _update(self, job_id: str, **fields) -> None:
+        fields["updated_at"] = datetime.now().isoformat()
+        for key in ("params", "progress", "result"):
+            if key in fields and not isinstance(fields[key], str):
+                fields[key] = json.dumps(fields[key])
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", [*fields.values(), job_id])
+            self._conn.commit()
+
+    def _row(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._decode(row) if row else None
+
+    @staticmethod
+    def _decode(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        for key in ("params", "progress", "result"):
+            job[key] = json.loads(job[key]) if job[key] else ({} if key != "result" else None)
+        return job
+
+    # ---- public API ----------------------------------------------------
+
+    def register_handler(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    def spool_path(self, job_id: str, file_name: str) -> str:
+        """Where an uploaded file for job_id is kept until the job finishes."""
+        return os.path.join(self.spool_dir, job_id, os.path.basename(file_name))
+
+    def new_job_id(self) -> str:
+        return uuid.uuid4().hex
+
+    def submit(self, kind: str, params: Dict[str, Any], job_id: Optional[str] = None) -> str:
+        """Persist a job and queue it; returns its id immediately."""
+        job_id = job_id or self.new_job_id()
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, kind, params, status, progress, attempts, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, 0, ?, ?)",
+                (job_id, kind, json.dumps(params), QUEUED, json.dumps({}), now, now),
+            )
+            self._conn.commit()
+        self._queue.put(job_id)
+        logger.info(f"Queued {kind} job {job_id}")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._row(job_id)
+        if job is not None and job_id in self._progress:
+            job["progress"] = dict(self._progress[job_id])
+        return job
+
+    def list_jobs(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self.get(row["job_id"]) or self._decode(row) for row in rows]
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued job, or ask a running one to stop after its current batch."""
+        job = self._row(job_id)
+        if job is None:
+            return None
+        if job["status"] == QUEUED:
+            self._update(job_id, status=CANCELLED)  # the spooled file stays for retry
+        elif job["status"] == RUNNING:
+            event = self._cancel_events.get(job_id)
+            if event is not None:
+                event.set()
+        return self.get(job_id)
+
+    def retry(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Queue a failed or cancelled job again; finished chunks are not
+        re-uploaded. Raises FileNotFoundError when the job's spooled upload
+        has expired.
+        """
+        job = self._row(job_id)
+        if job is None:
+            return None
+        if job["status"] in (FAILED, CANCELLED):
+            path = job["params"].get("path")
+            if path and not os.path.exists(path):
+                raise FileNotFoundError(f"The uploaded file of job '{job_id}' is no longer available; upload it again")
+            self._update(job_id, status=QUEUED, error=None)
+            self._queue.put(job_id)
+        return self.get(job_id)
+
+    def start(self) -> None:
+        """Re-queue unfinished jobs from a previous run and start the workers."""
+        if self._threads:
+            return
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+            self._conn.execute("UPDATE jobs SET status = ? WHERE status = ?", (QUEUED, RUNNING))
+            self._conn.commit()
+        for row in rows:
+            self._queue.put(row["job_id"])
+        if rows:
+            logger.info(f"Re-queued {len(rows)} unfinished ingestion jobs")
+        self._expire_spools()
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"ingest-job-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        for event in list(self._cancel_events.values()):
+            event.set()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {"workers": self.workers, "queued": self._queue.qsize(), **{row["status"]: row["n"] for row in rows}}
+
+    # ---- workers -------------------------------------------------------
+
+    def _work(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            try:
+                self._run(job_id)
+            except Exception:
+                logger.exception(f"Ingestion job {job_id} crashed")
+
+    def _run(self, job_id: str) -> None:
+        job = self._row(job_id)
+        if job is None or job["status"] != QUEUED:
+            return  # cancelled while queued, or a duplicate queue entry
+        handler = self._handlers.get(job["kind"])
+        if handler is None:
+            self._update(job_id, status=FAILED, error=f"No handler for job kind '{job['kind']}'")
+            return
+
+        cancel = threading.Event()
+        self._cancel_events[job_id] = cancel
+        self._progress[job_id] = dict(job["progress"] or {})
+        last_flush = [0.0]
+
+        def progress(update: Dict[str, Any]) -> None:
+            self._progress[job_id].update(update)
+            now = time.monotonic()
+            if now - last_flush[0] >= _PROGRESS_FLUSH_S:
+                last_flush[0] = now
+                self._update(job_id, progress=self._progress[job_id])
+
+        attempts = job["attempts"] + 1
+        self._update(job_id, status=RUNNING, attempts=attempts)
+        logger.info(f"Running {job['kind']} job {job_id} (attempt {attempts})")
+        try:
+            result = handler(job, progress, cancel)
+            error = None
+        except Exception as e:
+            logger.exception(f"Ingestion job {job_id} failed")
+            result, error = {"status": "error", "reason": str(e)}, str(e)
+        finally:
+            self._cancel_events.pop(job_id, None)
+            final_progress = self._progress.pop(job_id, {})
+
+        status = (result or {}).get("status")
+        if cancel.is_set() or status == "cancelled":
+            state = CANCELLED
+        elif status in ("uploaded", "unchanged", "success") and not (result or {}).get("failed_batches"):
+            state = SUCCEEDED
+        else:
+            state = FAILED
+            error = error or (result or {}).get("reason") or (result or {}).get("message") or "Ingestion failed"
+
+        if state == FAILED and attempts < self.max_attempts:
+            logger.warning(f"Job {job_id} failed ({error}); retrying")
+            self._update(job_id, status=QUEUED, progress=final_progress, result=result, error=error)
+            self._queue.put(job_id)
+            return
+        self._update(job_id, status=state, progress=final_progress, result=result, error=error)
+        if state == SUCCEEDED:
+            self._cleanup(job_id)  # failed and cancelled jobs keep their spooled file for retry
+
+    def _cleanup(self, job_id: str) -> None:
+        spool_dir = os.path.join(self.spool_dir, job_id)
+        if os.path.isdir(spool_dir):
+            shutil.rmtree(spool_dir, ignore_errors=True)
+
+    def _expire_spools(self) -> None:
+        """Delete spooled uploads of failed and cancelled jobs past the retention period."""
+        cutoff = datetime.fromtimestamp(time.time() - self.spool_retention_h * 3600).isoformat()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (FAILED, CANCELLED, cutoff)
+            ).fetchall()
+        expired = [row["job_id"] for row in rows if os.path.isdir(os.path.join(self.spool_dir, row["job_id"]))]
+        for job_id in expired:
+            self._cleanup(job_id)
+        if expired:
+            logger.info(f"Deleted {len(expired)} expired spooled uploads")
+
+
+_manager: Optional[IngestJobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> IngestJobManager:
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = IngestJobManager()
+                register_metrics("ingest_jobs", _manager.stats)
+    return _manager
+
+
+__all__ = [
+    'QUEUED',
+    'RUNNING',
+    'SUCCEEDED',
+    'FAILED',
+    'CANCELLED',
+    'IngestJobManager',
+    'get_job_manager'
+]
@@ -0,0 +1,210 @@
+# ocr_engine.py
+"""
+OCR for image-only PDF pages.
+
+The old path rendered every page at a fixed 2x zoom (144 dpi for most PDFs,
+far too much for a full-page poster and too little for a small-print
+scan), and the pdf2image fallback rasterized the whole document into
+memory before OCRing any of it. This module:
+
+- picks the render DPI per page (choose_dpi): the native resolution of the
+  scanned images on the page, clamped to [OCR_MIN_DPI, OCR_MAX_DPI] and
+  capped so a page never exceeds OCR_MAX_PIXELS; pages without embedded
+  images use OCR_DEFAULT_DPI;
+- renders in grayscale, one page at a time, and keeps at most two pages
+  per worker in flight while streaming (iter_ocr_images);
+- runs tesseract on a bounded pool of OCR_WORKERS threads (each call is a
+  tesseract subprocess), shared by every upload in the process;
+- looks every rendered page up in the persistent OCR cache first
+  (core.ocr_cache), keyed by a hash of its pixels, so re-uploaded scans
+  skip OCR entirely.
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from core.logger import get_logger
+from core.metrics import register_metrics
+from core.ocr_cache import OcrCache, get_ocr_cache, image_hash
+
+logger = get_logger("backend.ocr_engine")
+
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(max(1, (os.cpu_count() or 1) // 2))))
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+OCR_TESSERACT_CONFIG = os.getenv("OCR_TESSERACT_CONFIG", "")
+OCR_MIN_DPI = int(os.getenv("OCR_MIN_DPI", "150"))
+OCR_MAX_DPI = int(os.getenv("OCR_MAX_DPI", "300"))
+OCR_DEFAULT_DPI = int(os.getenv("OCR_DEFAULT_DPI", "200"))
+OCR_MAX_PIXELS = int(os.getenv("OCR_MAX_PIXELS", str(25_000_000)))
+
+# Images covering less of the page than this (logos, stamps) do not set the DPI
+_MIN_IMAGE_COVERAGE = 0.2
+
+OcrFn = Callable[[Any], str]
+
+
+def choose_dpi(width_pt: float, height_pt: float, image_dpis: Iterable[float] = ()) -> int:
+    """
+    Render DPI for a page of width_pt x height_pt points (1/72 inch) whose
+    significant embedded images have the given native resolutions.
+    """
+    image_dpis = [dpi for dpi in image_dpis if dpi > 0]
+    dpi = max(image_dpis) if image_dpis else OCR_DEFAULT_DPI
+    dpi = min(max(dpi, OCR_MIN_DPI), OCR_MAX_DPI)
+    area_in2 = (width_pt / 72) * (height_pt / 72)
+    if area_in2 > 0:
+        dpi = min(dpi, math.sqrt(OCR_MAX_PIXELS / area_in2))
+    return max(1, int(dpi))
+
+
+def page_image_dpis(page) -> List[float]:
+    """Native DPI of the images that cover a significant part of a PyMuPDF page."""
+    page_area = abs(page.rect) or 1
+    dpis = []
+    for image in page.get_images(full=True):
+        xref, width_px = image[0], image[2]
+        for rect in page.get_image_rects(xref):
+            if rect.width > 0 and abs(rect) / page_area >= _MIN_IMAGE_COVERAGE:
+                dpis.append(width_px / (rect.width / 72))
+    return dpis
+
+
+def render_page(page, dpi: int) -> Tuple[Any, str]:
+    """Grayscale PIL image of a PyMuPDF page at dpi, plus the hash of its pixels."""
+    import fitz
+    from PIL import Image
+
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    key = image_hash(pix.width, pix.height, "L", pix.samples)
+    return Image.frombytes("L", (pix.width, pix.height), pix.samples), key
+
+
+def pil_image_hash(image) -> str:
+    return image_hash(image.width, image.height, image.mode, image.tobytes())
+
+
+def _tesseract(image, lang: str, config: str) -> str:
+    import pytesseract
+
+    return pytesseract.image_to_string(image, lang=lang, config=config)
+
+
+class OcrEngine:
+    def __init__(self, workers: int = OCR_WORKERS, lang: str = OCR_LANG, config: str = OCR_TESSERACT_CONFIG,
+                 cache: Optional[OcrCache] = None, ocr_fn: Optional[OcrFn] = None):
+        self.workers = max(1, workers)
+        self.lang = lang
+        self.config = config
+        self.cache = cache
+        self._ocr_fn = ocr_fn or (lambda image: _tesseract(image, self.lang, self.config))
+        # Cached text is only valid for the same OCR settings
+        self.engine_key = f"tesseract|{lang}|{config}"
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr")
+        self._lock = threading.Lock()
+        self.pages_ocred = 0
+        self.cache_hits = 0
+        self.ocr_seconds = 0.0
+
+    def _run(self, image, key: str) -> str:
+        start = time.perf_counter()
+        text = self._ocr_fn(image)
+        with self._lock:
+            self.pages_ocred += 1
+            self.ocr_seconds += time.perf_counter() - start
+        if self.cache is not None:
+            self.cache.put(self.engine_key, key, text)
+        return text
+
+    def submit_image(self, image, key: Optional[str] = None) -> Future:
+        """OCR a PIL image on the pool; a cached result returns a completed future."""
+        key = key or pil_image_hash(image)
+        if self.cache is not None:
+            cached = self.cache.get(self.engine_key, key)
+            if cached is not None:
+                with self._lock:
+                    self.cache_hits += 1
+                future: Future = Future()
+                future.set_result(cached)
+                return future
+        return self._pool.submit(self._run, image, key)
+
+    def ocr_image(self, image, key: Optional[str] = None) -> str:
+        return self.submit_image(image, key).result()
+
+    def ocr_page(self, page) -> str:
+        """OCR a PyMuPDF page, rendered at a DPI chosen for its content."""
+        dpi = choose_dpi(page.rect.width, page.rect.height, page_image_dpis(page))
+        image, key = render_page(page, dpi)
+        logger.debug(f"OCR page {page.number + 1} at {dpi} dpi ({image.width}x{image.height})")
+        return self.ocr_image(image, key)
+
+    def iter_ocr_images(self, images: Iterable[Any]) -> Iterator[str]:
+        """
+        OCR a stream of page images, yielding texts in order. Images are
+        pulled lazily: at most two per worker are rendered ahead.
+        """
+        pending = deque()
+        images = iter(images)
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < 2 * self.workers:
+                    image = next(images, None)
+                    if image is None:
+                        exhausted = True
+                    else:
+                        pending.append(self.submit_image(image))
+                if not pending:
+                    return
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "lang": self.lang,
+            "pages_ocred": self.pages_ocred,
+            "cache_hits": self.cache_hits,
+            "avg_page_s": round(self.ocr_seconds / self.pages_ocred, 3) if self.pages_ocred else None,
+        }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_engine: Optional[OcrEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_ocr_engine() -> OcrEngine:
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = OcrEngine(workers=OCR_WORKERS, cache=get_ocr_cache())
+                register_metrics("ocr_engine", _engine.stats)
+    return _engine
+
+
+def shutdown_engine() -> None:
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.shutdown()
+            _engine = None
+
+
+__all__ = [
+    'choose_dpi',
+    'page_image_dpis',
+    'render_page',
+    'OcrEngine',
+    'get_ocr_engine',
+    'shutdown_engine'
+]
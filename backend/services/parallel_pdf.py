@@ -0,0 +1,134 @@
+# parallel_pdf.py
+"""
+PDF text extraction sharded by page range across a process pool.
+
+Pages are independent: get_text, the textpage fallback and OCR for one page
+never look at another. A long PDF (a 300-page scanned filing is mostly
+OCR) is therefore split into ranges of PDF_SHARD_PAGES pages; each worker
+process opens the document from its path itself, so neither the file nor
+rendered pages travel between processes, only the extracted text does.
+Results are yielded in page order. At most two shards per worker are in
+flight, which keeps memory bounded and lets ingestion start embedding the
+first pages while later ones are still being extracted.
+
+Only files on disk are sharded (uploads are spooled, see
+services.upload_spool); bytes and short documents stay in-process.
+"""
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from core.logger import get_logger
+
+logger = get_logger("backend.parallel_pdf")
+
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(max(1, (os.cpu_count() or 1) // 2))))
+PDF_SHARD_PAGES = int(os.getenv("PDF_SHARD_PAGES", "8"))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
+
+Page = Tuple[str, int, str]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def page_ranges(page_count: int, shard_pages: int = PDF_SHARD_PAGES) -> List[Tuple[int, int]]:
+    """[start, end) page index ranges of at most shard_pages pages."""
+    shard_pages = max(1, shard_pages)
+    return [(start, min(start + shard_pages, page_count)) for start in range(0, page_count, shard_pages)]
+
+
+def should_parallelize(page_count: int, workers: Optional[int] = None) -> bool:
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
+    return workers > 1 and page_count >= PDF_PARALLEL_MIN_PAGES
+
+
+def _init_worker() -> None:
+    from services import ocr_engine
+
+    # One tesseract per process; its own OpenMP threads would oversubscribe the cores
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    ocr_engine.OCR_WORKERS = 1
+
+
+def _extract_range(path: str, start: int, end: int, source: str, defer_ocr: bool = False) -> List[Page]:
+    import fitz
+    from services.file_handler import _extract_pdf_page
+
+    with fitz.open(path, filetype="pdf") as doc:
+        return [_extract_pdf_page(doc[i], i, source, defer_ocr) for i in range(start, end)]
+
+
+def _new_pool(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        # spawn: the parent may already run torch / tesseract threads
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+    )
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            logger.info(f"Starting {PDF_EXTRACT_WORKERS} PDF extraction worker processes")
+            _pool = _new_pool(PDF_EXTRACT_WORKERS)
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _iter_shards(pool: ProcessPoolExecutor, workers: int, path: str, source: str,
+                 ranges: List[Tuple[int, int]], defer_ocr: bool) -> Iterator[Page]:
+    pending = deque()
+    next_range = 0
+    window = 2 * workers
+    try:
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < window:
+                start, end = ranges[next_range]
+                pending.append(pool.submit(_extract_range, path, start, end, source, defer_ocr))
+                next_range += 1
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def iter_pdf_pages_parallel(path: str, source: str, page_count: int, workers: Optional[int] = None,
+                            shard_pages: int = PDF_SHARD_PAGES, defer_ocr: bool = False) -> Iterator[Page]:
+    """
+    Yield (text, page, source) for every page of the PDF at path, in order,
+    extracting page ranges in parallel. workers defaults to
+    PDF_EXTRACT_WORKERS and the shared pool; another count gets a pool of
+    its own for this call. Only the extraction benchmark passes one; request
+    handlers must not forward a client-chosen count here.
+    """
+    path = os.fspath(path)
+    ranges = page_ranges(page_count, shard_pages)
+    if workers is None or workers == PDF_EXTRACT_WORKERS:
+        logger.info(f"Extracting {page_count} pages in {len(ranges)} shards on {PDF_EXTRACT_WORKERS} processes")
+        yield from _iter_shards(_get_pool(), PDF_EXTRACT_WORKERS, path, source, ranges, defer_ocr)
+        return
+    logger.info(f"Extracting {page_count} pages in {len(ranges)} shards on {workers} processes")
+    with _new_pool(workers) as pool:
+        yield from _iter_shards(pool, workers, path, source, ranges, defer_ocr)
+
+
+__all__ = [
+    'PDF_EXTRACT_WORKERS',
+    'page_ranges',
+    'should_parallelize',
+    'iter_pdf_pages_parallel',
+    'shutdown_pool'
+]
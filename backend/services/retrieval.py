@@ -267,52 +267,107 @@
 
 
 from typing import List, Dict, Any, Tuple
-from qdrant_client import QdrantClient
-from qdrant_client.models import Filter, FieldCondition, MatchValue
-from sentence_transformers import SentenceTransformer
-import os
 from core.models import ChunkMetadata
-from qdrant_client.models import Filter, FilterSelector
+from core.embedder import embed_query, embed_query_async
+from core import file_catalog
+from core.qdrant_manager import COLLECTION_NAME
+from core.vector_store import get_vector_store, SearchQuery, SearchHit
+from core.bm25_index import get_bm25_index
+from core.app_state import bump_corpus_version
+import asyncio
 import logging
-from pathlib import Path
-from dotenv import load_dotenv
+import os
 
 logger = logging.getLogger(__name__)
 
-# Ensure .env in backend/ is loaded for Qdrant creds in all execution contexts
-_backend_env = Path(__file__).resolve().parent.parent / ".env"
-load_dotenv(dotenv_path=_backend_env, override=False)
+# Ranking bonus for chunks from the preferred (most recent) file when the
+# preferred-file and whole-collection candidate sets are fused
+PREFERRED_FILE_BOOST = float(os.getenv("PREFERRED_FILE_BOOST", "0.05"))
+# Hybrid retrieval: BM25 results are fused with dense results by
+# reciprocal-rank fusion, score = sum(1 / (RRF_K + rank))
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1").lower() not in ("0", "false", "no", "off")
+RRF_K = int(os.getenv("RRF_K", "60"))
 
-COLLECTION_NAME = "legal_chunks"
-EMBEDDER_MODEL = "all-MiniLM-L6-v2"
+def collection_exists() -> bool:
+    """Check if the collection exists (cached by the store backend)."""
+    return get_vector_store().collection_exists()
 
-def collection_exists(client: QdrantClient) -> bool:
-    """Check if the collection exists."""
-    try:
-        print(f"🔍 Checking if collection '{COLLECTION_NAME}' exists...")
-        collections = client.get_collections()
-        collection_names = [col.name for col in collections.collections]
-        exists = COLLECTION_NAME in collection_names
-        print(f"📊 Collection existence: {exists}")
-        return exists
-    except Exception as e:
-        print(f"❌ Error checking collection existence: {e}")
-        return False
+def _collect_chunks(results: List[SearchHit], lexical_scores: Dict[Any, float] = None) -> Tuple[List[Dict[str, Any]], List[float]]:
+    """
+    Validate search hits above the relevance cutoff into chunk dicts.
+    Hits found only by BM25 carry no cosine score; they skip the cutoff and
+    contribute their RRF-normalised score (lexical_scores) instead, so a
+    query that only matches lexically still counts as relevant.
+    """
+    lexical_scores = lexical_scores or {}
+    chunks, scores = [], []
+    for r in results:
+        try:
+            lexical = r.id in lexical_scores
+            if lexical or r.score > 0.15:  # Only include decent matches
+                validated = ChunkMetadata(**(r.payload or {}))
+                chunks.append(validated.dict())
+                scores.append(lexical_scores[r.id] if lexical else r.score)
+        except Exception as e:
+            print(f"⚠️ Skipping invalid payload: {e}")
+    return chunks, scores
+
+def _search_queries(query_vec: List[float], top_k: int, preferred_file: str = None) -> List[SearchQuery]:
+    """
+    One query for the whole collection plus, when a preferred file is set,
+    one restricted to that file; both go to the store in a single batch call.
+    """
+    queries = [SearchQuery(query_vec, top_k, score_threshold=0.1)]
+    if preferred_file:
+        queries.append(SearchQuery(query_vec, top_k, file_name=preferred_file, score_threshold=0.1))
+    return queries
 
-def get_qdrant_client() -> QdrantClient:
-    """Get a Qdrant client instance."""
+def _fuse_results(batch_results: List[List[SearchHit]], top_k: int, preferred_file: str = None) -> List[SearchHit]:
+    """
+    Merge the global and preferred-file candidate sets. Hits from the
+    preferred file are ranked as if their score were PREFERRED_FILE_BOOST
+    higher; returned hits keep their raw similarity score.
+    """
+    best: Dict[Any, Tuple[float, SearchHit]] = {}
+    for results in batch_results:
+        for r in results:
+            rank_score = r.score
+            if preferred_file and (r.payload or {}).get("file_name") == preferred_file:
+                rank_score += PREFERRED_FILE_BOOST
+            if r.id not in best or rank_score > best[r.id][0]:
+                best[r.id] = (rank_score, r)
+    ranked = sorted(best.values(), key=lambda item: item[0], reverse=True)
+    return [r for _, r in ranked[:top_k]]
+
+def _rrf_fuse(dense: List[SearchHit], lexical: List[SearchHit], top_k: int) -> Tuple[List[SearchHit], Dict[Any, float]]:
+    """
+    Reciprocal-rank fusion of the dense and BM25 rankings. Dense hit objects
+    are kept where a chunk appears in both so callers still see its cosine
+    score; returns (hits, {id: score} for ids found only lexically). That
+    score is the fused score relative to the best possible one (rank 1 in
+    both rankings), so the top BM25-only hit scores 0.5.
+    """
+    if not lexical:
+        return dense[:top_k], {}
+    fused: Dict[Any, float] = {}
+    hits: Dict[Any, SearchHit] = {}
+    for ranking in (dense, lexical):
+        for rank, hit in enumerate(ranking, start=1):
+            fused[hit.id] = fused.get(hit.id, 0.0) + 1.0 / (RRF_K + rank)
+            hits.setdefault(hit.id, hit)
+    order = sorted(fused, key=fused.get, reverse=True)[:top_k]
+    dense_ids = {hit.id for hit in dense}
+    best_possible = 2.0 / (RRF_K + 1)
+    return [hits[i] for i in order], {i: fused[i] / best_possible for i in order if i not in dense_ids}
+
+def _lexical_search(query: str, top_k: int) -> List[SearchHit]:
+    if not HYBRID_SEARCH:
+        return []
     try:
-        client = QdrantClient(
-            url=os.getenv("QDRANT_URL"),
-            api_key=os.getenv("QDRANT_API_KEY")
-        )
-        # Test connection
-        client.get_collections()
-        print("✅ Qdrant client connected successfully")
-        return client
+        return get_bm25_index().search(query, limit=top_k)
     except Exception as e:
-        print(f"❌ Failed to connect to Qdrant: {e}")
-        raise
+        logger.error(f"BM25 search error: {e}")
+        return []
 
 def search_similar_chunks(
     query: str,
@@ -323,131 +378,156 @@ def search_similar_chunks(
     Vector search across ALL documents with preference for specific files.
     Returns (matched_chunks, best_score)
     """
-    client = get_qdrant_client()
+    store = get_vector_store()
     
     # Check if collection exists
-    if not collection_exists(client):
+    if not store.collection_exists():
         return [], 0.0
         
-    model = SentenceTransformer(EMBEDDER_MODEL)
-    query_vec = model.encode([query]).tolist()[0]
+    query_vec = embed_query(query).tolist()
 
     try:
-        # First, try to search only in the preferred file
         if preferred_file:
-            print(f"🔍 Searching in preferred file: {preferred_file}")
-            preferred_results = client.search(
-                collection_name=COLLECTION_NAME,
-                query_vector=query_vec,
-                query_filter=Filter(
-                    must=[FieldCondition(key="file_name", match=MatchValue(value=preferred_file))]
-                ),
-                limit=top_k,
-                with_payload=True,
-                score_threshold=0.1  # Minimum similarity score
-            )
-            
-            # If we found good results in the preferred file, return them
-            if preferred_results and any(r.score > 0.15 for r in preferred_results):
-                chunks, scores = [], []
-                for r in preferred_results:
-                    try:
-                        if r.score > 0.15:  # Only include decent matches
-                            validated = ChunkMetadata(**(r.payload or {}))
-                            chunks.append(validated.dict())
-                            scores.append(r.score)
-                    except Exception as e:
-                        print(f"⚠️ Skipping invalid payload: {e}")
-                
-                if chunks:  # Only return if we found valid chunks
-                    print(f"✅ Found {len(chunks)} matches in preferred file with scores {[round(s, 3) for s in scores]}")
-                    return chunks, (max(scores) if scores else 0.0)
-        
-        # If no preferred file or no good results in preferred file, search all files
-        print("🔍 Searching across all files...")
-        results = client.search(
-            collection_name=COLLECTION_NAME,
-            query_vector=query_vec,
-            limit=top_k,
-            with_payload=True,
-            score_threshold=0.1  # Minimum similarity score
-        )
+            print(f"🔍 Searching all files with preference for: {preferred_file}")
+        batch_results = store.search_batch(_search_queries(query_vec, top_k, preferred_file))
     except Exception as e:
-        print(f"❌ Qdrant search error: {e}")
+        print(f"❌ Vector search error: {e}")
         return [], 0.0
 
-    chunks, scores = [], []
-    for r in results:
-        try:
-            if r.score > 0.15:  # Only include decent matches
-                validated = ChunkMetadata(**(r.payload or {}))
-                chunks.append(validated.dict())
-                scores.append(r.score)
-        except Exception as e:
-            print(f"⚠️ Skipping invalid payload: {e}")
-
+    dense = _fuse_results(batch_results, top_k, preferred_file)
+    hits, lexical_scores = _rrf_fuse(dense, _lexical_search(query, top_k), top_k)
+    chunks, scores = _collect_chunks(hits, lexical_scores)
     if chunks:
-        print(f"✅ Found {len(chunks)} matches across all files with scores {[round(s, 3) for s in scores]}")
+        print(f"✅ Found {len(chunks)} matches with scores {[round(s, 3) for s in scores]}")
     else:
         print("❌ No relevant matches found")
 
     return chunks, (max(scores) if scores else 0.0)
 
 
-# LIST FILES FOR FRONTEND DROPDOWN
-def list_files(limit: int = 5000) -> List[Dict[str, str]]:
+async def async_search_similar_chunks(
+    query: str,
+    top_k: int = 10,
+    preferred_file: str = None
+) -> Tuple[List[Dict[str, Any]], float]:
     """
-    Return unique {file_id, file_name} pairs present in Qdrant.
+    Non-blocking variant of search_similar_chunks for async endpoints.
+    Embedding runs in the bounded encoder pool and the search uses the
+    store's async path, so the event loop is never blocked.
     """
-    client = get_qdrant_client()
+    store = get_vector_store()
+    if not await store.acollection_exists():
+        return [], 0.0
 
-    # Check if collection exists
-    if not collection_exists(client):
-        return []
+    query_vec = (await embed_query_async(query)).tolist()
 
-    points, _ = client.scroll(
-        collection_name=COLLECTION_NAME,
-        with_payload=True,
-        limit=limit
-    )
-    seen = {}
-    for p in points:
-        try:
-            validated = ChunkMetadata(**(p.payload or {}))
-            if validated.file_id not in seen:
-                seen[validated.file_id] = validated.file_name
-        except Exception as e:
-            print(f"⚠️ Skipping invalid payload: {e}")
+    try:
+        batch_results, lexical = await asyncio.gather(
+            store.asearch_batch(_search_queries(query_vec, top_k, preferred_file)),
+            asyncio.to_thread(_lexical_search, query, top_k)
+        )
+    except Exception as e:
+        logger.error(f"Vector search error: {e}")
+        return [], 0.0
+
+    dense = _fuse_results(batch_results, top_k, preferred_file)
+    hits, lexical_scores = _rrf_fuse(dense, lexical, top_k)
+    chunks, scores = _collect_chunks(hits, lexical_scores)
+    return chunks, (max(scores) if scores else 0.0)
 
-    files = [{"file_id": fid, "file_name": name} for fid, name in seen.items()]
-    print(f"📂 Found {len(files)} files in database: {[f['file_name'] for f in files]}")
+
+# LIST FILES FOR FRONTEND DROPDOWN
+def list_files() -> List[Dict[str, Any]]:
+    """
+    Return the files recorded in the local file catalog
+    ({file_id, file_name, source_type, page_count, chunk_count, ...}).
+    """
+    files = file_catalog.list_catalog_files()
+    print(f"📂 Found {len(files)} files in catalog: {[f['file_name'] for f in files]}")
     return files
 
 
+def sync_catalog_from_collection(batch_size: int = 1000) -> int:
+    """
+    Rebuild the file catalog by paging through the whole collection.
+    Only needed once for collections that predate the catalog.
+    Returns the number of files recorded.
+    """
+    store = get_vector_store()
+    if not store.collection_exists():
+        return 0
+
+    files: Dict[str, Dict[str, Any]] = {}
+    offset = None
+    while True:
+        points, offset = store.scroll(
+            with_payload=["file_id", "file_name", "page"],
+            limit=batch_size,
+            offset=offset
+        )
+        for p in points:
+            payload = p.payload or {}
+            file_name = payload.get("file_name")
+            if not file_name:
+                continue
+            info = files.setdefault(file_name, {"file_id": payload.get("file_id") or "", "pages": set(), "chunks": 0})
+            info["pages"].add(payload.get("page", 0))
+            info["chunks"] += 1
+        if offset is None:
+            break
+
+    for file_name, info in files.items():
+        file_catalog.upsert_file(
+            file_name=file_name,
+            file_id=info["file_id"],
+            page_count=len(info["pages"]),
+            chunk_count=info["chunks"]
+        )
+    print(f"📂 Catalog rebuilt from collection: {len(files)} files")
+    return len(files)
+
+
+def rebuild_bm25_from_store(batch_size: int = 1000) -> int:
+    """
+    Rebuild the BM25 index from the stored chunk payloads. Only needed once
+    for collections that predate hybrid search. Returns the chunk count.
+    """
+    store = get_vector_store()
+    if not store.collection_exists():
+        return 0
+
+    index = get_bm25_index()
+    index.clear()
+    total, offset = 0, None
+    while True:
+        points, offset = store.scroll(limit=batch_size, offset=offset)
+        index.add([p.id for p in points], [p.payload for p in points])
+        total += len(points)
+        if offset is None:
+            break
+    print(f"🔤 BM25 index rebuilt from collection: {total} chunks")
+    return total
+
+
 # DELETE BY FILE NAME
 def delete_file_chunks(file_name: str) -> None:
     """
     Delete all chunks belonging to a given file_name.
     """
-    client = get_qdrant_client()
+    store = get_vector_store()
     
     # Check if collection exists
-    if not collection_exists(client):
+    if not store.collection_exists():
         print(f"ℹ️ Collection doesn't exist, nothing to delete for {file_name}")
         return
         
     try:
         print(f"🗑️ Deleting chunks for file: {file_name}")
-        result = client.delete(
-            collection_name=COLLECTION_NAME,
-            points_selector=FilterSelector(
-                filter=Filter(
-                    must=[FieldCondition(key="file_name", match=MatchValue(value=file_name))]
-                )
-            ),
-            wait=True
-        )
-        print(f"✅ Deleted {result.operation_id} chunks for {file_name}")
+        store.delete_by_file(file_name)
+        get_bm25_index().remove_file(file_name)
+        print(f"✅ Deleted chunks for {file_name}")
+        file_catalog.remove_file(file_name)
+        bump_corpus_version()
     except Exception as e:
         print(f"❌ Error deleting file chunks: {e}")
         # It's okay if the file doesn't exist
@@ -459,23 +539,20 @@ def clear_entire_collection() -> None:
     """
     Delete all chunks from the entire collection.
     """
-    client = get_qdrant_client()
+    store = get_vector_store()
     
     # Check if collection exists
-    if not collection_exists(client):
+    if not store.collection_exists():
         print("ℹ️ Collection doesn't exist, nothing to clear")
         return
         
     try:
         print("🗑️ Clearing entire collection...")
-        result = client.delete(
-            collection_name=COLLECTION_NAME,
-            points_selector=FilterSelector(
-                filter=Filter(must=[])  # Empty filter selects all points
-            ),
-            wait=True
-        )
-        print(f"✅ Entire collection cleared successfully. Operation ID: {result.operation_id}")
+        store.clear()
+        get_bm25_index().clear()
+        file_catalog.clear_catalog()
+        bump_corpus_version()
+        print("✅ Entire collection cleared successfully.")
     except Exception as e:
         print(f"❌ Error clearing collection: {e}")
         raise
@@ -485,25 +562,13 @@ def get_chunks_for_file(file_name: str = None, limit: int = 10) -> List[Dict[str
     """
     Get chunks for a specific file or all files.
     """
-    client = get_qdrant_client()
+    store = get_vector_store()
 
     # Check if collection exists
-    if not collection_exists(client):
+    if not store.collection_exists():
         return []
 
-    # Build filter if file_name is specified
-    query_filter = None
-    if file_name:
-        query_filter = Filter(
-            must=[FieldCondition(key="file_name", match=MatchValue(value=file_name))]
-        )
-
-    points, _ = client.scroll(
-        collection_name=COLLECTION_NAME,
-        with_payload=True,
-        limit=limit,
-        scroll_filter=query_filter
-    )
+    points, _ = store.scroll(file_name=file_name, limit=limit)
     
     chunks = []
     for p in points:
@@ -524,101 +589,62 @@ def get_chunks_for_file(file_name: str = None, limit: int = 10) -> List[Dict[str
     return chunks
 
 
-def get_detailed_file_info(limit: int = 1000) -> Dict[str, Any]:
+def get_detailed_file_info() -> Dict[str, Any]:
     """
     Return detailed information about files in the database.
     """
-    client = get_qdrant_client()
+    store = get_vector_store()
 
     # Check if collection exists
-    if not collection_exists(client):
+    if not store.collection_exists():
         return {"status": "empty", "message": "Collection does not exist"}
 
-    points, _ = client.scroll(
-        collection_name=COLLECTION_NAME,
-        with_payload=True,
-        limit=limit
-    )
-    
     file_info = {}
-    for p in points:
-        try:
-            payload = p.payload or {}
-            file_name = payload.get("file_name", "unknown")
-            
-            if file_name not in file_info:
-                file_info[file_name] = {
-                    "chunk_count": 0,
-                    "pages": set(),
-                    "file_id": payload.get("file_id"),
-                    "sample_text": payload.get("text", "")[:100] + "..." if payload.get("text") else ""
-                }
-            
-            file_info[file_name]["chunk_count"] += 1
-            file_info[file_name]["pages"].add(payload.get("page", 0))
-            
-        except Exception as e:
-            print(f"⚠️ Skipping invalid payload: {e}")
-
-    # Convert sets to lists for JSON serialization
-    for file_name, info in file_info.items():
-        info["pages"] = list(info["pages"])
-        info["page_count"] = len(info["pages"])
+    for entry in file_catalog.list_catalog_files():
+        file_name = entry.pop("file_name")
+        file_info[file_name] = entry
 
     return {
-        "total_points": len(points),
+        "total_points": store.count(),
         "files": file_info
     }
 
 
 def get_collection_stats() -> Dict[str, Any]:
     """
-    Get statistics about the Qdrant collection.
+    Get statistics about the vector store collection.
     """
-    client = get_qdrant_client()
+    store = get_vector_store()
     
     # Check if collection exists
-    if not collection_exists(client):
+    if not store.collection_exists():
         return {"status": "empty", "message": "Collection does not exist"}
     
     try:
-        # Get collection info
-        collection_info = client.get_collection(COLLECTION_NAME)
-        
-        # Get count of points
-        count_result = client.count(COLLECTION_NAME)
-        
-        return {
-            "status": "exists",
-            "collection_name": COLLECTION_NAME,
-            "vectors_count": count_result.count,
-            "vectors_config": str(collection_info.config.params.vectors),
-            "indexed_vectors_count": collection_info.vectors_count,
-            "points_count": collection_info.points_count
-        }
+        return {"status": "exists", **store.stats()}
     except Exception as e:
         return {"status": "error", "message": f"Failed to get collection stats: {e}"}
 
 
 def health_check() -> Dict[str, Any]:
     """
-    Perform a health check of the Qdrant connection and collection.
+    Perform a health check of the vector store connection and collection.
     """
+    store = get_vector_store()
     try:
-        client = get_qdrant_client()
-        collections = client.get_collections()
-        collection_exists = COLLECTION_NAME in [col.name for col in collections.collections]
+        status = store.ping()
         
         return {
             "status": "healthy",
-            "qdrant_connection": True,
-            "collection_exists": collection_exists,
-            "collection_name": COLLECTION_NAME
+            "store_connection": True,
+            "collection_name": COLLECTION_NAME,
+            **status
         }
     except Exception as e:
         return {
             "status": "unhealthy",
-            "qdrant_connection": False,
+            "backend": store.name,
+            "store_connection": False,
             "error": str(e)
         }
 
@@ -626,7 +652,10 @@ def health_check() -> Dict[str, Any]:
 # Add to __all__ for import
 __all__ = [
     'search_similar_chunks',
+    'async_search_similar_chunks',
     'list_files',
+    'sync_catalog_from_collection',
+    'rebuild_bm25_from_store',
     'delete_file_chunks',
     'clear_entire_collection',
     'get_chunks_for_file',
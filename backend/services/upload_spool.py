@@ -0,0 +1,82 @@
+# upload_spool.py
+"""
+Stream uploaded files to disk instead of reading them into memory.
+
+`await file.read()` on a 200 MB upload held the whole file in memory, and
+the extractors then made further copies of it (PyMuPDF stream buffers,
+pdf2image, BytesIO for docx/pptx). Uploads are now copied to a file in
+fixed-size chunks while their SHA-256 is computed on the way, and
+extraction opens that path (see services.file_handler), so peak memory per
+upload is a few chunks rather than a few copies of the document.
+"""
+import asyncio
+import contextlib
+import hashlib
+import os
+import tempfile
+from typing import AsyncIterator, NamedTuple, Optional
+
+from fastapi import UploadFile
+
+from core.logger import get_logger
+
+logger = get_logger("backend.upload_spool")
+
+UPLOAD_SPOOL_CHUNK_BYTES = int(os.getenv("UPLOAD_SPOOL_CHUNK_BYTES", str(1024 * 1024)))
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR") or None  # None: the system temp dir
+
+
+class SpooledUpload(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+
+async def spool_upload(upload: UploadFile, path: Optional[str] = None,
+                       chunk_size: int = UPLOAD_SPOOL_CHUNK_BYTES) -> SpooledUpload:
+    """
+    Copy an upload to path (a new temp file if not given) chunk by chunk,
+    hashing as it goes. The caller owns the file afterwards.
+    """
+    if path is None:
+        suffix = os.path.splitext(upload.filename or "")[1]
+        fd, path = tempfile.mkstemp(prefix="upload_", suffix=suffix, dir=UPLOAD_TMP_DIR)
+        os.close(fd)
+    else:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, "wb") as f:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+                await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(path)
+        raise
+    logger.debug(f"Spooled {upload.filename} ({size} bytes) to {path}")
+    return SpooledUpload(path=path, size=size, sha256=digest.hexdigest())
+
+
+@contextlib.asynccontextmanager
+async def spooled_upload(upload: UploadFile) -> AsyncIterator[SpooledUpload]:
+    """spool_upload into a temp file that is removed when the block exits."""
+    spooled = await spool_upload(upload)
+    try:
+        yield spooled
+    finally:
+        with contextlib.suppress(OSError):
+            os.remove(spooled.path)
+
+
+__all__ = [
+    'SpooledUpload',
+    'spool_upload',
+    'spooled_upload'
+]
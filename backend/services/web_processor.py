@@ -8,9 +8,11 @@ from core.logger import get_logger
 
 logger = get_logger("backend.web_processor")
 
-async def process_web_content(url: str) -> Dict[str, Any]:
+async def process_web_content(url: str, progress=None, cancel=None) -> Dict[str, Any]:
     """
     Process web content: scrape → chunk → embed → store in Qdrant.
+    progress/cancel are passed through to build_and_save_index when this runs
+    as a background ingestion job.
     """
     try:
         # Step 1: Scrape the web content
@@ -71,9 +73,9 @@ async def process_web_content(url: str) -> Dict[str, Any]:
             }
         
         # Step 6: Build and save index
-        result = build_and_save_index(pages)
+        result = build_and_save_index(pages, progress=progress, cancel=cancel)
         
-        if result["status"] == "uploaded":
+        if result["status"] in ("uploaded", "unchanged"):
             return {
                 "status": "success",
                 "message": "Web content successfully processed and stored",
@@ -83,6 +85,8 @@ async def process_web_content(url: str) -> Dict[str, Any]:
                 "chunks_generated": len(chunks),
                 "source_name": source_name
             }
+        elif result["status"] == "cancelled":
+            return {"status": "cancelled", "message": "Web content processing was cancelled", "url": url}
         else:
             return {
                 "status": "error",
@@ -0,0 +1,89 @@
+# test_adaptive_uploader.py
+import threading
+import time
+
+import numpy as np
+
+from data_processing.adaptive_uploader import AdaptiveUploader
+
+
+class FakeStore:
+    def __init__(self, delay=0.0, fail_times=0, drop_unwaited=()):
+        self.delay = delay
+        self.fail_times = fail_times
+        self.drop_unwaited = set(drop_unwaited)
+        self.stored = {}
+        self.batch_sizes = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def upsert(self, ids, vectors, payloads, wait=True):
+        with self._lock:
+            if self.fail_times:
+                self.fail_times -= 1
+                raise ConnectionError("socket closed")
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.batch_sizes.append(len(ids))
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+            for point_id, payload in zip(ids, payloads):
+                if wait or point_id not in self.drop_unwaited:
+                    self.stored[point_id] = payload
+
+    def missing_ids(self, ids):
+        return [point_id for point_id in ids if point_id not in self.stored]
+
+
+def points(n, text="clause"):
+    return list(range(n)), np.ones((n, 4), dtype=np.float32), [{"text": f"{text} {i}"} for i in range(n)]
+
+
+def test_batches_run_concurrently_and_grow_when_fast():
+    store = FakeStore(delay=0.01)
+    uploaded = []
+    uploader = AdaptiveUploader(store, concurrency=4, initial_batch=8, min_batch=4, max_batch=64,
+                                target_latency_ms=1000, on_success=lambda ids, _: uploaded.extend(ids))
+    uploader.submit(*points(500))
+    stats = uploader.close()
+
+    assert sorted(uploaded) == list(range(500))
+    assert len(store.stored) == 500
+    assert store.max_in_flight > 1
+    assert max(store.batch_sizes) > 8
+    assert stats["points_per_sec"] > 0
+
+
+def test_batches_are_capped_by_payload_bytes():
+    store = FakeStore()
+    uploader = AdaptiveUploader(store, concurrency=1, initial_batch=100, max_batch=100, max_batch_bytes=2000)
+    uploader.submit(*points(20, text="x" * 400))
+    uploader.close()
+    assert max(store.batch_sizes) < 20
+    assert sum(store.batch_sizes) == 20
+
+
+def test_errors_back_off_shrink_batches_and_eventually_succeed():
+    store = FakeStore(fail_times=2)
+    delays = []
+    uploader = AdaptiveUploader(store, concurrency=1, initial_batch=32, min_batch=4, max_retries=5,
+                                sleep=delays.append)
+    uploader.submit(*points(32))
+    stats = uploader.close()
+    assert len(store.stored) == 32
+    assert stats["retries"] == 2
+    assert stats["failed_batches"] == 0
+    assert len(delays) == 2 and all(d >= 0 for d in delays)
+    assert stats["batch_size"] < 32
+
+
+def test_unwaited_upserts_are_confirmed_once_at_the_end():
+    store = FakeStore(drop_unwaited={3, 7})
+    uploader = AdaptiveUploader(store, concurrency=2, wait=False, initial_batch=5)
+    uploader.submit(*points(10))
+    stats = uploader.close()
+    assert len(store.stored) == 10
+    assert stats["resent_points"] == 2
+    assert stats["failed_batches"] == 0
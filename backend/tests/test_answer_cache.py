@@ -0,0 +1,16 @@
+# test_answer_cache.py
+import numpy as np
+
+from services import answer_cache
+
+
+def test_followups_do_not_replay_answers_from_another_conversation():
+    answer_cache.clear()
+    question = np.array([1.0, 0.0, 0.0])
+    first = answer_cache.history_key("User: compare the two leases")
+    other = answer_cache.history_key("User: list the supplier contracts")
+    list(answer_cache.record_stream(iter(["The second lease ", "runs to 2030."]), question, "a.pdf", 1, first))
+
+    assert answer_cache.lookup(question, "a.pdf", 1, first) == ["The second lease ", "runs to 2030."]
+    assert answer_cache.lookup(question, "a.pdf", 1, other) is None
+    assert answer_cache.lookup(question, "a.pdf", 1, answer_cache.history_key("")) is None
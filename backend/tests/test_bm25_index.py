@@ -0,0 +1,81 @@
+# test_bm25_index.py
+import pytest
+
+from core.bm25_index import BM25Index, tokenize
+
+
+def payload(text, file_name="contract.pdf"):
+    return {"text": text, "file_name": file_name, "page": 1}
+
+
+def test_tokenize_keeps_clause_numbers_from_chunked_text():
+    # chunk_text() joins "12.3" as "12 . 3"
+    tokens = tokenize("See Clause 12 . 3 for the non - compete terms")
+    assert "12.3" in tokens
+    assert "non-compete" in tokens
+    assert "the" not in tokens
+
+
+def test_exact_term_ranks_first(tmp_path):
+    index = BM25Index(path=str(tmp_path / "bm25.db"))
+    index.add(
+        ["a", "b", "c"],
+        [
+            payload("Payment is due within 30 days of invoice"),
+            payload("Clause 12 . 3 limits liability to the fees paid"),
+            payload("Termination requires 90 days written notice"),
+        ],
+    )
+    hits = index.search("what does clause 12.3 say about liability", limit=2)
+    assert hits[0].id == "b"
+    assert hits[0].payload["text"].startswith("Clause")
+
+
+def test_remove_file_and_reload(tmp_path):
+    path = str(tmp_path / "bm25.db")
+    index = BM25Index(path=path)
+    index.add(["a"], [payload("indemnification obligations", "one.pdf")])
+    index.add(["b"], [payload("indemnification cap", "two.pdf")])
+    index.remove_file("one.pdf")
+
+    reloaded = BM25Index(path=path)
+    assert len(reloaded) == 1
+    assert [h.id for h in reloaded.search("indemnification")] == ["b"]
+    assert reloaded.search("indemnification", file_name="one.pdf") == []
+
+
+def test_lexical_only_hits_count_as_relevant():
+    pytest.importorskip("fitz")  # services/__init__ needs PyMuPDF
+    from core.vector_store import SearchHit
+    from services.retrieval import _collect_chunks, _rrf_fuse
+
+    chunk = {"text": "Clause 12.3", "file_name": "contract.pdf", "file_id": "f", "page": 4}
+    hits, lexical_scores = _rrf_fuse([], [SearchHit("a", 7.2, chunk)], top_k=5)
+    chunks, scores = _collect_chunks(hits, lexical_scores)
+    assert [c["page"] for c in chunks] == [4]
+    assert scores == [0.5]  # top BM25-only hit
+
+
+def test_batched_changes_are_written_by_save(tmp_path):
+    path = str(tmp_path / "bm25.db")
+    index = BM25Index(path=path)
+    index.add([1, 2], [payload("liquidated damages", "one.pdf"), payload("force majeure", "two.pdf")], save=False)
+    assert len(BM25Index(path=path)) == 0
+    index.save()
+    index.remove_file("two.pdf", save=False)
+    index.save()
+
+    reloaded = BM25Index(path=path)
+    hits = reloaded.search("liquidated damages")
+    assert [h.id for h in hits] == [1]
+    assert hits[0].payload == payload("liquidated damages", "one.pdf")
+    assert reloaded.search("force majeure") == []
+
+
+def test_index_in_the_old_pickle_format_is_discarded(tmp_path):
+    path = tmp_path / "bm25.db"
+    path.write_bytes(b"\x80\x05\x95legacy pickle")
+    index = BM25Index(path=str(path))
+    assert len(index) == 0
+    index.add(["a"], [payload("governing law")])
+    assert len(BM25Index(path=str(path))) == 1
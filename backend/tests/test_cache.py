@@ -0,0 +1,36 @@
+# test_cache.py
+import time
+
+from core.cache import LRUCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" is now most recent
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_ttl_expires_entries():
+    cache = LRUCache(max_size=10, ttl_seconds=0.01)
+    cache.set("q", [0.1, 0.2])
+    assert cache.get("q") == [0.1, 0.2]
+    time.sleep(0.02)
+    assert cache.get("q") is None
+    assert len(cache) == 0
+
+
+def test_stats_count_hits_and_misses():
+    cache = LRUCache(max_size=10)
+    cache.get("missing")
+    cache.set("k", "v")
+    cache.get("k")
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
@@ -0,0 +1,35 @@
+# test_context_packer.py
+from services.context_packer import estimate_tokens, pack_context
+
+
+def chunk(text, page=1, chunk_index=None, file_name="contract.pdf"):
+    return {"text": text, "page": page, "chunk_index": chunk_index, "file_name": file_name, "source": file_name}
+
+
+def words(start, stop):
+    return " ".join(f"w{i}" for i in range(start, stop))
+
+
+def test_adjacent_overlapping_chunks_are_merged_without_repeating_overlap():
+    # chunk_text() style: 200-word windows with a 20-word overlap
+    first, second = chunk(words(0, 200), chunk_index=0), chunk(words(180, 380), chunk_index=1)
+    packed = pack_context([second, first], token_budget=10_000)
+    assert packed["merged"] == 1
+    assert len(packed["blocks"]) == 1
+    assert packed["blocks"][0]["text"] == words(0, 380)
+    assert packed["blocks"][0]["chunk_indices"] == [0, 1]
+
+
+def test_near_duplicates_are_dropped():
+    text = "The supplier shall indemnify the customer against all third party claims " * 5
+    packed = pack_context([chunk(text, page=1), chunk(text + " arising", page=7)], token_budget=10_000)
+    assert packed["duplicates_dropped"] == 1
+    assert [b["page"] for b in packed["blocks"]] == [1]
+
+
+def test_budget_is_respected_and_best_ranked_chunk_kept():
+    chunks = [chunk(words(i * 1000, i * 1000 + 100), page=i) for i in range(10)]
+    packed = pack_context(chunks, token_budget=300)
+    assert packed["tokens"] <= 300
+    assert packed["blocks"][0]["page"] == 0
+    assert packed["tokens"] == estimate_tokens(packed["context"])
@@ -0,0 +1,41 @@
+# test_embedding_backends.py
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("transformers")
+
+from core.embedding_backends import OnnxBackend, SentenceTransformerBackend
+
+MODEL = "all-MiniLM-L6-v2"
+SENTENCES = [
+    "What is the termination clause?",
+    "The Supplier shall indemnify the Customer against all third party claims arising from a breach of "
+    "Clause 12 . 3 , including reasonable legal fees .",
+    "Payment is due within thirty ( 30 ) days of receipt of a valid invoice .",
+    "This Agreement is governed by the laws of England and Wales .",
+    "x",
+]
+
+
+@pytest.fixture(scope="module")
+def reference():
+    return SentenceTransformerBackend(MODEL).encode(SENTENCES)
+
+
+def cosine(a, b):
+    return np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+
+@pytest.mark.parametrize("quantize, minimum", [(False, 0.999), (True, 0.98)])
+def test_onnx_vectors_match_pytorch(reference, quantize, minimum):
+    vectors = OnnxBackend(MODEL, quantize=quantize).encode(SENTENCES, batch_size=2)
+    assert vectors.shape == reference.shape
+    assert vectors.dtype == np.float32
+    assert cosine(vectors, reference).min() >= minimum
+
+
+def test_onnx_single_sentence_returns_vector(reference):
+    vector = OnnxBackend(MODEL).encode(SENTENCES[0])
+    assert vector.shape == reference[0].shape
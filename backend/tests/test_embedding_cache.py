@@ -0,0 +1,67 @@
+# test_embedding_cache.py
+import sqlite3
+
+import numpy as np
+import pytest
+
+from core.embedding_cache import EmbeddingCache, text_hash
+
+
+def test_roundtrip_is_keyed_by_model_and_text(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "cache.db"))
+    cache.put_many("model-a", ["clause one", "clause two"], np.array([[1, 2], [3, 4]], dtype=np.float32))
+    found = cache.get_many("model-a", ["clause two", "unseen", "clause one"])
+    assert sorted(found) == [0, 2]
+    assert found[0].tolist() == [3, 4]
+    assert cache.get_many("model-b", ["clause one"]) == {}
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 2
+
+
+def test_size_cap_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "cache.db"), max_entries=2)
+    cache.put_many("m", ["a"], np.ones((1, 2)))
+    cache.put_many("m", ["b"], np.ones((1, 2)))
+    cache.get_many("m", ["a"])  # "a" is now more recent than "b"
+    cache.put_many("m", ["c"], np.ones((1, 2)))
+    assert len(cache) == 2
+    assert sorted(cache.get_many("m", ["a", "b", "c"])) == [0, 2]
+    assert cache.evictions == 1
+
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    EmbeddingCache(path=path).put_many("m", ["boilerplate"], np.full((1, 3), 0.5))
+    assert EmbeddingCache(path=path).get_many("m", ["boilerplate"])[0].tolist() == [0.5, 0.5, 0.5]
+
+
+def test_backends_do_not_share_vectors(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "cache.db"))
+    cache.put_many("m", ["clause"], np.array([[1, 0]]), backend="torch")
+    cache.put_many("m", ["clause"], np.array([[0, 1]]), backend="onnx-int8")
+    assert cache.get_many("m", ["clause"], backend="torch")[0].tolist() == [1, 0]
+    assert cache.get_many("m", ["clause"], backend="onnx-int8")[0].tolist() == [0, 1]
+    assert cache.get_many("m", ["clause"], backend="onnx") == {}
+
+
+def test_entry_count_is_tracked_without_recounting(tmp_path, monkeypatch):
+    cache = EmbeddingCache(path=str(tmp_path / "cache.db"), max_entries=3)
+    monkeypatch.setattr(cache, "_count", lambda: pytest.fail("COUNT(*) on put"))
+    cache.put_many("m", ["a", "b"], np.ones((2, 2)))
+    cache.put_many("m", ["b", "c"], np.ones((2, 2)))  # "b" is replaced, not added
+    assert len(cache) == 3 and cache.evictions == 0
+    cache.put_many("m", ["d"], np.ones((1, 2)))
+    assert len(cache) == 3 and cache.evictions == 1
+
+
+def test_entries_without_a_backend_are_dropped(tmp_path):
+    path = str(tmp_path / "cache.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE embeddings (model TEXT, text_hash TEXT, dim INTEGER, vector BLOB, last_used REAL, "
+                 "PRIMARY KEY (model, text_hash))")
+    conn.execute("INSERT INTO embeddings VALUES ('m', ?, 2, ?, 0)", (text_hash("old"), np.ones(2, np.float32).tobytes()))
+    conn.commit()
+    conn.close()
+    cache = EmbeddingCache(path=path)
+    assert len(cache) == 0
+    assert cache.get_many("m", ["old"]) == {}
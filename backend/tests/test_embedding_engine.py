@@ -0,0 +1,70 @@
+# test_embedding_engine.py
+import numpy as np
+
+from core import embedder
+from core.embedding_cache import EmbeddingCache
+from data_processing import embedding_engine
+from data_processing.embedding_engine import batch_size_for, embed_texts, length_buckets, spread_batches
+
+
+class LengthModel:
+    """Stand-in encoder: the vector is [word count, batch size]."""
+
+    name = "fake"
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        self.batches.append(len(texts))
+        return np.array([[len(t.split()), len(texts)] for t in texts], dtype=np.float64)
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+
+def test_batch_size_shrinks_for_long_sequences():
+    available = 512 * 1024 ** 2
+    assert batch_size_for(16, available) >= batch_size_for(256, available)
+    assert embedding_engine.EMBED_MIN_BATCH <= batch_size_for(256, available) <= embedding_engine.EMBED_MAX_BATCH
+
+
+def test_buckets_group_similar_lengths():
+    texts = ["word " * n for n in (5, 180, 6, 190, 4, 200)]
+    order = [i for batch in length_buckets(texts) for i in batch]
+    assert sorted(order) == list(range(len(texts)))
+    assert order[:3] == [5, 3, 1]  # longest first
+
+
+def test_batches_are_spread_over_workers():
+    batches = spread_batches([list(range(64))], 4)
+    assert [len(rows) for rows in batches] == [16, 16, 16, 16]
+    assert sorted(i for rows in batches for i in rows) == list(range(64))
+    assert len(spread_batches([list(range(10))], 4)) == 1  # too small to split
+
+
+def test_embed_texts_returns_float32_in_input_order(monkeypatch):
+    model = LengthModel()
+    monkeypatch.setitem(embedder._models, "fake-model", model)
+    monkeypatch.setattr(embedding_engine, "EMBED_BATCH_SIZE", 2)
+    texts = ["a b c", "a", "a b c d e", "a b"]
+    progress = []
+    vectors = embed_texts(texts, "fake-model", progress=lambda done, total: progress.append((done, total)),
+                          use_cache=False)
+    assert vectors.dtype == np.float32
+    assert vectors[:, 0].tolist() == [3, 1, 5, 2]
+    assert model.batches == [2, 2]
+    assert progress[-1] == (4, 4)
+
+
+def test_cached_chunks_are_not_re_encoded(monkeypatch, tmp_path):
+    model = LengthModel()
+    cache = EmbeddingCache(path=str(tmp_path / "cache.db"))
+    monkeypatch.setitem(embedder._models, "fake-model", model)
+    monkeypatch.setattr(embedding_engine, "get_embedding_cache", lambda: cache)
+    first = embed_texts(["a b c", "a"], "fake-model")
+    second = embed_texts(["a", "new text here", "a b c"], "fake-model")
+    assert model.batches == [2, 1]  # only "new text here" encoded the second time
+    assert second[0].tolist() == first[1].tolist()
+    assert second[2].tolist() == first[0].tolist()
+    assert cache.stats()["hits"] == 2
@@ -0,0 +1,95 @@
+# test_extraction_cache.py
+from core.extraction_cache import ExtractionCache
+
+PAGES = [("First page of the agreement", 1, "a.pdf"), ("Second page", 2, "a.pdf")]
+
+
+def counting_extract(pages):
+    calls = []
+
+    def extract():
+        calls.append(1)
+        yield from pages
+
+    return extract, calls
+
+
+def test_extraction_is_served_from_cache_under_the_new_name(tmp_path):
+    cache = ExtractionCache(path=str(tmp_path / "extraction.db"))
+    extract, calls = counting_extract(PAGES)
+    assert list(cache.iter_pages("hash", "1|.pdf", "a.pdf", extract)) == PAGES
+    again = list(cache.iter_pages("hash", "1|.pdf", "renamed.pdf", extract))
+    assert again == [(text, page, "renamed.pdf") for text, page, _ in PAGES]
+    assert len(calls) == 1
+    assert cache.get("hash", "2|.pdf") is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_partial_extraction_is_not_stored(tmp_path):
+    cache = ExtractionCache(path=str(tmp_path / "extraction.db"))
+    extract, _ = counting_extract(PAGES)
+    pages = cache.iter_pages("hash", "1|.pdf", "a.pdf", extract)
+    next(pages)
+    pages.close()
+    assert len(cache) == 0
+
+
+def test_pending_ocr_pages_are_only_served_to_deferring_callers(tmp_path):
+    cache = ExtractionCache(path=str(tmp_path / "extraction.db"))
+    cache.put("hash", "1|.pdf", [("Text layer", 1), (None, 2)])
+    assert cache.get("hash", "1|.pdf") is None
+    assert cache.get("hash", "1|.pdf", allow_pending=True) == [("Text layer", 1), (None, 2)]
+    assert cache.fill_pages("hash", "1|.pdf", {2: "Scanned schedule"})
+    assert cache.get("hash", "1|.pdf") == [("Text layer", 1), ("Scanned schedule", 2)]
+    assert not cache.fill_pages("other", "1|.pdf", {2: "x"})
+
+
+def test_byte_budget_evicts_least_recently_used(tmp_path):
+    cache = ExtractionCache(path=str(tmp_path / "extraction.db"))
+    cache.put("a", "1", [("alpha " * 50, 1)])
+    size = cache.stats()["bytes"]
+    cache.max_bytes = 2 * size
+    cache.put("b", "1", [("bravo " * 50, 1)])
+    cache.get("a", "1")
+    cache.put("c", "1", [("delta " * 50, 1)])
+    assert cache.get("b", "1") is None
+    assert cache.get("a", "1") is not None
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def long_document(pages=40):
+    return [(f"Clause {n}: the supplier shall deliver the goods.", n, "long.pdf") for n in range(1, pages + 1)]
+
+
+def test_pages_are_stored_and_served_in_chunks(tmp_path):
+    cache = ExtractionCache(path=str(tmp_path / "extraction.db"))
+    extract, calls = counting_extract(long_document())
+    list(cache.iter_pages("hash", "1|.pdf", "long.pdf", extract))
+    assert cache._conn.execute("SELECT COUNT(*) FROM extraction_chunks").fetchone()[0] == 3
+
+    served = cache.iter_pages("hash", "1|.pdf", "long.pdf", extract)
+    assert next(served)[1] == 1
+    # Later chunks are only read as the caller gets to them; one that is
+    # gone by then is extracted again, without repeating served pages
+    cache._conn.execute("DELETE FROM extraction_chunks WHERE chunk = 2")
+    assert [page for _, page, _ in served] == list(range(2, 41))
+    assert len(calls) == 2
+
+
+def test_document_over_the_budget_is_not_recorded(tmp_path):
+    cache = ExtractionCache(path=str(tmp_path / "extraction.db"), max_bytes=300)
+    extract, _ = counting_extract(long_document())
+    assert len(list(cache.iter_pages("hash", "1|.pdf", "long.pdf", extract))) == 40
+    assert len(cache) == 0
+    assert cache._conn.execute("SELECT COUNT(*) FROM extraction_chunks").fetchone()[0] == 0
+
+
+def test_filling_pending_pages_rewrites_only_their_chunks(tmp_path):
+    cache = ExtractionCache(path=str(tmp_path / "extraction.db"))
+    pages = [(None if n == 30 else f"Page {n}", n) for n in range(1, 41)]
+    cache.put("hash", "1|.pdf", pages)
+    before = dict(cache._conn.execute("SELECT chunk, pages FROM extraction_chunks"))
+    assert cache.fill_pages("hash", "1|.pdf", {30: "Scanned page"})
+    after = dict(cache._conn.execute("SELECT chunk, pages FROM extraction_chunks"))
+    assert [chunk for chunk in before if before[chunk] != after[chunk]] == [1]
+    assert cache.get("hash", "1|.pdf")[29] == ("Scanned page", 30)
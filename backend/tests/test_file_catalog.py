@@ -0,0 +1,25 @@
+# test_file_catalog.py
+import pytest
+
+from core import file_catalog
+
+
+@pytest.fixture(autouse=True)
+def catalog(monkeypatch, tmp_path):
+    monkeypatch.setattr(file_catalog, "FILE_CATALOG_PATH", str(tmp_path / "catalog.db"))
+    monkeypatch.setattr(file_catalog, "_conn", None)
+
+
+def test_upsert_keeps_created_at_of_existing_entry():
+    file_catalog.upsert_file("contract.pdf", "id-1", page_count=3, chunk_count=10, created_at="2024-01-01T00:00:00")
+    file_catalog.upsert_file("contract.pdf", "id-1", page_count=4, chunk_count=12, pending_ocr_pages=1)
+    entry = file_catalog.get_file("contract.pdf")
+    assert entry["created_at"] == "2024-01-01T00:00:00"
+    assert (entry["page_count"], entry["chunk_count"], entry["pending_ocr_pages"]) == (4, 12, 1)
+
+
+def test_files_are_listed_in_order_of_first_ingest():
+    file_catalog.upsert_file("a.pdf", "a", page_count=1, chunk_count=1, created_at="2024-01-01T00:00:00")
+    file_catalog.upsert_file("b.pdf", "b", page_count=1, chunk_count=1, created_at="2024-01-02T00:00:00")
+    file_catalog.upsert_file("a.pdf", "a", page_count=2, chunk_count=2)
+    assert [f["file_name"] for f in file_catalog.list_catalog_files()] == ["a.pdf", "b.pdf"]
@@ -0,0 +1,135 @@
+# test_ingest_jobs.py
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from services.ingest_jobs import CANCELLED, FAILED, QUEUED, SUCCEEDED, IngestJobManager
+
+
+def make_manager(tmp_path, **kwargs):
+    return IngestJobManager(path=str(tmp_path / "jobs.db"), spool_dir=str(tmp_path / "spool"), **kwargs)
+
+
+def wait_for(manager, job_id, states=(SUCCEEDED, FAILED, CANCELLED), timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job["status"] in states:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} stuck in {manager.get(job_id)['status']}")
+
+
+def test_job_reports_progress_and_result(tmp_path):
+    manager = make_manager(tmp_path, workers=1)
+
+    def handler(job, progress, cancel):
+        for n in range(1, 4):
+            progress({"pages_extracted": n, "points_upserted": n * 10})
+        return {"status": "uploaded", "file_name": job["params"]["file_name"], "failed_batches": 0}
+
+    manager.register_handler("file", handler)
+    manager.start()
+    job_id = manager.submit("file", {"file_name": "contract.pdf"})
+    job = wait_for(manager, job_id)
+    manager.stop()
+
+    assert job["status"] == SUCCEEDED
+    assert job["progress"] == {"pages_extracted": 3, "points_upserted": 30}
+    assert job["result"]["file_name"] == "contract.pdf"
+    assert job["attempts"] == 1
+
+
+def test_failed_batches_are_retried(tmp_path):
+    manager = make_manager(tmp_path, workers=1, max_attempts=3)
+    calls = []
+
+    def handler(job, progress, cancel):
+        calls.append(job["attempts"])
+        failed = 1 if len(calls) < 2 else 0
+        return {"status": "uploaded", "failed_batches": failed}
+
+    manager.register_handler("file", handler)
+    manager.start()
+    job = wait_for(manager, manager.submit("file", {}))
+    manager.stop()
+
+    assert job["status"] == SUCCEEDED
+    assert job["attempts"] == 2
+    assert len(calls) == 2
+
+
+def test_cancel_stops_running_job_and_keeps_spool(tmp_path):
+    manager = make_manager(tmp_path, workers=1)
+    started = threading.Event()
+
+    def handler(job, progress, cancel):
+        started.set()
+        cancel.wait(5)
+        return {"status": "cancelled"}
+
+    manager.register_handler("file", handler)
+    manager.start()
+    job_id = manager.new_job_id()
+    spool = tmp_path / "spool" / job_id
+    spool.mkdir(parents=True)
+    (spool / "big.pdf").write_bytes(b"%PDF")
+    manager.submit("file", {}, job_id=job_id)
+    assert started.wait(5)
+    manager.cancel(job_id)
+    job = wait_for(manager, job_id)
+    manager.stop()
+
+    assert job["status"] == CANCELLED
+    assert (spool / "big.pdf").exists()
+
+
+def test_cancelled_file_job_can_be_retried(tmp_path):
+    manager = make_manager(tmp_path, workers=1)
+    job_id = manager.new_job_id()
+    path = tmp_path / "spool" / job_id / "contract.pdf"
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"%PDF")
+    manager.submit("file", {"path": str(path), "file_name": "contract.pdf"}, job_id=job_id)
+    assert manager.cancel(job_id)["status"] == CANCELLED
+
+    manager.register_handler("file", lambda job, progress, cancel: {
+        "status": "uploaded" if Path(job["params"]["path"]).read_bytes() == b"%PDF" else "error"})
+    manager.start()
+    manager.retry(job_id)
+    job = wait_for(manager, job_id)
+    manager.stop()
+    assert job["status"] == SUCCEEDED
+    assert not path.parent.exists()
+
+
+def test_retry_rejects_job_whose_upload_expired(tmp_path):
+    manager = make_manager(tmp_path, spool_retention_h=0)
+    job_id = manager.new_job_id()
+    path = tmp_path / "spool" / job_id / "contract.pdf"
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"%PDF")
+    manager.submit("file", {"path": str(path)}, job_id=job_id)
+    manager.cancel(job_id)
+    time.sleep(0.01)
+    manager.start()
+    manager.stop()
+    assert not path.exists()
+    with pytest.raises(FileNotFoundError):
+        manager.retry(job_id)
+    assert manager.get(job_id)["status"] == CANCELLED
+
+
+def test_unfinished_jobs_resume_after_restart(tmp_path):
+    first = make_manager(tmp_path)  # never started: the job stays queued
+    job_id = first.submit("file", {"file_name": "a.pdf"})
+    assert first.get(job_id)["status"] == QUEUED
+
+    second = make_manager(tmp_path, workers=1)
+    second.register_handler("file", lambda job, progress, cancel: {"status": "unchanged"})
+    second.start()
+    job = wait_for(second, job_id)
+    second.stop()
+    assert job["status"] == SUCCEEDED
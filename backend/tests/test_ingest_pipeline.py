@@ -0,0 +1,180 @@
+# test_ingest_pipeline.py
+import functools
+
+import numpy as np
+import pytest
+
+from core import bm25_index, embedder, file_catalog, vector_store
+from core.bm25_index import BM25Index
+from core.local_store import LocalVectorStore
+from data_processing import embedding_engine, ingest_pipeline
+from data_processing.build_vector_store import build_and_save_index
+from data_processing.ingest_pipeline import ingest_ocr_pages
+
+
+class CountingModel:
+    name = "fake"
+
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        self.encoded += len(texts)
+        return np.array([[len(t), t.count(" ") + 1, 1.0] for t in texts], dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self):
+        return 3
+
+
+@pytest.fixture
+def model(monkeypatch, tmp_path):
+    model = CountingModel()
+    monkeypatch.setitem(embedder._models, embedder.EMBEDDER_MODEL, model)
+    monkeypatch.setattr(embedding_engine, "get_embedding_cache", lambda: None)
+    monkeypatch.setattr(vector_store, "_store", LocalVectorStore(directory=str(tmp_path / "store")))
+    monkeypatch.setattr(bm25_index, "_index", BM25Index(path=str(tmp_path / "bm25.db")))
+    monkeypatch.setattr(file_catalog, "FILE_CATALOG_PATH", str(tmp_path / "catalog.db"))
+    monkeypatch.setattr(file_catalog, "_conn", None)
+    monkeypatch.setattr(ingest_pipeline.time, "sleep", lambda s: None)
+    return model
+
+
+def pages(texts, name="contract.pdf"):
+    return [(text, page, name) for page, text in enumerate(texts, start=1)]
+
+
+def test_reupload_only_touches_changed_pages(model):
+    original = [f"page {n} clause text " * 30 for n in range(10)]
+    first = build_and_save_index(pages(original))
+    assert first["status"] == "uploaded"
+    assert model.encoded == 10
+    file_id = file_catalog.get_file("contract.pdf")["file_id"]
+
+    edited = list(original)
+    edited[4] = "page 4 amended clause text " * 30
+    second = build_and_save_index(pages(edited))
+    assert second["points_uploaded"] == 1
+    assert second["points_deleted"] == 1
+    assert second["points_unchanged"] == 9
+    assert model.encoded == 11
+    assert vector_store.get_vector_store().count("contract.pdf") == 10
+    assert file_catalog.get_file("contract.pdf")["file_id"] == file_id
+    hits = bm25_index.get_bm25_index().search("amended", limit=10)
+    assert [hit.payload["page"] for hit in hits] == [5]
+    assert len(bm25_index.get_bm25_index()) == 10
+
+
+def test_large_documents_are_embedded_on_the_process_pool(model, monkeypatch):
+    monkeypatch.setattr(embedding_engine, "EMBED_WORKERS", 2)
+    monkeypatch.setattr(embedding_engine, "EMBED_PROCESS_THRESHOLD", 3)
+    monkeypatch.setattr(ingest_pipeline, "EMBED_WORKERS", 2)
+    monkeypatch.setattr(ingest_pipeline, "PIPELINE_EMBED_BATCH", 2)
+    calls = []
+    real_embed = ingest_pipeline.embed_texts
+
+    def embed(texts, model_name, use_pool=None):
+        calls.append((len(texts), use_pool))
+        return real_embed(texts, model_name, use_pool=False)  # no worker processes in tests
+
+    monkeypatch.setattr(ingest_pipeline, "embed_texts", embed)
+    result = build_and_save_index(pages([f"page {n} clause text " * 30 for n in range(10)]))
+    assert result["points_uploaded"] == 10
+    assert calls[0] == (2, False)
+    assert (4, True) in calls  # past the threshold: EMBED_WORKERS slices per call
+
+
+def test_batches_are_indexed_lexically_as_they_are_stored(model, monkeypatch):
+    monkeypatch.setattr(ingest_pipeline, "PIPELINE_EMBED_BATCH", 2)
+    monkeypatch.setattr(ingest_pipeline, "AdaptiveUploader",
+                        functools.partial(ingest_pipeline.AdaptiveUploader, initial_batch=2, min_batch=1, max_batch=2))
+    index = bm25_index.get_bm25_index()
+    sizes, saves = [], []
+    real_add = index.add
+    monkeypatch.setattr(index, "add", lambda ids, payloads, save=True: (sizes.append(len(ids)),
+                                                                         real_add(ids, payloads, save)))
+    monkeypatch.setattr(index, "_save", lambda: saves.append(len(index)))
+    build_and_save_index(pages([f"page {n} clause text " * 30 for n in range(10)]))
+    assert sum(sizes) == 10 and max(sizes) < 10
+    assert saves == [10]
+
+
+def test_empty_pages_produce_no_chunks(model):
+    result = build_and_save_index(pages(["the supplier shall deliver the goods " * 20, "", "   "]))
+    assert result["status"] == "uploaded"
+    assert result["pending_ocr_pages"] == []
+    points, _ = vector_store.get_vector_store().scroll(limit=10)
+    assert [p.payload["page"] for p in points] == [1]
+
+
+def test_identical_reupload_is_unchanged(model):
+    texts = ["the supplier shall deliver the goods " * 20, "payment within thirty days " * 20]
+    build_and_save_index(pages(texts))
+    result = build_and_save_index(pages(texts))
+    assert result["status"] == "unchanged"
+    assert model.encoded == 2
+
+
+def test_pages_stream_through_and_report_progress(model):
+    produced = []
+
+    def generate():
+        for n in range(6):
+            produced.append(n)
+            yield (f"streamed page {n} " * 40, n + 1, "big.pdf")
+
+    snapshots = []
+    result = build_and_save_index(generate(), progress=snapshots.append)
+    assert result["status"] == "uploaded"
+    assert produced == list(range(6))
+    assert snapshots[-1]["pages_extracted"] == 6
+    assert max(s["points_upserted"] for s in snapshots) == 6
+    assert file_catalog.get_file("big.pdf")["page_count"] == 6
+
+
+def test_extraction_error_fails_ingest_without_deleting(model):
+    build_and_save_index(pages(["first version " * 30, "second page " * 30], name="broken.pdf"))
+
+    def generate():
+        yield ("first version changed " * 30, 1, "broken.pdf")
+        raise ValueError("corrupt xref table")
+
+    result = build_and_save_index(generate())
+    assert result["status"] == "error"
+    assert "corrupt xref" in result["reason"]
+    assert result["points_deleted"] == 0
+    assert vector_store.get_vector_store().count("broken.pdf") >= 2
+
+
+def test_ocr_pages_are_indexed_after_text_pages(model):
+    texts = ["text layer clause " * 30, None, "another text page " * 30, None]
+    first = build_and_save_index(pages(texts, name="mixed.pdf"))
+    assert first["status"] == "uploaded"
+    assert first["pending_ocr_pages"] == [2, 4]
+    assert model.encoded == 2  # no placeholder text is embedded
+    entry = file_catalog.get_file("mixed.pdf")
+    assert entry["pending_ocr_pages"] == 2
+    assert entry["page_count"] == 4
+
+    ocr = ingest_ocr_pages(
+        [("scanned indemnity clause " * 30, 2, "mixed.pdf"), (None, 4, "mixed.pdf")], "mixed.pdf"
+    )
+    assert ocr["status"] == "error"  # page 4 failed and stays pending
+    assert file_catalog.get_file("mixed.pdf")["pending_ocr_pages"] == 2
+
+    ocr = ingest_ocr_pages(
+        [("scanned indemnity clause " * 30, 2, "mixed.pdf"), ("scanned signature page " * 30, 4, "mixed.pdf")],
+        "mixed.pdf",
+    )
+    assert ocr["status"] == "uploaded"
+    assert ocr["points_uploaded"] == 1  # page 2 was stored by the failed run already
+    entry = file_catalog.get_file("mixed.pdf")
+    assert entry["pending_ocr_pages"] == 0
+    assert entry["chunk_count"] == 4
+    hits = bm25_index.get_bm25_index().search("indemnity", limit=10)
+    assert [hit.payload["page"] for hit in hits] == [2]
+
+    # Re-uploading keeps the OCR chunks while their pages wait for OCR again
+    again = build_and_save_index(pages(texts, name="mixed.pdf"))
+    assert again["status"] == "unchanged"
+    assert again["points_deleted"] == 0
+    assert vector_store.get_vector_store().count("mixed.pdf") == 4
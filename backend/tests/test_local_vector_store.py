@@ -0,0 +1,102 @@
+# test_local_vector_store.py
+import json
+
+import numpy as np
+
+from core import local_store
+from core.local_store import LocalVectorStore
+from core.vector_store import SearchQuery
+
+
+def make_store(tmp_path, dtype="float32"):
+    store = LocalVectorStore(directory=str(tmp_path / "store"), dtype=dtype)
+    vectors = np.eye(4, dtype=np.float32)
+    store.upsert(
+        ["a", "b", "c", "d"],
+        vectors,
+        [{"file_name": "one.pdf", "text": f"chunk {i}", "page": i} for i in range(2)]
+        + [{"file_name": "two.pdf", "text": f"chunk {i}", "page": i} for i in range(2)],
+    )
+    return store
+
+
+def test_search_returns_nearest_first(tmp_path):
+    store = make_store(tmp_path)
+    hits = store.search([0.9, 0.1, 0.0, 0.0], limit=2)
+    assert [h.id for h in hits] == ["a", "b"]
+    assert hits[0].score > hits[1].score
+
+
+def test_filtered_search_and_batch(tmp_path):
+    store = make_store(tmp_path, dtype="float16")
+    everything, filtered = store.search_batch([
+        SearchQuery([1.0, 0.0, 0.0, 0.0], 4),
+        SearchQuery([1.0, 0.0, 0.0, 0.0], 4, file_name="two.pdf", score_threshold=-1.0),
+    ])
+    assert everything[0].id == "a"
+    assert {h.id for h in filtered} == {"c", "d"}
+
+
+def test_delete_scroll_count_and_reload(tmp_path):
+    store = make_store(tmp_path)
+    store.delete_by_file("one.pdf")
+    assert store.count() == 2
+    assert store.count(file_name="one.pdf") == 0
+
+    reopened = LocalVectorStore(directory=str(tmp_path / "store"))
+    points, next_offset = reopened.scroll(limit=10, with_payload=["file_name"])
+    assert next_offset is None
+    assert sorted(p.id for p in points) == ["c", "d"]
+    assert points[0].payload == {"file_name": "two.pdf"}
+
+
+def test_upsert_overwrites_existing_ids(tmp_path):
+    store = make_store(tmp_path)
+    store.upsert(["a"], [[0.0, 0.0, 0.0, 1.0]], [{"file_name": "one.pdf", "text": "moved"}])
+    hits = store.search([0.0, 0.0, 0.0, 1.0], limit=2)
+    assert {h.id for h in hits} == {"a", "d"}
+    assert store.count() == 4
+
+
+def test_grows_in_place_compacts_and_reloads(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_store, "_INITIAL_CAPACITY", 4)
+    store = LocalVectorStore(directory=str(tmp_path / "store"))
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(20, 8)).astype(np.float32)
+    for start in range(0, 20, 5):
+        store.upsert([f"p{n}" for n in range(start, start + 5)], vectors[start:start + 5],
+                     [{"file_name": f"f{n % 2}.pdf", "n": n} for n in range(start, start + 5)])
+    assert store.stats()["allocated_rows"] == 32
+    assert store.stats()["vector_file"] == "vectors.1.bin"  # grown in place, never rewritten
+    assert store.count("f0.pdf") == 10
+
+    store.delete_by_file("f0.pdf")
+    store.delete_ids(["p1", "p3"])
+    assert store.stats()["stored_rows"] == 8  # compacted once dead rows outnumbered live ones
+    reopened = LocalVectorStore(directory=str(tmp_path / "store"))
+    assert reopened.count() == 8 and reopened.count("f1.pdf") == 8
+    hit = reopened.search(vectors[7], limit=1, file_name="f1.pdf")[0]
+    assert hit.id == "p7" and hit.payload["n"] == 7
+    assert abs(hit.score - 1.0) < 1e-5
+
+
+def test_overwrite_can_move_point_to_another_file(tmp_path):
+    store = make_store(tmp_path)
+    store.upsert(["a"], [[1.0, 0.0, 0.0, 0.0]], [{"file_name": "two.pdf", "text": "moved"}])
+    assert store.count("one.pdf") == 1
+    assert store.count("two.pdf") == 3
+
+
+def test_legacy_layout_is_converted(tmp_path):
+    directory = tmp_path / "store"
+    directory.mkdir()
+    np.save(directory / "vectors.npy", np.eye(3, dtype=np.float32))
+    (directory / "points.json").write_text(json.dumps({
+        "ids": ["a", "b", "c"],
+        "payloads": [{"file_name": "x.pdf", "text": t} for t in "abc"],
+        "alive": [True, False, True],
+    }))
+    store = LocalVectorStore(directory=str(directory))
+    assert store.count() == 2
+    assert store.search([0.0, 0.0, 1.0], limit=1)[0].payload["text"] == "c"
+    assert not (directory / "points.json").exists()
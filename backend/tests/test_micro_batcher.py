@@ -0,0 +1,70 @@
+# test_micro_batcher.py
+import asyncio
+
+from core.micro_batcher import MicroBatcher
+
+
+def test_concurrent_submits_share_one_batch():
+    calls = []
+
+    def batch_fn(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=16, max_wait_ms=50)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+
+    assert asyncio.run(run()) == [i * 2 for i in range(10)]
+    assert len(calls) == 1
+    stats = batcher.stats()
+    assert stats["batch_size"]["count"] == 1
+    assert stats["queue_wait_ms"]["count"] == 10
+
+
+def test_batches_are_capped_at_max_size():
+    sizes = []
+    batcher = MicroBatcher(lambda items: sizes.append(len(items)) or items, max_batch_size=4, max_wait_ms=20)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+
+    assert asyncio.run(run()) == list(range(10))
+    assert max(sizes) == 4
+    assert sum(sizes) == 10
+
+
+def test_errors_reach_every_waiter():
+    def batch_fn(items):
+        raise RuntimeError("encoder down")
+
+    batcher = MicroBatcher(batch_fn, max_wait_ms=5)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert batcher.errors == 1
+
+
+def test_running_dispatches_are_referenced_until_done():
+    batcher = MicroBatcher(lambda items: items, max_batch_size=4, max_wait_ms=1)
+
+    async def run():
+        assert await batcher.submit("a") == "a"
+        await asyncio.sleep(0)  # let the done callback run
+        return len(batcher._dispatches)
+
+    assert asyncio.run(run()) == 0
+
+    seen = []
+
+    def batch_fn(items):
+        seen.append(len(batcher._dispatches))
+        return items
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=1)
+    asyncio.run(batcher.submit("b"))
+    assert seen == [1]
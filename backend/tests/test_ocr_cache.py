@@ -0,0 +1,43 @@
+# test_ocr_cache.py
+import pytest
+
+from core.ocr_cache import OcrCache, image_hash
+
+
+def test_text_is_keyed_by_engine_and_image(tmp_path):
+    cache = OcrCache(path=str(tmp_path / "ocr.db"))
+    key = image_hash(10, 20, "L", b"\x00" * 200)
+    cache.put("tesseract|eng|", key, "WHEREAS the parties agree")
+    assert cache.get("tesseract|eng|", key) == "WHEREAS the parties agree"
+    assert cache.get("tesseract|deu|", key) is None
+    assert image_hash(20, 10, "L", b"\x00" * 200) != key
+    assert cache.stats()["hits"] == 1
+
+
+def test_size_cap_evicts_least_recently_used(tmp_path):
+    cache = OcrCache(path=str(tmp_path / "ocr.db"), max_entries=2)
+    cache.put("e", "a", "page a")
+    cache.put("e", "b", "page b")
+    cache.get("e", "a")
+    cache.put("e", "c", "page c")
+    assert len(cache) == 2
+    assert cache.get("e", "b") is None
+    assert cache.get("e", "a") == "page a"
+
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "ocr.db")
+    OcrCache(path=path).put("e", "k", "scanned text")
+    assert OcrCache(path=path).get("e", "k") == "scanned text"
+
+
+def test_entry_count_is_tracked_without_recounting(tmp_path, monkeypatch):
+    cache = OcrCache(path=str(tmp_path / "ocr.db"), max_entries=2)
+    monkeypatch.setattr(cache, "_count", lambda: pytest.fail("COUNT(*) on put"))
+    cache.put("e", "a", "page a")
+    cache.put("e", "a", "page a again")  # replaced, not added
+    cache.put("e", "b", "page b")
+    assert len(cache) == 2 and cache.evictions == 0
+    assert cache.get("e", "a") == "page a again"
+    cache.put("e", "c", "page c")
+    assert len(cache) == 2 and cache.evictions == 1
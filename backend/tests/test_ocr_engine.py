@@ -0,0 +1,71 @@
+# test_ocr_engine.py
+import threading
+import time
+
+from core.ocr_cache import OcrCache
+from services import ocr_engine
+from services.ocr_engine import OcrEngine, choose_dpi
+
+
+class FakeImage:
+    mode = "L"
+
+    def __init__(self, n, width=100, height=100):
+        self.n = n
+        self.width = width
+        self.height = height
+
+    def tobytes(self):
+        return bytes([self.n % 256]) * (self.width * self.height)
+
+
+def test_dpi_follows_scan_resolution_within_limits():
+    letter = (612, 792)
+    assert choose_dpi(*letter) == ocr_engine.OCR_DEFAULT_DPI
+    assert choose_dpi(*letter, image_dpis=[200]) == 200
+    assert choose_dpi(*letter, image_dpis=[72]) == ocr_engine.OCR_MIN_DPI
+    assert choose_dpi(*letter, image_dpis=[600]) == ocr_engine.OCR_MAX_DPI
+    # A 1 m x 1.4 m poster is capped by the pixel budget
+    poster = choose_dpi(2835, 3969, image_dpis=[300])
+    assert poster < ocr_engine.OCR_MIN_DPI
+    assert (2835 / 72 * poster) * (3969 / 72 * poster) <= ocr_engine.OCR_MAX_PIXELS
+
+
+def test_stream_is_ordered_and_bounded():
+    active, peak = [0], [0]
+    lock = threading.Lock()
+    pulled = []
+
+    def fake_ocr(image):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.005 * (image.n % 3))
+        with lock:
+            active[0] -= 1
+        return f"page {image.n}"
+
+    def images():
+        for n in range(30):
+            pulled.append(n)
+            yield FakeImage(n)
+
+    engine = OcrEngine(workers=3, ocr_fn=fake_ocr)
+    texts = engine.iter_ocr_images(images())
+    assert next(texts) == "page 0"
+    assert len(pulled) <= 2 * 3 + 1  # rendering stays just ahead of OCR
+    assert list(texts) == [f"page {n}" for n in range(1, 30)]
+    assert peak[0] <= 3
+
+
+def test_reuploaded_pages_skip_ocr(tmp_path):
+    calls = []
+    cache = OcrCache(path=str(tmp_path / "ocr.db"))
+    engine = OcrEngine(workers=2, cache=cache, ocr_fn=lambda image: calls.append(image.n) or f"text {image.n}")
+    assert list(engine.iter_ocr_images(FakeImage(n) for n in range(4))) == [f"text {n}" for n in range(4)]
+
+    again = OcrEngine(workers=2, cache=OcrCache(path=str(tmp_path / "ocr.db")),
+                      ocr_fn=lambda image: calls.append(image.n) or "should not run")
+    assert again.ocr_image(FakeImage(2)) == "text 2"
+    assert sorted(calls) == [0, 1, 2, 3]
+    assert again.stats()["cache_hits"] == 1
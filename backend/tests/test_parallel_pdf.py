@@ -0,0 +1,35 @@
+# test_parallel_pdf.py
+import pytest
+
+# Importing anything from services loads services/__init__, which needs PyMuPDF
+fitz = pytest.importorskip("fitz")
+
+from services.parallel_pdf import page_ranges, should_parallelize
+
+
+def test_page_ranges_cover_every_page_once():
+    assert page_ranges(20, 8) == [(0, 8), (8, 16), (16, 20)]
+    assert page_ranges(3, 8) == [(0, 3)]
+    assert page_ranges(0, 8) == []
+
+
+def test_short_documents_stay_in_process():
+    assert not should_parallelize(200, workers=1)
+    assert not should_parallelize(2, workers=4)
+    assert should_parallelize(200, workers=4)
+
+
+def test_parallel_extraction_matches_sequential_order(tmp_path):
+    from services.file_handler import extract_text_from_file
+
+    path = tmp_path / "filing.pdf"
+    doc = fitz.open()
+    for n in range(40):
+        doc.new_page().insert_text((72, 72), f"Page {n} of the filing. " * 10)
+    doc.save(str(path))
+    doc.close()
+
+    sequential = extract_text_from_file("filing.pdf", str(path), workers=1)
+    parallel = extract_text_from_file("filing.pdf", str(path), workers=3)
+    assert parallel == sequential
+    assert [page for _, page, _ in parallel] == list(range(1, 41))
@@ -0,0 +1,81 @@
+# test_upload_spool.py
+import asyncio
+import hashlib
+import os
+import tempfile
+import tracemalloc
+
+import pytest
+from fastapi import UploadFile
+
+# Importing anything from services loads services/__init__, which needs PyMuPDF
+fitz = pytest.importorskip("fitz")
+
+from services import file_handler
+from services.upload_spool import spool_upload, spooled_upload
+
+UPLOAD_BYTES = 32 * 1024 * 1024
+# Peak Python heap allowed while handling one upload: a few spool chunks,
+# far below a single in-memory copy of the file
+PEAK_LIMIT = 8 * 1024 * 1024
+
+
+def make_upload(size=UPLOAD_BYTES, filename="big.pdf"):
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    digest = hashlib.sha256()
+    block = os.urandom(1024 * 1024)
+    for _ in range(size // len(block)):
+        spool.write(block)
+        digest.update(block)
+    spool.seek(0)
+    return UploadFile(spool, filename=filename), digest.hexdigest()
+
+
+def test_spool_streams_to_disk_with_bounded_memory(tmp_path):
+    upload, expected = make_upload()
+    tracemalloc.start()
+    spooled = asyncio.run(spool_upload(upload, str(tmp_path / "job" / "big.pdf")))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert spooled.size == UPLOAD_BYTES
+    assert spooled.sha256 == expected
+    assert os.path.getsize(spooled.path) == UPLOAD_BYTES
+    assert peak < PEAK_LIMIT
+
+
+def test_temporary_spool_is_removed():
+    upload, _ = make_upload(size=2 * 1024 * 1024, filename="notes.txt")
+
+    async def run():
+        async with spooled_upload(upload) as spooled:
+            assert spooled.path.endswith(".txt")
+            assert os.path.exists(spooled.path)
+            return spooled.path
+
+    assert not os.path.exists(asyncio.run(run()))
+
+
+def test_pdf_extraction_opens_the_file_by_path(tmp_path, monkeypatch):
+    path = tmp_path / "contract.pdf"
+    doc = fitz.open()
+    for n in range(30):
+        doc.new_page().insert_text((72, 72), f"Clause {n}: the supplier shall deliver the goods. " * 8)
+    doc.save(str(path))
+    doc.close()
+
+    # PyMuPDF's own allocations are invisible to tracemalloc; what keeps the
+    # upload out of memory is that the document is opened from its path
+    # (PyMuPDF reads the file on demand) instead of from a bytes stream
+    opened = []
+    real_open = fitz.open
+
+    def recording_open(*args, **kwargs):
+        opened.append((args, kwargs))
+        return real_open(*args, **kwargs)
+
+    monkeypatch.setattr(file_handler.fitz, "open", recording_open)
+    pages = sum(1 for _ in file_handler.iter_pages_from_path(path, workers=1))
+
+    assert pages == 30
+    assert opened and all("stream" not in kwargs and args[0] == str(path) for args, kwargs in opened)
@@ -11,7 +11,8 @@ export const API_CONFIG = {
     DELETE_FILE: '/delete', // expects DELETE /delete/{file_name}
     CLEAR_HISTORY: '/clear', // DELETE
     NEWS: '/news',
-    SCRAPE: '/scrape'
+    SCRAPE: '/scrape',
+    JOBS: '/jobs' // GET /jobs/{job_id}, POST /jobs/{job_id}/cancel
   },
   
   // Default headers for API requests
@@ -21,7 +22,10 @@ export const API_CONFIG = {
   },
   
   // Timeout for API requests in milliseconds
-  TIMEOUT: 30000
+  TIMEOUT: 30000,
+
+  // How often to poll a background ingestion job
+  JOB_POLL_INTERVAL: 1000
 };
 
 export default API_CONFIG;
@@ -8,7 +8,9 @@ import type {
   FileInfo,
   NewsResponse,
   ScrapeResponse,
-  ApiError
+  ApiError,
+  IngestJob,
+  IngestJobRef
 } from '@/types';
 
 
@@ -111,6 +113,36 @@ export default function useChatApi() {
     }
   };
 
+  // Poll a background ingestion job until it finishes, reporting progress
+  const waitForJob = async (job: IngestJobRef, onProgress: (job: IngestJob) => void): Promise<IngestJob> => {
+    while (true) {
+      const response = await fetch(`${BASE_URL}${ENDPOINTS.JOBS}/${job.job_id}`);
+      if (!response.ok) {
+        const error = await response.json().catch(() => ({}));
+        throw new Error(handleApiError(error, 'Failed to fetch ingestion status'));
+      }
+      const data: IngestJob = await response.json();
+      onProgress(data);
+      if (data.status === 'succeeded' || data.status === 'failed' || data.status === 'cancelled') {
+        return data;
+      }
+      await new Promise(resolve => setTimeout(resolve, API_CONFIG.JOB_POLL_INTERVAL));
+    }
+  };
+
+  const describeJobProgress = (fileName: string, job: IngestJob, seconds: string): string => {
+    const p = job.progress || {};
+    if (job.status === 'queued') {
+      return `⏳ Queued for processing: ${fileName} [${seconds}s]`;
+    }
+    if (job.kind === 'ocr') {
+      return `🖼️ OCR: ${fileName} — ${p.pages_ocred ?? 0} scanned pages read, ` +
+        `${p.points_upserted ?? 0} chunks stored [${seconds}s]`;
+    }
+    return `⚙️ Processing: ${fileName} — ${p.pages_extracted ?? 0} pages read, ` +
+      `${p.chunks_embedded ?? 0} chunks embedded, ${p.points_upserted ?? 0} stored [${seconds}s]`;
+  };
+
   // Upload a file for analysis
   const uploadFile = async (file: File): Promise<UploadResponse> => {
     const startTime = performance.now();
@@ -162,21 +194,51 @@ export default function useChatApi() {
             const data: UploadResponse = JSON.parse(xhr.responseText || '{}');
             setCurrentFile(file.name);
             setUploadProgress(100);
-            
-            // Update message to show completion
-            setMessages(prev => 
-              prev.map(msg => 
-                msg.id === uploadMessage.id 
-                  ? { 
-                      ...msg, 
-                      content: `✅ Uploaded: ${file.name} (${timeTaken}s)`,
-                      progress: 100
-                    } 
-                  : msg
-              )
-            );
-            
-            resolve(data);
+
+            const setUploadMessage = (content: string) =>
+              setMessages(prev => 
+                prev.map(msg => 
+                  msg.id === uploadMessage.id 
+                    ? { ...msg, content, progress: 100 } 
+                    : msg
+                )
+              );
+
+            const job = data.jobs?.[0];
+            if (!job) {
+              // Processed synchronously (?wait=true)
+              setUploadMessage(`✅ Uploaded: ${file.name} (${timeTaken}s)`);
+              setIsUploading(false);
+              resolve(data);
+              return;
+            }
+
+            // The file is stored; indexing continues in a background job
+            const elapsed = () => ((performance.now() - startTime) / 1000).toFixed(1);
+            waitForJob(job, update => setUploadMessage(describeJobProgress(file.name, update, elapsed())))
+              .then(finished => {
+                if (finished.status === 'succeeded') {
+                  const pendingOcr: number[] = finished.result?.pending_ocr_pages || [];
+                  setUploadMessage(
+                    `✅ Uploaded: ${file.name} (${elapsed()}s)` +
+                    (pendingOcr.length ? `\n🖼️ ${pendingOcr.length} scanned pages are being OCRed in the background` : '')
+                  );
+                  resolve(data);
+                } else {
+                  const reason = finished.error || `Processing ${finished.status}`;
+                  setUploadMessage(`❌ Upload failed: ${file.name} (${elapsed()}s)\n${reason}`);
+                  setError(reason);
+                  reject(new Error(reason));
+                }
+              })
+              .catch(err => {
+                const msg = handleApiError(err, 'Failed to track file processing');
+                setUploadMessage(`❌ Upload failed: ${file.name} (${elapsed()}s)\n${msg}`);
+                setError(msg);
+                reject(new Error(msg));
+              })
+              .finally(() => setIsUploading(false));
+            return;
           } else {
             const err = JSON.parse(xhr.responseText || '{}');
             const msg = handleApiError(err, 'Failed to upload file');
@@ -195,14 +257,14 @@ export default function useChatApi() {
             );
             
             setError(msg);
+            setIsUploading(false);
             reject(new Error(msg));
           }
         } catch (e) {
           const msg = handleApiError(e, 'Failed to parse upload response');
           setError(msg);
-          reject(new Error(msg));
-        } finally {
           setIsUploading(false);
+          reject(new Error(msg));
         }
       };
 
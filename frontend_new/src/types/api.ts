@@ -7,6 +7,38 @@ export interface QueryResponse {
 export interface UploadResponse {
   message: string;
   files: string[];
+  jobs?: IngestJobRef[];
+}
+
+export type IngestJobStatus = 'queued' | 'running' | 'succeeded' | 'failed' | 'cancelled';
+
+export interface IngestJobRef {
+  job_id: string;
+  file_name: string;
+  status: IngestJobStatus;
+}
+
+export interface IngestJobProgress {
+  pages_extracted?: number;
+  chunks?: number;
+  chunks_embedded?: number;
+  chunks_unchanged?: number;
+  points_upserted?: number;
+  failed_batches?: number;
+  pages_ocred?: number;
+  ocr_failed?: number;
+}
+
+export interface IngestJob {
+  job_id: string;
+  kind: 'file' | 'url' | 'ocr';
+  status: IngestJobStatus;
+  progress: IngestJobProgress;
+  result: { [key: string]: any } | null;
+  error: string | null;
+  attempts: number;
+  created_at: string;
+  updated_at: string;
 }
 
 export interface FileInfo {
@@ -8,5 +8,7 @@ export type {
   FileInfo, 
   NewsResponse, 
   ScrapeResponse, 
-  ApiError 
+  ApiError,
+  IngestJob,
+  IngestJobRef
 } from './api';